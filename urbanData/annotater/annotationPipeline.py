@@ -0,0 +1,128 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, FrozenSet, List, NamedTuple, Set
+
+from annotater.baseAnnotator import BaseAnnotator
+from annotater.osmAnnotater import OsmAnnotator
+
+
+class AnnotationTask(NamedTuple):
+    """
+    step of the annotation, reads and writes are (collection name, property) pairs
+    io: waits for a request (f.i. to overpass), thus runs besides the cpu bound tasks
+    """
+    name: str
+    run: Callable[[], object]
+    reads: FrozenSet
+    writes: FrozenSet
+    io: bool = False
+
+
+def osmDataKey(poiIndex):
+    return ("osm data", id(poiIndex))
+
+
+def annotationTasks(annotators: List[BaseAnnotator], buildings, groups, regionsPerApproach: Dict[str, object]) -> List[AnnotationTask]:
+    """
+        annotation of the buildings and aggregation to groups and regions per annotator in the sequential order
+        (features are annotated in place)
+        the osm data of the OsmAnnotators is fetched by a separate io task per OsmPoiIndex
+    """
+    tasks = []
+    poiIndices = {}
+    for annotator in annotators:
+        if isinstance(annotator, OsmAnnotator):
+            poiIndices.setdefault(id(annotator.pois.index), annotator.pois.index)
+    for poiIndex in poiIndices.values():
+        tasks.append(AnnotationTask(
+            "OsmPoiIndex.load({})".format(poiIndex.areaName), poiIndex.load, frozenset(), frozenset([osmDataKey(poiIndex)]), io=True))
+
+    for annotator in annotators:
+        name = annotator.__class__.__name__
+        property = annotator.writeProperty
+        reads = [("buildings", p) for p in annotator.readProperties]
+        if isinstance(annotator, OsmAnnotator):
+            reads.append(osmDataKey(annotator.pois.index))
+        tasks.append(AnnotationTask(
+            "{}.annotateAll".format(name),
+            lambda annotator=annotator: annotator.annotateAll(buildings),
+            frozenset(reads),
+            frozenset(("buildings", p) for p in annotator.writtenProperties)))
+        tasks.append(AnnotationTask(
+            "{}.aggregateToGroups".format(name),
+            lambda annotator=annotator: annotator.aggregateToGroups(buildings, groups),
+            frozenset([("buildings", property)]),
+            frozenset([("groups", property)])))
+        for approach, regions in regionsPerApproach.items():
+            tasks.append(AnnotationTask(
+                "{}.aggregateToRegions({})".format(name, approach),
+                lambda annotator=annotator, regions=regions: annotator.aggregateToRegions(groups, regions),
+                frozenset([("groups", property)]),
+                frozenset([("regions " + approach, property)])))
+    return tasks
+
+
+def dependencies(tasks: List[AnnotationTask]) -> List[Set[int]]:
+    """
+        indices of the earlier tasks each task has to wait for, so the result equals the sequential execution
+        (a task reads what an earlier one writes, writes what an earlier one reads or both write the same property)
+    """
+    dependenciesPerTask = []
+    for i, task in enumerate(tasks):
+        dependenciesPerTask.append({j for j, earlier in enumerate(tasks[:i])
+                                    if earlier.writes & (task.reads | task.writes) or earlier.reads & task.writes})
+    return dependenciesPerTask
+
+
+def criticalPath(tasks: List[AnnotationTask], durations: List[float]) -> float:
+    """longest chain of dependent tasks in seconds (lower bound of the wall time)"""
+    finish = []
+    for task, taskDependencies, duration in zip(tasks, dependencies(tasks), durations):
+        finish.append(max([finish[j] for j in taskDependencies], default=0) + duration)
+    return max(finish, default=0)
+
+
+def runTasks(tasks: List[AnnotationTask], maxWorkers: int = 1) -> List[float]:
+    """
+        runs every task as soon as the tasks it depends on are finished
+        io tasks run in their own threads, the others on maxWorkers threads (annotating and aggregating holds the GIL,
+        thus more workers only help if the tasks release it, f.i. if the annotators use processes)
+        returns the duration of each task
+    """
+    dependenciesPerTask = dependencies(tasks)
+    durations = [0.0] * len(tasks)
+    finished = set()
+    running = {}
+
+    def timedRun(index):
+        start = time.perf_counter()
+        tasks[index].run()
+        durations[index] = time.perf_counter() - start
+        logging.info("Finished {} in {:.2f}s".format(tasks[index].name, durations[index]))
+
+    with ThreadPoolExecutor(max_workers=maxWorkers) as executor, \
+            ThreadPoolExecutor(max_workers=max(1, sum(task.io for task in tasks))) as ioExecutor:
+        pending = list(range(len(tasks)))
+        while pending or running:
+            for index in [i for i in pending if dependenciesPerTask[i] <= finished]:
+                pending.remove(index)
+                running[(ioExecutor if tasks[index].io else executor).submit(timedRun, index)] = index
+            done, _ = wait(running.keys(), return_when=FIRST_COMPLETED)
+            for future in done:
+                # raises the exception of a failed task (tasks already running are finished by the executor)
+                future.result()
+                finished.add(running.pop(future))
+    return durations
+
+
+def runAnnotators(annotators: List[BaseAnnotator], buildings, groups, regionsPerApproach: Dict[str, object], maxWorkers: int = 1):
+    """
+        annotates buildings, groups and regions in place (same result as running the annotators one after another)
+        the osm data is fetched while the annotators not needing it run
+    """
+    tasks = annotationTasks(annotators, buildings, groups, regionsPerApproach)
+    start = time.perf_counter()
+    durations = runTasks(tasks, maxWorkers)
+    logging.info("Annotated in {:.2f}s (critical path {:.2f}s, sequential {:.2f}s)".format(
+        time.perf_counter() - start, criticalPath(tasks, durations), sum(durations)))
@@ -1,28 +1,97 @@
 from abc import abstractmethod
-from geojson import FeatureCollection
 import logging
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from functools import cached_property, wraps
+from typing import List
 from funcy import log_durations
 
+from helper.geoJsonConverter import featureCollection
+from helper.segmentAggregation import reduceSegments
+from helper.featureTable import foreignKeyIndex, propertyValues, setPropertyValues
+
+ANNOTATION_CHUNK_SIZE = 2000
+
+# annotator of a worker process (unpickled once per worker)
+_workerAnnotator = None
+
+
+def _initWorker(annotatorState: bytes):
+    global _workerAnnotator
+    _workerAnnotator = pickle.loads(annotatorState)
+    _workerAnnotator.processes = None
+
+
+def _annotateChunk(features):
+    """returns the written properties of each feature"""
+    _workerAnnotator.annotateAll(featureCollection(features))
+    writtenProperties = _workerAnnotator.writtenProperties
+    return [{p: feature["properties"][p] for p in writtenProperties if p in feature["properties"]} for feature in features]
+
+
+def inProcessPool(annotateAll):
+    """annotateAll runs on chunks of the features in a process pool if the annotator has processes set"""
+    @wraps(annotateAll)
+    def wrapper(self, objects):
+        if self.processes and len(objects["features"]) > self.chunkSize:
+            return self.annotateAllInProcesses(objects["features"])
+        return annotateAll(self, objects)
+    return wrapper
+
 class BaseAnnotator():
     """Base Class for annotaters of geojson-objects
     Attributes:
         writeProperty   property which will be added to the objects by annotate()
         dataSource      data source used for annotation (f.i. company data)
+        readProperties  properties written by other annotators, which are read by annotate()
+        additionalWriteProperties   properties written besides the writeProperty
+        processes       number of processes annotating chunks of chunkSize features (None: in this process)
+        segmentReduction    vectorized replacement of aggregateProperties for groups and regions
+                            (sum, count, mean, nonZeroMean or union see helper.segmentAggregation)
     """
 
     writeProperty = None
+    readProperties: List[str] = []
+    additionalWriteProperties: List[str] = []
+    processes: int = None
+    chunkSize = ANNOTATION_CHUNK_SIZE
+    segmentReduction: str = None
     dataSource = None
     logger = logging.getLogger('')
 
     def __init__(self, dataSource, writeProperty):
         self.dataSource = dataSource
         self.writeProperty = writeProperty
+
+    @property
+    def writtenProperties(self) -> List[str]:
+        return [self.writeProperty] + self.additionalWriteProperties
         
-    @log_durations(logging.debug)
+    @inProcessPool
     def annotateAll(self, objects):
         """annotate() for every feature of the objects geojson-featureCollection"""
-        annotatedFeatures = [self.annotate(object) for object in objects["features"]]
-        return FeatureCollection(annotatedFeatures)
+        # labeled, as the decorator would print the whole collection as call signature
+        with log_durations(logging.debug, "{}.annotateAll".format(type(self).__name__)):
+            annotatedFeatures = [self.annotate(object) for object in objects["features"]]
+        return featureCollection(annotatedFeatures)
+
+    def annotateAllInProcesses(self, features):
+        """
+            the annotator is send once to each worker, the written properties are merged back into the features
+            (annotators only changing their writtenProperties can be annotated in chunks)
+        """
+        chunks = [features[start:start + self.chunkSize] for start in range(0, len(features), self.chunkSize)]
+        with log_durations(logging.debug, "{}.annotateAllInProcesses".format(type(self).__name__)), \
+                ProcessPoolExecutor(max_workers=self.processes, initializer=_initWorker, initargs=(pickle.dumps(self),)) as executor:
+            for chunk, writtenProperties in zip(chunks, executor.map(_annotateChunk, chunks)):
+                for feature, properties in zip(chunk, writtenProperties):
+                    feature["properties"].update(properties)
+        return featureCollection(features)
+
+    def __getstate__(self):
+        """cached properties (f.i. prepared geometries) are not picklable, they are build again on first use"""
+        cachedProperties = {name for cls in type(self).__mro__ for name, value in vars(cls).items() if isinstance(value, cached_property)}
+        return {key: value for key, value in self.__dict__.items() if key not in cachedProperties}
 
     @abstractmethod
     def annotate(self, object):
@@ -36,24 +105,31 @@ class BaseAnnotator():
     def aggregateProperties(properties):
        raise NotImplementedError(__name__)
 
-    def aggregate(self, buildings, groups, foreignKey, aggregateFunc):
+    def aggregate(self, buildings, groups, foreignKey, aggregateFunc, segmentReduction: str = None):
         """
             buildings: "base data" as a geojson-FeatureCollection
             groups: feature referencing multiple base data in the foreignKey
             foreignKey: mapping groups to list of buildings
             aggregateFunc: function for aggregating properties from buildings into one for the group
+            segmentReduction: computes all groups at once with numpy instead of calling aggregateFunc per group
         """
+        if segmentReduction:
+            groupValues = reduceSegments(segmentReduction, propertyValues(buildings, self.writeProperty), foreignKeyIndex(groups, foreignKey))
+            setPropertyValues(groups, self.writeProperty, groupValues)
+            return groups
+
         groupFeatures = groups["features"]
         buildingFeatures = buildings["features"]
+
         for group in groupFeatures:
             buildingProperties = [buildingFeatures[index]["properties"].get(self.writeProperty) for index in group["properties"][foreignKey]]
             groupProperty = aggregateFunc(buildingProperties)
             group["properties"][self.writeProperty] = groupProperty
 
-        return FeatureCollection(groupFeatures)
+        return featureCollection(groupFeatures)
 
     def aggregateToGroups(self, buildings, groups):
-        return self.aggregate(buildings, groups, "__buildings", self.aggregateProperties)
+        return self.aggregate(buildings, groups, "__buildings", self.aggregateProperties, self.segmentReduction)
 
     def aggregateToRegions(self, groups, regions):
-        return self.aggregate(groups, regions, "__buildingGroups", self.aggregateProperties)
+        return self.aggregate(groups, regions, "__buildingGroups", self.aggregateProperties, self.segmentReduction)
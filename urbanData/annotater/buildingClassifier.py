@@ -4,6 +4,8 @@ from enum import Enum
 from shapely.geometry import shape
 from annotater.baseAnnotator import BaseAnnotator
 from annotater.osmAnnotater import OsmAnnotator
+from funcy import log_durations
+from helper.featureTable import FeatureTable, propertyValues, setPropertyValues
 
 class BuildingType(Enum):
     # TODO: whats with restaurants/pubs ? (leisure?)
@@ -21,87 +23,143 @@ class BuildingType(Enum):
     UTILITY = "utility"
     STORAGE = "storage"
 
+# building tag rules in order of precedence: prefix rules match the beginning of the tag (like re.match), exact rules the whole tag
+BUILDING_TAG_RULES = [
+    ("prefix", ["apartments", "terrace", "house", "residential", "dormitory", "bungalow"], BuildingType.RESIDENTIAL),
+    ("prefix", ["industrial", "manufacture", "warehouse", "greenhouse"], BuildingType.INDUSTRIAL),
+    ("prefix", ["retail", "shop", "supermarket", "service", "commercial", "kiosk"], BuildingType.COMMERCIAL),
+    ("exact", ["public"], BuildingType.PUBLIC),
+    ("exact", ["collapsed"], BuildingType.ABANDONED),
+    ("prefix", ["kindergarten", "school", "university", "college"], BuildingType.EDUCATION),
+    ("prefix", ["hospital", "ambulance_station"], BuildingType.HEALTH),
+    ("exact", ["church"], BuildingType.HOLY),
+    ("exact", ["garage", "roof", "shed", "hangar", "container", "hud"], BuildingType.STORAGE),
+    ("exact", ["power"], BuildingType.UTILITY),
+]
+
+# amenity, education and safety types indicating a building type
+CATEGORY_TYPE_RULES = {
+    BuildingType.EDUCATION: frozenset(["kindergarten", "school", "university", "college"]),
+    BuildingType.HEALTH: frozenset(["pharmacy", "doctor", "doctors", "dentist", "hospital"]),
+    BuildingType.HOLY: frozenset(["place_of_worship"]),
+    BuildingType.SAFETY: frozenset(["police", "fire_station"]),
+}
+
+# properties passed to classifyValues (in the order of its arguments)
+CLASSIFIED_PROPERTIES = ("building", "abandoned", "leisures", "leisure", "companies", "power", "office", "government",
+                         "amenities", "amenity", "__amenityTypes", "education", "safety", "healthcare", "religion", "police",
+                         "__landUseType")
+
+
+def compileBuildingTagRules(rules):
+    """one regex with a group per rule (the first matching alternative wins, thus the order of the rules is kept)"""
+    alternatives = []
+    for i, (kind, values, _) in enumerate(rules):
+        pattern = "|".join(re.escape(value) for value in values)
+        alternatives.append("(?P<rule{}>(?:{}){})".format(i, pattern, r"\Z" if kind == "exact" else ""))
+    return re.compile("|".join(alternatives))
+
+
+BUILDING_TAG_PATTERN = compileBuildingTagRules(BUILDING_TAG_RULES)
+BUILDING_TAG_TYPES = [buildingType.value for _, _, buildingType in BUILDING_TAG_RULES]
+# values of the other types set by classifyValues (looking up an enum value per building is slow)
+ABANDONED, LEISURE, COMMERCIAL, UTILITY, PUBLIC_ADMIN, HEALTH, HOLY, SAFETY = [buildingType.value for buildingType in (
+    BuildingType.ABANDONED, BuildingType.LEISURE, BuildingType.COMMERCIAL, BuildingType.UTILITY, BuildingType.PUBLIC_ADMIN,
+    BuildingType.HEALTH, BuildingType.HOLY, BuildingType.SAFETY)]
+TYPE_BY_CATEGORY_TYPE = {categoryType: buildingType.value for buildingType, categoryTypes in CATEGORY_TYPE_RULES.items()
+                         for categoryType in categoryTypes}
+
+
 class BuildingTypeClassifier(BaseAnnotator):
     """
     Classifier for buildings based on various properties (also checking for properties written by other annotaters)
+    rules are given by BUILDING_TAG_RULES and CATEGORY_TYPE_RULES
     """
+    readProperties = ["leisures", "companies", "amenities", "__amenityTypes", "education", "safety", "__landUseType"]
+    # like aggregateProperties
+    segmentReduction = "union"
+
     def __init__(self):
         self.writeProperty = "type"
+        # building tag -> type value (None if no rule matches), filled on first use of a tag
+        self.typeByBuildingTag = {}
+
+    def annotateAll(self, objects):
+        """classifyAll() written to every feature"""
+        # labeled, as the decorator would print the whole collection as call signature
+        with log_durations(logging.debug, "{}.annotateAll".format(type(self).__name__)):
+            setPropertyValues(objects, self.writeProperty, self.classifyAll(objects))
+        return objects
 
     def annotate(self, object):
         object["properties"][self.writeProperty] = self.classify(object)
         return object
 
     def classify(self, object):
+        return self.classifyValues(*map(object["properties"].get, CLASSIFIED_PROPERTIES))
+
+    def classifyAll(self, buildings):
+        """types of all buildings of a FeatureTable (zipping its columns) or FeatureCollection"""
+        classifyValues = self.classifyValues
+        if isinstance(buildings, FeatureTable):
+            columns = [propertyValues(buildings, name) for name in CLASSIFIED_PROPERTIES]
+            return [classifyValues(*values) for values in zip(*columns)]
+        return [classifyValues(*map(building["properties"].get, CLASSIFIED_PROPERTIES)) for building in buildings["features"]]
+
+    def buildingTagType(self, buildingTag):
+        try:
+            return self.typeByBuildingTag[buildingTag]
+        except KeyError:
+            match = BUILDING_TAG_PATTERN.match(buildingTag)
+            type = BUILDING_TAG_TYPES[int(match.lastgroup[len("rule"):])] if match else None
+            self.typeByBuildingTag[buildingTag] = type
+            return type
+
+    def classifyValues(self, building, abandoned, leisures, leisure, companies, power, office, government,
+                       amenities, amenity, amenityTypes, education, safety, healthcare, religion, police, landUseType):
+        if abandoned == "yes":
+            return [ABANDONED]
+
         types : set = set()
-        properties = object["properties"]
-        buildingType = properties.get("building")
-
-        if object.get("abandoned") == "yes":
-            types.add(BuildingType.ABANDONED)
-        else:
-            if buildingType:
-                if re.match("apartments|terrace|house|residental|dormitory|bungalow", buildingType):
-                    types.add(BuildingType.RESIDENTIAL.value)
-                elif re.match("industrial|manufacture|warehouse|greenhouse", buildingType):
-                    types.add(BuildingType.INDUSTRIAL.value)
-                elif re.match("retail|shop|supermarket|service|commercial|kiosk", buildingType):
-                    types.add(BuildingType.COMMERCIAL.value)
-                elif buildingType == "public":
-                    types.add(BuildingType.PUBLIC.value)
-                elif buildingType == "collapsed":
-                    types.add(BuildingType.ABANDONED.value)
-                elif re.match("kindergarten|school|universitary|college", buildingType):
-                    types.add(BuildingType.EDUCATION.value)
-                elif re.match("hospital|ambulance_station", buildingType):
-                    types.add(BuildingType.HEALTH.value)
-                elif buildingType == "church":
-                    types.add(BuildingType.HOLY.value)
-                elif buildingType in ["garage", "roof", "shed", "hangar", "container", "hud"]:
-                    types.add(BuildingType.STORAGE.value)
-                elif buildingType == "power":
-                    types.add(BuildingType.UTILITY.value)
-
-            leisures = [type for _, type, _ in properties.get("leisures")]
-            if not leisures:
-                # if leisureAnnotater was not used
-                leisures = properties.get("leisure", [])  
-            if leisures:
-                types.add(BuildingType.LEISURE.value)
-            
-            # if companyAnnotater has been used
-            if properties.get("companies"):
-                types.add(BuildingType.COMMERCIAL.value)
-            if properties.get("power"):
-                types.add(BuildingType.UTILITY.value)
-
-            if properties.get("office") == "government" or properties.get("government") == "register_office":
-                types.add(BuildingType.PUBLIC_ADMIN.value)
-
-
-            amenties = set([type for _, type, _ in properties.get("amenities")])
-            if not amenties:
-                # if amenityAnnotater was not used
-                amenties = set([properties.get("amenity")])
-            # add estimated building types
-            amenties.update(properties.get("__amenityType", []))
-
-            if set(["kindergarten", "school", "universitary", "college"]).intersection(properties.get("education", amenties)):
-                types.add(BuildingType.EDUCATION.value)
-            if properties.get("healthcare") or set(["pharmacy", "doctor", "doctors", "dentist", "hospital"]).intersection(amenties):
-                types.add(BuildingType.HEALTH.value)
-            if "place of worship" in amenties or properties.get("religion"):
-                types.add(BuildingType.HOLY.value)
-            if properties.get("police") or set(["police", "fire_station"]).intersection(properties.get("safety", amenties)):
-                types.add(BuildingType.SAFETY.value)
-            
+        if building:
+            buildingTagType = self.buildingTagType(building)
+            if buildingTagType:
+                types.add(buildingTagType)
+
+        # leisure tag if leisureAnnotater was not used
+        if leisures or leisure:
+            types.add(LEISURE)
+        # if companyAnnotater has been used
+        if companies:
+            types.add(COMMERCIAL)
+        if power:
+            types.add(UTILITY)
+        if office == "government" or government == "register_office":
+            types.add(PUBLIC_ADMIN)
+        if healthcare:
+            types.add(HEALTH)
+        if religion:
+            types.add(HOLY)
+        if police:
+            types.add(SAFETY)
+
+        # amenity tag if amenityAnnotater was not used, __amenityTypes are estimated building types
+        if not amenities and amenity:
+            types.add(TYPE_BY_CATEGORY_TYPE.get(amenity))
+        for entries in (amenities, education, safety):
+            if entries:
+                for _, type, _ in entries:
+                    types.add(TYPE_BY_CATEGORY_TYPE.get(type))
+        if amenityTypes:
+            for type in amenityTypes:
+                types.add(TYPE_BY_CATEGORY_TYPE.get(type))
+        types.discard(None)
+
         # try to estimate building type from landuse if not anything else is given
-        if not types:
-            landUse = properties.get("__landUseType")
-            if landUse:
-                types.add(landUse)
+        if not types and landUseType:
+            types.add(landUseType)
 
-        return list(types)
+        return sorted(types)
 
     @staticmethod
     def aggregateProperties(types):
@@ -115,15 +173,15 @@ class LandUseAnnotator(OsmAnnotator):
     osmSelector = ["landuse"]
     writeProperty = "__landUseType"
 
-    def annotate(self, object):
+    # only lands containing the object
+    matchPredicate = "within"
+
+    def annotateWithMatches(self, object, objectGeom, landsObjectContainedIn):
         type = "" 
-        objectGeom = shape(object["geometry"])
 
-        landsObjectContainedIn = [land for land in self.shapeIndex.query(objectGeom) if land.contains(objectGeom)]
-        
         if landsObjectContainedIn:
              # f.i. garages areas are defined inside residential areas --> just use smallest area
-            correspondingLand = min(landsObjectContainedIn, key= lambda x: x.area)
+            correspondingLand = min(landsObjectContainedIn, key= lambda x: x.geometry.area)
             landUsage = correspondingLand.properties.get('landuse')
             if landUsage == "residential":
                 type = BuildingType.RESIDENTIAL.value
@@ -5,6 +5,8 @@ class BuildingLvlAnnotator(BaseAnnotator):
     """combines building:levels - building:min_level  + roof:levels into new property 'levels'
     based on: https://wiki.openstreetmap.org/wiki/Key:building:levels"""
     writeProperty = "levels"
+    # like aggregateProperties
+    segmentReduction = "nonZeroMean"
 
     def __init__(self):
         pass
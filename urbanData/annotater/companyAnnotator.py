@@ -1,98 +1,105 @@
-from dataclasses import dataclass
+import os
 import re
-from geojson import FeatureCollection
 from csv import DictReader
 from collections import defaultdict
 from annotater.baseAnnotator import BaseAnnotator
 from annotater.osmAnnotater import AddressAnnotator
+from helper.addressIndex import AddressIndex, HouseNumberRange
+from helper.categoryEntries import CategoryEntries, CategoryEntry
+from helper.companyDataset import isUpToDate, loadCompanyDataset, saveCompanyDataset
+from helper.geoJsonConverter import featureCollection
+
+COMPANY_DATASET_PATH = "out/cache/companies.arrow"
 
 class CompanyAnnotator(BaseAnnotator):
     """Annotates objects (probably buildings) with companies based on address information"""
     # companies based on osm are added by the OsmCompaniesAnnotator
     writeProperty = "companies"
-    dataSource = []
+    readProperties = [AddressAnnotator.writeProperty]
 
     defaultDataSources = ["handelsregister_Dresden", "yellowPages_Dresden"] 
 
-    def __init__(self, companyData = None, postalCodes = ["01127", "01139"]):
-        """companyData as pandasDf else default to result of companyScraper""" 
+    def __init__(self, companyData = None, postalCodes = ["01127", "01139"], datasetPath = COMPANY_DATASET_PATH):
+        """
+            companyData: list of company dicts (with parsed houseNumber) else default to result of companyScraper
+            datasetPath: compiled version of the scraped companies (recompiled if the scraped files changed)
+        """
         # cannot use DataFrame as Housenumbers is no primitive type
         if not companyData:
-            # TODO:  !!! remove duplicates (if address alike and name very similar ?)
-            for fileName in self.defaultDataSources:
-                with open("scraper\companiesScraper\{}.csv".format(fileName), 'r',  encoding="utf-8") as file:
-                    for row in DictReader(file, skipinitialspace=True):
-                        companyDic = {k: v   for k,v in row.items()}
-                        if companyDic["postalCode"] in postalCodes:
-                            if not "houseNumber" in companyDic.keys():
-                                # TODO: split street and houseNumber at scrape time
-                                match = re.match(r"([^0-9]*)(\d.*)", companyDic["street"])
-                                if match:
-                                    street, housenumber = match.group(1), match.group(2)
-                                    companyDic["street"] = street.replace("str.", "straße").replace("Str.","Straße").strip()
-                                    companyDic["houseNumber"] = self.extractHousenumber(housenumber)
-                                    if not companyDic["houseNumber"]:
-                                        # known Problems: street names containing numbers like 'Str. des 17. Juni 25/Geb. 102'
-                                        #                 'OneStreet 35/OtherStreet 42'
-                                        #                 'OneStreet 172 Eingang B' (could be shortened to 172B probably?)
-                                        self.logger.debug("{}: could not parse houseNumber inside {} ".format(__name__,companyDic["street"]))
-                                    else:
-                                        self.dataSource.append(companyDic)
-                                if not match:
-                                    self.logger.debug("{}: {} does not contain a housenumber".format(__name__,companyDic))
-         
+            sourcePaths = [path for path in self.defaultDataSourcePaths() if os.path.isfile(path)]
+            if len(sourcePaths) < len(self.defaultDataSources):
+                self.logger.warning("{}: Missing scraped companies (only found {})".format(__name__, sourcePaths))
+            if not isUpToDate(datasetPath, sourcePaths):
+                saveCompanyDataset(self.parseCompanyFiles(sourcePaths), datasetPath, sourcePaths)
+            self.dataSource = loadCompanyDataset(datasetPath, postalCodes)
         else:
             self.dataSource = companyData
         self.logger.info("{}: Loaded {} companies with a well-formed address".format(__name__, len(self.dataSource)))
 
+    @classmethod
+    def defaultDataSourcePaths(cls):
+        return [os.path.join("scraper", "companiesScraper", "{}.csv".format(fileName)) for fileName in cls.defaultDataSources]
+
+    @classmethod
+    def parseCompanyFiles(cls, paths):
+        """companies with a well-formed address (of every postal code) inside the scraped csv files"""
+        # TODO:  !!! remove duplicates (if address alike and name very similar ?)
+        companies = []
+        for path in paths:
+            with open(path, 'r',  encoding="utf-8") as file:
+                for row in DictReader(file, skipinitialspace=True):
+                    companyDic = {k: v   for k,v in row.items()}
+                    if companyDic.get("houseNumber"):
+                        companyDic["houseNumber"] = cls.extractHousenumber(companyDic["houseNumber"])
+                    else:
+                        # TODO: split street and houseNumber at scrape time
+                        match = re.match(r"([^0-9]*)(\d.*)", companyDic["street"])
+                        if not match:
+                            cls.logger.debug("{}: {} does not contain a housenumber".format(__name__,companyDic))
+                            continue
+                        street, housenumber = match.group(1), match.group(2)
+                        companyDic["street"] = street.replace("str.", "straße").replace("Str.","Straße").strip()
+                        companyDic["houseNumber"] = cls.extractHousenumber(housenumber)
+                    if not companyDic["houseNumber"]:
+                        # known Problems: street names containing numbers like 'Str. des 17. Juni 25/Geb. 102'
+                        #                 'OneStreet 35/OtherStreet 42'
+                        #                 'OneStreet 172 Eingang B' (could be shortened to 172B probably?)
+                        cls.logger.debug("{}: could not parse houseNumber inside {} ".format(__name__,companyDic["street"]))
+                    else:
+                        companies.append(companyDic)
+        return companies
 
-    
-    # TODO: move annotate method
     def annotateAll(self, buildings):
         """adds companies by matching addresses"""
-        # TODO: loop over buildings first? (would not need to overwrite annotateAll)
-        
-        # TODO: replace this nested loop join (extract join condition)
+        # hash join: each company is looked up in an index of the building addresses
+        addressIndex = AddressIndex(buildings, AddressAnnotator.writeProperty)
+        buildingFeatures = buildings["features"]
         compainesAdded = 0
         for company in self.dataSource:
             companyHouseNumber =  company["houseNumber"]
             addressKey = AddressAnnotator.generateAddressKey(company["postalCode"], company["street"]) 
-            findMatch = False
-            for building in buildings["features"]:
-                # TODO: look for values first and then check if key could match ?
-                addresses = building["properties"].get("addresses")
-                if addresses:
-                    houseNumbers = addresses.get(addressKey)
-                    if houseNumbers:
-                        entrances = 0
-                        if isinstance(companyHouseNumber, str):
-                            if companyHouseNumber in houseNumbers:
-                                entrances = 1
-                        elif isinstance(companyHouseNumber, list):
-                            overlappingNumbers = set(companyHouseNumber).intersection(houseNumbers)
-                            entrances = len(overlappingNumbers)
-                        elif isinstance(companyHouseNumber, HouseNumberRange):
-                            overlappingNumbers = [n for n in houseNumbers if companyHouseNumber.start <= n <= companyHouseNumber.end]
-                            entrances = len(overlappingNumbers)
-                        else:
-                            raise ValueError("Unexpected type for houseNumber {}".format(type(companyHouseNumber)))
-                        if entrances > 0:
-                            findMatch = True
-                            compainesAdded += 1
-                            branch = company["branch"].strip()
-                            if not branch:
-                                branch = "various"
-                            companyEntry = (company["name"], branch, entrances)
-                            if self.writeProperty in building.keys():
-                                building["properties"][self.writeProperty].append(companyEntry)
-                            else:
-                                building["properties"][self.writeProperty] = [companyEntry]
-            if not findMatch:
+            if isinstance(companyHouseNumber, str):
+                entrancesPerBuilding = addressIndex.match(addressKey, [companyHouseNumber])
+            elif isinstance(companyHouseNumber, list):
+                entrancesPerBuilding = addressIndex.match(addressKey, companyHouseNumber)
+            elif isinstance(companyHouseNumber, HouseNumberRange):
+                entrancesPerBuilding = addressIndex.matchRange(addressKey, companyHouseNumber.start, companyHouseNumber.end)
+            else:
+                raise ValueError("Unexpected type for houseNumber {}".format(type(companyHouseNumber)))
+            if not entrancesPerBuilding:
                 self.logger.debug("{}: Could not find building for {}".format(__name__, company))
+                continue
+            compainesAdded += 1
+            branch = company["branch"].strip()
+            if not branch:
+                branch = "various"
+            for position, entrances in entrancesPerBuilding.items():
+                companyEntry = CategoryEntry.create(company["name"], branch, entrances)
+                buildingFeatures[position]["properties"].setdefault(self.writeProperty, CategoryEntries()).append(companyEntry)
         # TODO: find out missing companies
         self.logger.info("{}: Could add {} companies".format(__name__, compainesAdded))
 
-        return FeatureCollection(buildings)
+        return featureCollection(buildingFeatures)
 
     def annotate(self, building):
         raise NotImplementedError("Each company is mapped to one or more buildings instead of building to company")
@@ -142,8 +149,3 @@ class CompanyAnnotator(BaseAnnotator):
         return None
         
 
-
-@dataclass
-class HouseNumberRange():
-    start: str
-    end:   str
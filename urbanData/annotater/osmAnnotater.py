@@ -2,40 +2,85 @@ import re
 import geojson
 import logging
 
+from abc import abstractmethod
 from collections import defaultdict
-from OSMPythonTools.nominatim import Nominatim
-from OSMPythonTools.overpass import overpassQueryBuilder, Overpass
-from shapely.geometry import mapping, shape
-from shapely.strtree import STRtree
-from annotater.baseAnnotator import BaseAnnotator
+from functools import cached_property
+from typing import List
+from funcy import log_durations
+from shapely.geometry import mapping
+from shapely.prepared import prep
+from annotater.baseAnnotator import BaseAnnotator, inProcessPool
 
 
-from helper.geoJsonConverter import osmObjectsToGeoJSON
 from helper.OsmObjectType import OsmObjectType
+from helper.overPassHelper import OverPassHelper
+from helper.osmPoiIndex import OsmPoiIndex, Poi
+from helper.shapelyHelper import spatialJoin
+from helper.geoJsonConverter import featureCollection
+from helper.featureTable import FeatureTable, geometryOf
+from helper.categoryEntries import CategoryEntries, CategoryEntry
 
 class OsmAnnotator(BaseAnnotator):
     """
     Base class for annotaters using osm data
     """
     osmSelector = None 
-    shapeIndex = None 
-    def __init__(self, areaName: str, elementsToUse: OsmObjectType = OsmObjectType.NODE):
+    pois = None 
+    # objectGeometry.matchPredicate(osmGeometry) for matching osm objects
+    matchPredicate = "intersects"
+    def __init__(self, areaName: str, elementsToUse: OsmObjectType = OsmObjectType.NODE, overpassHelper: OverPassHelper = None,
+                 poiIndex: OsmPoiIndex = None):
+        """
+            poiIndex: index shared with other annotators of the same area (objects of all annotators are fetched together)
+        """
         assert(self.osmSelector)
 
-        areaId = Nominatim().query(areaName).areaId()
-        query = overpassQueryBuilder(
-            area=areaId, elementType=elementsToUse.value, selector= self.osmSelector, out='geom')
-        osmObjects = Overpass().query(query).toJSON()["elements"]
-        
-        self.dataSource = osmObjectsToGeoJSON(osmObjects, polygonize = True)["features"]
-
-        shapeGeoms = []
-        for loc in self.dataSource:
-            shapeGeom = shape(loc["geometry"])
-            shapeGeom.properties = loc["properties"]  
-            shapeGeoms.append(shapeGeom)
-          
-        self.shapeIndex = STRtree(shapeGeoms)
+        if not poiIndex:
+            # shares the response cache of the OverPassHelper (or its offline backend)
+            poiIndex = OsmPoiIndex(areaName, overpassHelper)
+        self.pois = poiIndex.register(self.osmSelector, elementsToUse)
+
+    @property
+    def dataSource(self):
+        # fetched on first use, so all annotators sharing the index are registered before
+        return self.pois.features
+
+    def __getstate__(self):
+        # fetch before pickling, so worker processes do not fetch again
+        self.pois.load()
+        return super().__getstate__()
+
+    @inProcessPool
+    def annotateAll(self, objects):
+        """annotateWithMatches() for every feature, matching osm objects are found with one spatial join"""
+        # labeled, as the decorator would print the whole collection as call signature
+        with log_durations(logging.debug, "{}.annotateAll".format(type(self).__name__)):
+            features = objects["features"]
+            if isinstance(objects, FeatureTable):
+                geometries = objects.geometries
+            else:
+                geometries = [geometryOf(object) for object in features]
+            pois = self.pois.pois
+            objectIndices, poiIndices = spatialJoin(geometries, self.pois.geometries, self.matchPredicate)
+            matchesPerObject = [[] for _ in features]
+            for objectIndex, poiIndex in zip(objectIndices, poiIndices):
+                matchesPerObject[objectIndex].append(pois[poiIndex])
+            annotatedFeatures = [self.annotateWithMatches(object, geometry, matches)
+                                 for object, geometry, matches in zip(features, geometries, matchesPerObject)]
+        return featureCollection(annotatedFeatures)
+
+    def annotate(self, object):
+        objectGeometry = geometryOf(object)
+        matches = [poi for poi in self.pois.query(objectGeometry)
+                   if getattr(objectGeometry, self.matchPredicate)(poi.geometry)]
+        return self.annotateWithMatches(object, objectGeometry, matches)
+
+    @abstractmethod
+    def annotateWithMatches(self, object, objectGeometry, matches: List[Poi]):
+        """
+            annotating an object based on the osm objects for which objectGeometry.matchPredicate(poi.geometry) holds
+        """
+        raise NotImplementedError(__name__)
         
 
 class AddressAnnotator(OsmAnnotator):
@@ -51,10 +96,10 @@ class AddressAnnotator(OsmAnnotator):
     def generateAddressKey(postalCode, street):
         return "{}, {}".format(postalCode, street)
 
-    def annotate(self, object):
+    def annotateWithMatches(self, object, objectGeometry, matches):
         """based on geojson-object geometry or osm node-ids searches the address"""
-        objectGeometry = shape(object["geometry"])
-        containsAddress = [key for key in object["properties"].keys() if key.startswith("addr:housenumber")]
+        # copy of the keys, as other annotators can add properties at the same time
+        containsAddress = [key for key in list(object["properties"]) if key.startswith("addr:housenumber")]
         addresses = {}
         if containsAddress:
             postalCode = object["properties"].get("addr:postcode")
@@ -68,29 +113,39 @@ class AddressAnnotator(OsmAnnotator):
                 addresses = self.addressesBasedOnOsmIds(object["properties"]["__nodeIds"])
             if not addresses:
                 addresses = defaultdict(list)
-                nearbyLocations = self.shapeIndex.query(objectGeometry)
-                for location in nearbyLocations:
-                    # 'contains' not enough for polygons having points on its edges 
-                    if objectGeometry.intersects(location):
-                        properties = location.properties
-                        postalCode = properties.get("addr:postcode")
-                        street = properties.get("addr:street")
-                        houseNumber = properties.get("addr:housenumber")
-                        key = self.generateAddressKey(postalCode, street)
-                        addresses[key].append(houseNumber)
+                # 'contains' not enough for polygons having points on its edges (thus matched by intersects)
+                for location in matches:
+                    properties = location.properties
+                    postalCode = properties.get("addr:postcode")
+                    street = properties.get("addr:street")
+                    houseNumber = properties.get("addr:housenumber")
+                    key = self.generateAddressKey(postalCode, street)
+                    addresses[key].append(houseNumber)
         # ! can still be empty (f.i. https://www.openstreetmap.org/way/35540321 or https://www.openstreetmap.org/way/32610207) could only be solved by taking nearest element with address 
         object["properties"][self.writeProperty] = addresses
         return object
     
+    @cached_property
+    def addressesByNodeId(self):
+        """osm node id -> (address key, house number) of every address node (build on first use)"""
+        addressesByNodeId = {}
+        for location in self.dataSource:
+            nodeId = location["properties"].get("__nodeId")
+            if nodeId is not None:
+                postalCode = location["properties"].get("addr:postcode")
+                street = location["properties"].get("addr:street")
+                houseNumber = location["properties"].get("addr:housenumber")
+                addressesByNodeId[nodeId] = (self.generateAddressKey(postalCode, street), houseNumber)
+        return addressesByNodeId
+
     def addressesBasedOnOsmIds(self, nodeIds):
-        matchingLocations = [loc for loc in self.dataSource if loc["properties"]["__nodeId"] in nodeIds]
         addresses = defaultdict(list)
-        for location in matchingLocations:
-            postalCode = location["properties"].get("addr:postcode")
-            street = location["properties"].get("addr:street")
-            houseNumber = location["properties"].get("addr:housenumber")
-            key = self.generateAddressKey(postalCode, street)
-            addresses[key].append(houseNumber)
+        # dict.fromkeys: closed ways contain their first node twice
+        for nodeId in dict.fromkeys(nodeIds):
+            address = self.addressesByNodeId.get(nodeId)
+            if address:
+                key, houseNumber = address
+                addresses[key].append(houseNumber)
         return addresses
     
     @staticmethod
@@ -133,32 +188,23 @@ class OsmCompaniesAnnotator(OsmAnnotator):
     # TODO: allow to also use crafts tag
     osmSelector = ['"shop"', '"name"']
     writeProperty = "companies"
+    # merged with the companies of the CompanyAnnotator
+    readProperties = ["companies"]
 
-    def annotate(self, object):
+    def annotateWithMatches(self, object, objectGeometry, matches):
         """based on geojson-object geometry checks if shop are inside of the building"""
-        objectGeometry = shape(object["geometry"])
-        nearbyGeoms = self.shapeIndex.query(objectGeometry)
         companyEntries = object["properties"].get(self.writeProperty, [])
         if isinstance(companyEntries, tuple):
             companyEntries = [companyEntries]
-
-        for shopGeom in nearbyGeoms:
-            properties = shopGeom.properties
-            if objectGeometry.intersects(shopGeom):
-                shopName = properties.get("name")
-                shopType = properties.get("shop")
-                # assuming shops just have one entry .. if not set otherwise previously 
-                entrances = 1
-
-                # preventing to have ("XY", 'various', 1) and ("XY", 'furniture', 1)
-                matchingEntries = [e for e in companyEntries if shopName == e[0]]
-                for matchingName, existingType, existingEntrances in matchingEntries:
-                    companyEntries.remove((matchingName, existingType, existingEntrances))
-                    entrances = existingEntrances
-                    if not existingType == "various":
-                        shopType += "," + existingType
-                # TODO: check based on "Washingtonstrasse 16"
-                companyEntries.append((shopName, shopType, entrances))          
+        if not isinstance(companyEntries, CategoryEntries):
+            companyEntries = CategoryEntries(companyEntries)
+
+        for shop in matches:
+            properties = shop.properties
+            # assuming shops just have one entry .. if not set otherwise previously 
+            # preventing to have ("XY", 'various', 1) and ("XY", 'furniture', 1)
+            # TODO: check based on "Washingtonstrasse 16"
+            companyEntries.merge(properties.get("name"), properties.get("shop"))
         object["properties"][self.writeProperty] = companyEntries
         return object
 
@@ -172,41 +218,40 @@ class OsmCompaniesAnnotator(OsmAnnotator):
 class AmentiyAnnotator(OsmAnnotator):
     osmSelector = ["amenity",'"amenity"!~"vending_machine|parking|atm"', 'leisure!~"."', "name"]
     writeProperty = "amenities"
+    additionalWriteProperties = ["__amenityTypes", "safety", "education"]
+    readProperties = ["safety", "education"]
     # TODO health and food also in extra category?
 
-    def annotate(self, object):
-        """based on geojson-object geometry checks if shop are inside of the building"""
-        objectGeometry = shape(object["geometry"])
+    @cached_property
+    def amenityAreas(self):
+        """id of the geometry -> prepared geometry for amenities being areas (f.i. school grounds)"""
+        return {id(amenity.geometry): prep(amenity.geometry) for amenity in self.pois.pois
+                if not (amenity.properties.get("building") or amenity.geometry.geom_type == "Point")}
 
-        object["properties"][self.writeProperty] = []
-        nearbyGeoms = self.shapeIndex.query(objectGeometry)
-        for amenityGeom in nearbyGeoms:
-            properties = amenityGeom.properties
+    def annotateWithMatches(self, object, objectGeometry, matches):
+        """based on geojson-object geometry checks if shop are inside of the building"""
+        object["properties"][self.writeProperty] = CategoryEntries()
+        for amenity in matches:
+            properties = amenity.properties
             amenityType = properties.get("amenity")
-            if objectGeometry.intersects(amenityGeom):
-                entry = (properties.get("name"), amenityType, 1)
-
-                if amenityType in ["police", "fire_station"]:
-                    if "safety" in object["properties"].keys():
-                        object["properties"]["safety"].append(entry)
-                    else:
-                        object["properties"]["safety"] = [entry]
-                elif amenityType in ["school", "kindergarten", "university", "libary"]:
-                    if "education" in object["properties"].keys():
-                        object["properties"]["education"].append(entry)
-                    else:
-                        object["properties"]["education"] = [entry]
-                elif amenityType:
-                    object["properties"][self.writeProperty].append(entry)
-
-        # areas containing the object, the index won't work
-        amentyAreas = [s for s in self.dataSource if not (s["properties"].get("building") or s["geometry"]["type"] == "Point")]
-        types = set()
-
-        for area in amentyAreas:
-            amenityType = area["properties"].get("amenity")
-            if shape(area["geometry"]).contains(objectGeometry):
-                types.add(amenityType)
+            entry = CategoryEntry.create(properties.get("name"), amenityType)
+
+            if amenityType in ["police", "fire_station"]:
+                if "safety" in object["properties"].keys():
+                    object["properties"]["safety"].append(entry)
+                else:
+                    object["properties"]["safety"] = CategoryEntries([entry])
+            elif amenityType in ["school", "kindergarten", "university", "libary"]:
+                if "education" in object["properties"].keys():
+                    object["properties"]["education"].append(entry)
+                else:
+                    object["properties"]["education"] = CategoryEntries([entry])
+            elif amenityType:
+                object["properties"][self.writeProperty].append(entry)
+
+        # areas containing the object also intersect it, thus they are part of the matches
+        types = {amenity.properties.get("amenity") for amenity in matches
+                 if id(amenity.geometry) in self.amenityAreas and self.amenityAreas[id(amenity.geometry)].contains(objectGeometry)}
         if types:
             object["properties"]["__amenityTypes"] = list(types)
         return object
@@ -222,18 +267,13 @@ class LeisureAnnotator(OsmAnnotator):
     osmSelector = ["leisure", 'amenity!~"."', "name"]
     writeProperty = "leisures"
 
-    def annotate(self, object):
+    def annotateWithMatches(self, object, objectGeometry, matches):
         """based on geojson-object geometry checks if shop are inside of the building"""
-        objectGeometry = shape(object["geometry"])
-
-        object["properties"][self.writeProperty] = []
-        nearbyGeoms = self.shapeIndex.query(objectGeometry)
-        for leisure in nearbyGeoms:
-            if objectGeometry.intersects(leisure):
-                properties = leisure.properties
-                leisureEntry = (properties.get("name"), properties.get("leisure"), 1)
-                if self.writeProperty in object["properties"].keys():
-                    object["properties"][self.writeProperty].append(leisureEntry)
+        object["properties"][self.writeProperty] = CategoryEntries()
+        for leisure in matches:
+            properties = leisure.properties
+            leisureEntry = CategoryEntry.create(properties.get("name"), properties.get("leisure"))
+            object["properties"][self.writeProperty].append(leisureEntry)
         return object
 
     def aggregateProperties(self, leisures):
@@ -244,6 +284,8 @@ class LeisureAnnotator(OsmAnnotator):
 
 class EducationAggregator(BaseAnnotator):
 
+    readProperties = ["education"]
+
     def __init__(self):
         self.writeProperty = "education"
 
@@ -252,16 +294,16 @@ class EducationAggregator(BaseAnnotator):
         buildingType = properties.get("building")
         # could already be annotated via amenity tag
         if buildingType in ["school", "kindergarten", "university", "libary"] and not properties.get("amenity"):
-            entry = (properties.get("name", "Not named"), buildingType, 1)
+            entry = CategoryEntry.create(properties.get("name", "Not named"), buildingType)
             if "education" in properties.keys():
                 existingEntries = properties.get("education")
                 # preventing to have ("XY", kindergarten, 1) and ("Not named", kindergarten, 1)
                 for existingName, existingType, _ in existingEntries:
-                    if existingType == buildingType and entry[0] in ["Not named", existingName]:
+                    if existingType == buildingType and entry.name in ["Not named", existingName]:
                         return object
                 object["properties"]["education"].append(entry)
             else:
-                object["properties"]["education"] = [entry]
+                object["properties"]["education"] = CategoryEntries([entry])
         return object
     
     def aggregateProperties(self, leisures):
@@ -272,6 +314,8 @@ class EducationAggregator(BaseAnnotator):
 
 class SafetyAggregator(BaseAnnotator):
 
+    readProperties = ["safety"]
+
     def __init__(self):
         self.writeProperty = "safety"
     
@@ -280,16 +324,16 @@ class SafetyAggregator(BaseAnnotator):
         buildingType = properties.get("building")
         # could already be annotated via amenity tag
         if buildingType in ["police", "fire_station"] and not properties.get("amenity"):
-            entry = (properties.get("name", "Not named"), buildingType, 1)
+            entry = CategoryEntry.create(properties.get("name", "Not named"), buildingType)
             if "safety" in properties.keys():
                 existingEntries = properties.get("safety")
                 # preventing to have ("XY", police, 1) and ("Not named", police, 1)
                 for existingName, existingType, _ in existingEntries:
-                    if existingType == buildingType and entry[1] in ["Not named", existingName]:
+                    if existingType == buildingType and entry.name in ["Not named", existingName]:
                         return object
                 object["properties"]["safety"].append(entry)
             else:
-                object["properties"]["safety"] = [entry]
+                object["properties"]["safety"] = CategoryEntries([entry])
         return object
     
     def aggregateProperties(self, leisures):
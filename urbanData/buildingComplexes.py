@@ -1,7 +1,6 @@
 from collections import defaultdict
 import matplotlib.pyplot as plt
 import logging
-import json
 import geojson
 import folium
 import networkx as nx
@@ -12,7 +11,6 @@ from shapely.geometry import Polygon, LineString, mapping, shape, MultiPolygon,
 from shapely.geometry.base import BaseMultipartGeometry
 from shapely.ops import unary_union, transform, nearest_points, split
 from shapely.strtree import STRtree
-from OSMPythonTools.nominatim import Nominatim
 
 from helper.overPassHelper import OverPassHelper
 from helper.OsmDataQuery import OsmDataQuery
@@ -20,12 +18,17 @@ from helper.OsmObjectType import OsmObjectType
 from helper.geoJsonToFolium import geoFeatureCollectionToFoliumFeatureGroup
 from helper.geoJsonConverter import shapeGeomToGeoJson
 from helper.geoJsonHelper import unionFeatureCollections
+from helper.geoParquetHelper import saveGeoParquet, loadGeoParquet
+from helper.osmPoiIndex import OsmPoiIndex
+from helper.segmentAggregation import segmentSum, toFloatArray
+from helper.featureTable import FeatureTable, foreignKeyIndex, geometryOf
 from helper.coordSystemHelper import transformWgsToUtm as withUTMCoord
 
 from annotater.osmAnnotater import AddressAnnotator, OsmCompaniesAnnotator, AmentiyAnnotator, LeisureAnnotator, EducationAggregator, SafetyAggregator
 from annotater.companyAnnotator import CompanyAnnotator
 from annotater.buildingClassifier import BuildingTypeClassifier, LandUseAnnotator
 from annotater.buildingLvlAnnotator import BuildingLvlAnnotator
+from annotater.annotationPipeline import runAnnotators
 
 # TODO: also use "flurstuecke" from openDataDresden ?
 
@@ -242,7 +245,7 @@ def annotateArea(buildings, groups, regions, approachName):
     logging.info("Starting area annotation")
     for building in buildings["features"]:
         buildingLevels = building["properties"].get("levels")
-        groundArea = getPolygonArea(shape(building["geometry"]))
+        groundArea = getPolygonArea(geometryOf(building))
         building["properties"][BUILDINGAREA_KEY] = {"ground in m2": groundArea}
         if not buildingLevels:
             groupId = building["properties"]["groupId"]
@@ -261,12 +264,13 @@ def annotateArea(buildings, groups, regions, approachName):
             buildingLevels = 1
         building["properties"][BUILDINGAREA_KEY]["total in m2"] = buildingLevels *  groundArea
     
-    for group in groups["features"]:
+    buildingsPerGroup = foreignKeyIndex(groups, "__buildings")
+    groundAreas = segmentSum(toFloatArray([b["properties"][BUILDINGAREA_KEY]["ground in m2"] for b in buildings["features"]]), buildingsPerGroup)
+    totalAreas = segmentSum(toFloatArray([b["properties"][BUILDINGAREA_KEY]["total in m2"] for b in buildings["features"]]), buildingsPerGroup)
+    for group, groundArea, totalArea in zip(groups["features"], groundAreas.tolist(), totalAreas.tolist()):
         group["properties"][BUILDINGAREA_KEY] = {
-            "ground in m2": sum(
-                [buildings["features"][buildingId]["properties"][BUILDINGAREA_KEY]["ground in m2"] for buildingId in group["properties"]["__buildings"]]),
-            "total in m2": sum(
-                [buildings["features"][buildingId]["properties"][BUILDINGAREA_KEY]["total in m2"] for buildingId in group["properties"]["__buildings"]]),
+            "ground in m2": groundArea,
+            "total in m2": totalArea,
 
             "companyCount": sum([entries for type, entries in group["properties"]["companies"].items()]),
             "leisureCount": sum([entries for type, entries in group["properties"]["leisures"].items()]),
@@ -276,12 +280,13 @@ def annotateArea(buildings, groups, regions, approachName):
         }
     
     # very alike to above loop
-    for region in regions["features"]:
+    groupsPerRegion = foreignKeyIndex(regions, "__buildingGroups")
+    groundAreas = segmentSum(groundAreas, groupsPerRegion)
+    totalAreas = segmentSum(totalAreas, groupsPerRegion)
+    for region, groundArea, totalArea in zip(regions["features"], groundAreas.tolist(), totalAreas.tolist()):
         region["properties"][BUILDINGAREA_KEY] = {
-            "ground in m2": sum(
-                [groups["features"][groupId]["properties"][BUILDINGAREA_KEY]["ground in m2"] for groupId in region["properties"]["__buildingGroups"]]),
-            "total in m2": sum(
-                [groups["features"][groupId]["properties"][BUILDINGAREA_KEY]["total in m2"] for groupId in region["properties"]["__buildingGroups"]]),
+            "ground in m2": groundArea,
+            "total in m2": totalArea,
             
             "companyCount": sum([entries for type, entries in region["properties"]["companies"].items()]),
             "leisureCount": sum([entries for type, entries in region["properties"]["leisures"].items()]),
@@ -298,7 +303,7 @@ if __name__ == "__main__":
     overPassFetcher = OverPassHelper()
     areaOfInterest = 'Pieschen, Dresden, Germany'
 
-    pieschen = Nominatim().query(areaOfInterest)
+    pieschenAreaId = overPassFetcher.getAreaId(areaOfInterest)
     allBuildingsQuery = OsmDataQuery("homes", OsmObjectType.WAYANDRELATIONSHIP, ['"building"', 'abandoned!~"yes"'])
     
     osmQueries = [ allBuildingsQuery,
@@ -308,7 +313,7 @@ if __name__ == "__main__":
 
     # https://wiki.openstreetmap.org/wiki/Overpass_API/Overpass_QL#By_polygon_.28poly.29 for filtering based on polygon (if borough based on openDataDresden)
     # this query can take a while
-    osmData = overPassFetcher.directFetch(pieschen.areaId(), osmQueries)
+    osmData = overPassFetcher.directFetch(pieschenAreaId, osmQueries, concurrent=True)
 
     buildings = next(osmData)
     borders = unionFeatureCollections(*list(osmData))
@@ -320,55 +325,58 @@ if __name__ == "__main__":
         #buildings = geojson.FeatureCollection(buildings["features"][:200])
         logging.info("Fetched {} buildings".format(len(buildings["features"])))
         groups, regionsPerApproach = buildGroupsAndRegions(buildings, borders)
+        # columnar from here on (plain geojson only for files and maps)
+        buildings = FeatureTable.fromFeatureCollection(buildings)
+        groups = FeatureTable.fromFeatureCollection(groups)
+        regionsPerApproach = {name: FeatureTable.fromFeatureCollection(regions) for name, regions in regionsPerApproach.items()}
     else:
         logging.info("Loading buildings, groups and regions")
         # TODO: index seems to be messed up when loading?
-        with open("out/data/buildings_pieschen.json", encoding='UTF-8') as file:
-            buildings = json.load(file)
-        with open("out/data/buildingGroups_pieschen.json", encoding='UTF-8') as file:
-            groups = json.load(file)
-        with open("out/data/buildingRegions_pieschen.json", encoding='UTF-8') as file:
-            regionsPerApproach = {"loaded regions": json.load(file)}
+        buildings = loadGeoParquet("out/data/buildings_pieschen.parquet", asFeatureTable=True)
+        groups = loadGeoParquet("out/data/buildingGroups_pieschen.parquet", asFeatureTable=True)
+        regionsPerApproach = {"loaded regions": loadGeoParquet("out/data/buildingRegions_pieschen.parquet", asFeatureTable=True)}
 
     # !! Change for other regions
     postalCodes = ["01127", "01139"]
     
-    # TODO: clarify dependencies between them
-    # safe bet : do not change the order !
-    annotater = [AddressAnnotator(areaOfInterest),
+    # annotators declare the properties they read and write, the osm data is fetched while the others run
+    # the result equals running them in this order
+    # osm data of all annotators is fetched with one request and shares one spatial index
+    poiIndex = OsmPoiIndex(areaOfInterest)
+    annotater = [AddressAnnotator(areaOfInterest, poiIndex=poiIndex),
                  BuildingLvlAnnotator(),
                  CompanyAnnotator(postalCodes=postalCodes),
-                 OsmCompaniesAnnotator(areaOfInterest, OsmObjectType.WAYANDNODE),
-                 LandUseAnnotator(areaOfInterest, OsmObjectType.WAY),
-                 LeisureAnnotator(areaOfInterest, OsmObjectType.WAYANDNODE),
-                 AmentiyAnnotator(areaOfInterest, OsmObjectType.WAYANDNODE),
+                 OsmCompaniesAnnotator(areaOfInterest, OsmObjectType.WAYANDNODE, poiIndex=poiIndex),
+                 LandUseAnnotator(areaOfInterest, OsmObjectType.WAY, poiIndex=poiIndex),
+                 LeisureAnnotator(areaOfInterest, OsmObjectType.WAYANDNODE, poiIndex=poiIndex),
+                 AmentiyAnnotator(areaOfInterest, OsmObjectType.WAYANDNODE, poiIndex=poiIndex),
                  BuildingTypeClassifier(),
                  SafetyAggregator(),
                  EducationAggregator()]
 
-    for annotator in annotater:
-        logging.info("Starting {}".format(annotator.__class__.__name__))
-        buildings = annotator.annotateAll(buildings)
-        groups = annotator.aggregateToGroups(buildings, groups)
-        for _, regions in regionsPerApproach.items():
-            regions = annotator.aggregateToRegions(groups, regions)
+    runAnnotators(annotater, buildings, groups, regionsPerApproach)
     
     for name, regions in regionsPerApproach.items():
         annotateArea(buildings, groups, regions, name)
 
     logging.info("save groups and regions")
 
+    savedRegions = regionsPerApproach.get("wcc", list(regionsPerApproach.values())[0])
+    # geoparquet for reloading them fast, geojson for other tools/maps
+    saveGeoParquet(buildings, "out/data/buildings_pieschen.parquet")
+    saveGeoParquet(groups, "out/data/buildingGroups_pieschen.parquet")
+    saveGeoParquet(savedRegions, "out/data/buildingRegions_pieschen.parquet")
+
     with open("out/data/buildings_pieschen.json", 'w', encoding='UTF-8') as outfile:
-            geojson.dump(buildings, outfile)
+            geojson.dump(buildings.toFeatureCollection(), outfile)
     with open("out/data/buildingGroups_pieschen.json", 'w', encoding='UTF-8') as outfile:
-            geojson.dump(groups, outfile)
+            geojson.dump(groups.toFeatureCollection(), outfile)
     with open("out/data/buildingRegions_pieschen.json", 'w', encoding='UTF-8') as outfile:
-            geojson.dump(regionsPerApproach.get("wcc", list(regionsPerApproach.values())[0]), outfile)
+            geojson.dump(savedRegions.toFeatureCollection(), outfile)
 
 
     ######### Visual 
     areaName = "Pieschen"
-    pieschenCoord = pieschen.toJSON()[0]
     map = folium.Map(
         location=[51.078875, 13.728524], tiles='Open Street Map', zoom_start=15)
 
@@ -386,12 +394,12 @@ if __name__ == "__main__":
 
     geoFeatureCollectionToFoliumFeatureGroup(areaBorder, "grey", name="Pieschen").add_to(map)
 
-    geoFeatureCollectionToFoliumFeatureGroup(buildings, "black", name="Single buildings").add_to(map)
+    geoFeatureCollectionToFoliumFeatureGroup(buildings.toFeatureCollection(), "black", name="Single buildings").add_to(map)
 
     bordersFeature = geoFeatureCollectionToFoliumFeatureGroup(borders, "#666699", "borders")
     bordersFeature.add_to(map)
 
-    buildingGroupsFeature = geoFeatureCollectionToFoliumFeatureGroup(groups, "#cc9900", "building groups")
+    buildingGroupsFeature = geoFeatureCollectionToFoliumFeatureGroup(groups.toFeatureCollection(), "#cc9900", "building groups")
     buildingGroupsFeature.add_to(map)
 
     regionColors = {
@@ -402,7 +410,7 @@ if __name__ == "__main__":
     }
     for name, regions in regionsPerApproach.items():
         buildingRegionsFeature = geoFeatureCollectionToFoliumFeatureGroup(
-            regions, regionColors[name], "building regions based on " + name, show=name == "wcc")
+            regions.toFeatureCollection(), regionColors[name], "building regions based on " + name, show=name == "wcc")
         buildingRegionsFeature.add_to(map)
 
     folium.LayerControl().add_to(map)
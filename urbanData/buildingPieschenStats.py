@@ -1,19 +1,18 @@
-from OSMPythonTools.nominatim import Nominatim
-from OSMPythonTools.overpass import overpassQueryBuilder, Overpass
 import geopandas
 
 import matplotlib.pyplot as plt
 import pandas as pd
 
 from helper.geoJsonConverter import  osmObjectsToGeoJSON
+from helper.overPassHelper import OverPassHelper
+from helper.OsmObjectType import OsmObjectType
 
 areaName = "pieschen"
 # area to query
-pieschen = Nominatim().query('Pieschen, Dresden, Germany')
+overPassHelper = OverPassHelper()
+pieschenAreaId = overPassHelper.getAreaId('Pieschen, Dresden, Germany')
 
-query = overpassQueryBuilder(
-            area=pieschen.areaId(), elementType="way", selector=["'building'"], out='geom')
-buildings = osmObjectsToGeoJSON(Overpass().query(query).toJSON()["elements"])
+buildings = osmObjectsToGeoJSON(overPassHelper.getOsmGeoObjects(pieschenAreaId, ["'building'"], OsmObjectType.WAY))
 
 buildingsGdf = geopandas.GeoDataFrame.from_features(buildings["features"])
 #buildingsGdf.plot("building", legend = True)
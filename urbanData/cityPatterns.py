@@ -8,6 +8,7 @@ from helper.crossRoadHelper import getCrossRoads, groupNearbyCrossRoads
 from helper.geoJsonHelper import unionFeatureCollections, groupBy, centerPoint, lineToPolygon
 from helper.voronoiHelper import voronoiFeatureCollection
 from helper.shapelyHelper import intersections
+from helper.geoParquetHelper import loadGeoParquet
 from annotater.buildingClassifier import BuildingType
 
 import logging
@@ -17,10 +18,8 @@ from collections import OrderedDict
 
 # set to DEBUG for more logging a more verbous describtion for some objects
 logging.basicConfig(level=logging.DEBUG)
+# area ids are resolved on first use (importing this module needs no network)
 overpassFetcher = OverPassHelper()
-dresdenAreaId = overpassFetcher.getAreaId("Dresden, Germany")
-pieschenAreaId = overpassFetcher.getAreaId("Pieschen, Dresden, Germany")
-saxonyAreaId = overpassFetcher.getAreaId("Saxony, Germany")
 
 def lessThanEqual5Levels(properties):
     # TODO add option "OnlyWithRoofTop"
@@ -61,8 +60,8 @@ def isOpenAtMidnight(openingHours):
         return False
 
 def getOpenAtMidnightThings():
-    thingsWithOpeningHour = next(OverPassHelper().directFetch(
-        dresdenAreaId, 
+    thingsWithOpeningHour = next(overpassFetcher.directFetch(
+        overpassFetcher.getAreaId("Dresden, Germany"), 
         [OsmDataQuery(
             "Midnight things", 
             OsmObjectType.ALL, 
@@ -100,6 +99,10 @@ if __name__ == "__main__":
     COMPUTE_HEATMAPS = True
     COMPUTE_VORONOI = True
 
+    dresdenAreaId = overpassFetcher.getAreaId("Dresden, Germany")
+    pieschenAreaId = overpassFetcher.getAreaId("Pieschen, Dresden, Germany")
+    saxonyAreaId = overpassFetcher.getAreaId("Saxony, Germany")
+
     map = Map(location=[51.078875, 13.728524], tiles='Stamen Toner', zoom_start=13)
     TileLayer("openstreetmap").add_to(map)
 
@@ -184,10 +187,8 @@ if __name__ == "__main__":
     logging.info(pattern)
 
     try:
-        with open("out/data/buildings_pieschen.json", encoding='UTF-8') as file:
-            buildings = geojson.load(file)
-        with open("out/data/buildingGroups_pieschen.json", encoding='UTF-8') as file:
-            buildingGroups = geojson.load(file)
+        buildings = loadGeoParquet("out/data/buildings_pieschen.parquet")
+        buildingGroups = loadGeoParquet("out/data/buildingGroups_pieschen.parquet")
     except FileNotFoundError:
         logging.error("run buildingComplexes to get buildings and their groups")
 
@@ -326,7 +327,7 @@ if __name__ == "__main__":
         "health care", 
         OsmObjectType.ALL, 
         ['"healthcare"~"doctor|dentist|center"', '"amenity"!~"pharmacy|doctors"'])
-    osmResult = overpassFetcher.directFetch(dresdenAreaId, [pharmacyQuery ,healthAmenityQuery, healthCareQuery])
+    osmResult = overpassFetcher.directFetch(dresdenAreaId, [pharmacyQuery ,healthAmenityQuery, healthCareQuery], concurrent=True)
 
     healthGroups = {
         "pharmacies": next(osmResult),
@@ -357,7 +358,7 @@ if __name__ == "__main__":
     logging.info(pattern)
     holyOsmQuery = OsmDataQuery("Religious Things", OsmObjectType.ALL, ['"amenity"~"place_of_worship"'])
     graveyardOsmQuery = OsmDataQuery("Cementries", OsmObjectType.ALL, ['"landuse"~"cemetery"'])
-    osmResult = overpassFetcher.directFetch(dresdenAreaId, [holyOsmQuery, graveyardOsmQuery])
+    osmResult = overpassFetcher.directFetch(dresdenAreaId, [holyOsmQuery, graveyardOsmQuery], concurrent=True)
     holygrounds = {
         "places of worship": next(osmResult),
         "cementries": next(osmResult)
@@ -369,7 +370,7 @@ if __name__ == "__main__":
     logging.info(pattern)
     sportsQuery = OsmDataQuery("Local Sport", OsmObjectType.ALL, ["sport", '"sport"!="no"' , '"opening_hours"!~"."'])
     fitnessCentreQuery = OsmDataQuery("Local Sport", OsmObjectType.ALL, ['"leisure"~"fitness_centre"'])
-    osmResult = overpassFetcher.directFetch(dresdenAreaId, [sportsQuery, fitnessCentreQuery])
+    osmResult = overpassFetcher.directFetch(dresdenAreaId, [sportsQuery, fitnessCentreQuery], concurrent=True)
     sports = next(osmResult)
     sportsPerTypeOfPlace = groupBy(sports, lambda x: x.get("leisure", "not specified")) 
     fitnessCentres = next(osmResult)
@@ -435,7 +436,7 @@ if __name__ == "__main__":
     logging.info(pattern)
     allotmentsAndForestQuery = OsmDataQuery("Forests", OsmObjectType.WAYANDRELATIONSHIP, ['"landuse"~"allotments|forest"'])
     gardenAndParkQuery = OsmDataQuery("Garden and parks", OsmObjectType.WAYANDRELATIONSHIP, ['"leisure"~"garden|^park$"', '"access"!~"private"'])
-    osmResult = overpassFetcher.directFetch(dresdenAreaId, [allotmentsAndForestQuery, gardenAndParkQuery])
+    osmResult = overpassFetcher.directFetch(dresdenAreaId, [allotmentsAndForestQuery, gardenAndParkQuery], concurrent=True)
     allotmentsAndForest = groupBy(next(osmResult), "landuse")
     gardenAndParks = groupBy(next(osmResult), "leisure")
     greenAreas = {**allotmentsAndForest, **gardenAndParks}
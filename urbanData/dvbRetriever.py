@@ -4,10 +4,13 @@ from helper.OsmDataQuery import OsmDataQuery
 from helper.OsmObjectType import OsmObjectType
 from helper.geoJsonHelper import groupBy, centerPoint
 from helper.overPassHelper import OverPassHelper
+from helper.requestScheduler import getScheduler, DVB_LIMITS
 import dvb
-import time
 import requests
 
+# endpoint of dvb.monitor
+DVB_MONITOR_ENDPOINT = "https://webapi.vvo-online.de/dm"
+
 logging.basicConfig(level=logging.INFO)
 
 
@@ -42,24 +45,19 @@ def callDvb(stopsByName):
     # better approach: https://github.com/kiliankoe/vvo/blob/master/documentation/webapi.md#lines (but need to get stopId using the pointFinder)
     changePoints = []
     countUniqueStops = len(stopsByName)
+    scheduler = getScheduler(DVB_MONITOR_ENDPOINT, **DVB_LIMITS)
     for index, stop in enumerate(list(stopsByName)):
         if index % 3 == 0:
             logging.info("progress: {}/{}".format(index + 1, countUniqueStops))
-        time.sleep(5)
         name = stop["properties"]["name"]
         # TODO:
         if name:
             try:
-                dvbResponse = dvb.monitor(name)
+                # transient errors are retried by the scheduler
+                dvbResponse = scheduler.call(dvb.monitor, name)
             except requests.HTTPError:
-                logging.error(
-                    "dvb said no for {}, timeout for 30s".format(name))
-                time.sleep(10)
-                try:
-                    # poor mans retry
-                    dvbResponse = dvb.monitor(name)
-                except requests.HTTPError:
-                    continue
+                logging.error("dvb said no for {}".format(name))
+                continue
             if dvbResponse:
                 lines = list(set([info.get("line", None)
                                   for info in dvbResponse if info]))
@@ -13,3 +13,5 @@ class OsmDataQuery():
     groupByProperty: str = ""
     # TODO: refactor into OsmQueryResult ?
     filePath: str = None
+    # keys ("way/123") of the elements created, modified or deleted by the last incremental fetch
+    changedIds: set = None
@@ -0,0 +1,86 @@
+import re
+from dataclasses import dataclass
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from typing import Dict, List
+
+HOUSE_NUMBER_PATTERN = re.compile(r"^(\d+)(.*)$")
+# osm allows multiple house numbers in one addr:housenumber (f.i. "8;10")
+HOUSE_NUMBER_SEPARATORS = re.compile(r"[;,]")
+
+
+@dataclass
+class HouseNumberRange():
+    start: str
+    end:   str
+
+
+def normalizeHouseNumber(houseNumber: str) -> str:
+    """lowercase without whitespaces (like CompanyAnnotator.extractHousenumber) f.i. ' 3 A' -> '3a'"""
+    return houseNumber.lower().replace(" ", "")
+
+
+def houseNumberSortKey(houseNumber: str):
+    """numeric order instead of lexical one ('9' < '10' < '10a'), numbers without digits are sorted last"""
+    match = HOUSE_NUMBER_PATTERN.match(houseNumber)
+    if match:
+        return (int(match.group(1)), match.group(2))
+    return (float("inf"), houseNumber)
+
+
+class AddressIndex():
+    """
+    buildings indexed by address key (see AddressAnnotator.generateAddressKey) and normalized house number
+    for single house numbers a dict lookup, for house number ranges a binary search on the sorted numbers of the street
+    """
+
+    def __init__(self, buildings, addressProperty="addresses"):
+        # (address key, house number) -> positions of the buildings with this address
+        self.positionsByAddress = defaultdict(list)
+        numbersPerStreet = defaultdict(set)
+        for position, building in enumerate(buildings["features"]):
+            addresses = building["properties"].get(addressProperty)
+            if not addresses:
+                continue
+            for addressKey, houseNumbers in addresses.items():
+                for houseNumber in houseNumbers:
+                    # the address nodes do not need to have a house number
+                    if not houseNumber:
+                        continue
+                    for number in HOUSE_NUMBER_SEPARATORS.split(houseNumber):
+                        number = normalizeHouseNumber(number)
+                        if not number:
+                            continue
+                        positions = self.positionsByAddress[(addressKey, number)]
+                        if position not in positions:
+                            positions.append(position)
+                        numbersPerStreet[addressKey].add(number)
+        # address key -> (sort keys, house numbers) both in the order of the sort keys
+        self.sortedNumbersPerStreet = {}
+        for addressKey, numbers in numbersPerStreet.items():
+            numbers = sorted(numbers, key=houseNumberSortKey)
+            self.sortedNumbersPerStreet[addressKey] = ([houseNumberSortKey(n) for n in numbers], numbers)
+
+    def __len__(self):
+        return len(self.positionsByAddress)
+
+    def houseNumbersInRange(self, addressKey: str, start: str, end: str) -> List[str]:
+        """house numbers of the street between start and end (both inclusive)"""
+        street = self.sortedNumbersPerStreet.get(addressKey)
+        if not street:
+            return []
+        sortKeys, numbers = street
+        low = bisect_left(sortKeys, houseNumberSortKey(normalizeHouseNumber(start)))
+        high = bisect_right(sortKeys, houseNumberSortKey(normalizeHouseNumber(end)))
+        return numbers[low:high]
+
+    def match(self, addressKey: str, houseNumbers: List[str]) -> Dict[int, int]:
+        """building position -> number of the house numbers (entrances) the building has"""
+        entrancesPerPosition = defaultdict(int)
+        for houseNumber in dict.fromkeys(normalizeHouseNumber(n) for n in houseNumbers):
+            for position in self.positionsByAddress.get((addressKey, houseNumber), []):
+                entrancesPerPosition[position] += 1
+        return entrancesPerPosition
+
+    def matchRange(self, addressKey: str, start: str, end: str) -> Dict[int, int]:
+        return self.match(addressKey, self.houseNumbersInRange(addressKey, start, end))
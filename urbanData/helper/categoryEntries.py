@@ -0,0 +1,61 @@
+import sys
+from typing import Iterable, NamedTuple
+
+# placeholder type of scraped companies without branch, replaced when a typed entry is merged
+VARIOUS = "various"
+TYPE_SEPARATOR = ","
+
+
+def intern(value):
+    """names and types repeat over many buildings, interned they are stored once"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class CategoryEntry(NamedTuple):
+    """entry of a companies, leisures, amenities, education or safety property (stored like a tuple)"""
+    name: str
+    type: str
+    entrances: int
+
+    @classmethod
+    def create(cls, name, type, entrances=1) -> "CategoryEntry":
+        return cls(intern(name), intern(type), entrances)
+
+    def types(self):
+        return self.type.split(TYPE_SEPARATOR) if self.type else []
+
+
+class CategoryEntries(list):
+    """
+    list of CategoryEntry with an index by name, so entries of the same name are merged in constant time
+    (only append and merge keep the index up to date)
+    """
+    __slots__ = ("positionByName",)
+
+    def __init__(self, entries: Iterable = ()):
+        super().__init__()
+        self.positionByName = {}
+        for entry in entries:
+            self.append(entry)
+
+    def append(self, entry):
+        entry = entry if isinstance(entry, CategoryEntry) else CategoryEntry.create(*entry)
+        self.positionByName.setdefault(entry.name, len(self))
+        super().append(entry)
+
+    def merge(self, name, type, entrances=1):
+        """
+            adds an entry or merges it into the existing entry with the same name
+            (the types are united and the entrances of the existing entry are kept)
+        """
+        position = self.positionByName.get(name)
+        if position is None:
+            self.append(CategoryEntry.create(name, type, entrances))
+            return
+        existing = self[position]
+        types = dict.fromkeys([type] + [t for t in existing.types() if t != VARIOUS])
+        self[position] = CategoryEntry.create(name, TYPE_SEPARATOR.join(t for t in types if t), existing.entrances)
+
+    def __reduce__(self):
+        # appending while unpickling would happen before the index exists
+        return (CategoryEntries, (list(self),))
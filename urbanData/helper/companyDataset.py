@@ -0,0 +1,103 @@
+import json
+import os
+import logging
+from pathlib import Path
+from typing import List
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from helper.addressIndex import HouseNumberRange
+
+# house numbers are stored as list of strings plus their kind
+SINGLE, LIST, RANGE = 0, 1, 2
+COMPANY_SCHEMA = pa.schema([
+    ("name", pa.string()),
+    ("branch", pa.string()),
+    ("postalCode", pa.dictionary(pa.int32(), pa.string())),
+    ("street", pa.string()),
+    ("houseNumberType", pa.int8()),
+    ("houseNumbers", pa.list_(pa.string())),
+])
+# modification time and size of the csv files the dataset was compiled from
+SOURCES_KEY = b"urbanData:sources"
+
+
+def sourceSignature(sourcePaths: List[str]):
+    signature = {}
+    for path in sourcePaths:
+        stat = os.stat(path)
+        signature[str(path)] = [stat.st_mtime_ns, stat.st_size]
+    return signature
+
+
+def isUpToDate(datasetPath, sourcePaths: List[str]):
+    """whether the dataset exists and was compiled from the current version of the source files"""
+    if not Path(datasetPath).is_file():
+        return False
+    with pa.memory_map(str(datasetPath)) as source:
+        metadata = pa.ipc.open_file(source).schema.metadata or {}
+    return json.loads(metadata.get(SOURCES_KEY, b"{}")) == sourceSignature(sourcePaths)
+
+
+def encodeHouseNumber(houseNumber):
+    if isinstance(houseNumber, str):
+        return SINGLE, [houseNumber]
+    if isinstance(houseNumber, list):
+        return LIST, houseNumber
+    if isinstance(houseNumber, HouseNumberRange):
+        return RANGE, [houseNumber.start, houseNumber.end]
+    raise ValueError("Unexpected type for houseNumber {}".format(type(houseNumber)))
+
+
+def decodeHouseNumber(houseNumberType, houseNumbers):
+    if houseNumberType == SINGLE:
+        return houseNumbers[0]
+    if houseNumberType == LIST:
+        return houseNumbers
+    return HouseNumberRange(*houseNumbers)
+
+
+def saveCompanyDataset(companies: List[dict], datasetPath, sourcePaths: List[str] = []):
+    """
+        stores the parsed companies as arrow ipc file (sorted by postal code)
+        sourcePaths: files the companies are based on (to detect outdated datasets)
+    """
+    companies = sorted(companies, key=lambda company: company["postalCode"])
+    houseNumbers = [encodeHouseNumber(company["houseNumber"]) for company in companies]
+    columns = [
+        pa.array([company["name"] for company in companies], pa.string()),
+        pa.array([company["branch"] for company in companies], pa.string()),
+        pa.array([company["postalCode"] for company in companies], pa.string()).dictionary_encode(),
+        pa.array([company["street"] for company in companies], pa.string()),
+        pa.array([houseNumberType for houseNumberType, _ in houseNumbers], pa.int8()),
+        pa.array([numbers for _, numbers in houseNumbers], pa.list_(pa.string())),
+    ]
+    metadata = {SOURCES_KEY: json.dumps(sourceSignature(sourcePaths)).encode("utf-8")}
+    table = pa.Table.from_arrays(columns, schema=COMPANY_SCHEMA.with_metadata(metadata))
+
+    datasetPath = Path(datasetPath)
+    datasetPath.parent.mkdir(parents=True, exist_ok=True)
+    tmpPath = datasetPath.with_suffix(".tmp{}".format(os.getpid()))
+    with pa.OSFile(str(tmpPath), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmpPath, datasetPath)
+    logging.info("Compiled {} companies into {}".format(table.num_rows, datasetPath))
+
+
+def loadCompanyDataset(datasetPath, postalCodes: List[str] = None) -> List[dict]:
+    """
+        companies of the dataset (file is memory mapped)
+        postalCodes: only companies with one of these postal codes (all if None)
+    """
+    with pa.memory_map(str(datasetPath)) as source:
+        table = pa.ipc.open_file(source).read_all()
+        if postalCodes is not None:
+            table = table.filter(pc.is_in(table.column("postalCode").cast(pa.string()), value_set=pa.array(postalCodes, pa.string())))
+        columns = {name: table.column(name).to_pylist() for name in table.column_names}
+    return [{"name": name, "branch": branch, "postalCode": postalCode, "street": street,
+             "houseNumber": decodeHouseNumber(houseNumberType, houseNumbers)}
+            for name, branch, postalCode, street, houseNumberType, houseNumbers
+            in zip(columns["name"], columns["branch"], columns["postalCode"], columns["street"],
+                   columns["houseNumberType"], columns["houseNumbers"])]
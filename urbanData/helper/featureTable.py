@@ -0,0 +1,280 @@
+from collections.abc import MutableMapping, Sequence
+from typing import Dict, List
+
+import numpy as np
+from shapely.geometry import shape, mapping
+
+from helper.geoJsonConverter import featureCollection
+from helper.segmentAggregation import CsrIndex
+
+# properties referencing other features by their index (groups -> buildings, regions -> groups)
+FOREIGN_KEYS = ("__buildings", "__buildingGroups")
+
+
+def toColumn(values: list):
+    """numpy array for ints, floats and bools without missing values, otherwise the list itself"""
+    types = {type(value) for value in values}
+    if types == {bool}:
+        return np.array(values, dtype=bool)
+    if types == {int}:
+        try:
+            return np.array(values, dtype=np.int64)
+        except OverflowError:
+            return values
+    if types and types <= {int, float}:
+        return np.array(values, dtype=np.float64)
+    return values
+
+
+def fitsColumn(column: np.ndarray, value):
+    if column.dtype == bool:
+        return isinstance(value, (bool, np.bool_))
+    if isinstance(value, (bool, np.bool_)):
+        return False
+    if column.dtype == np.int64:
+        return isinstance(value, (int, np.integer)) and -2**63 <= value < 2**63
+    return isinstance(value, (int, float, np.integer, np.floating))
+
+
+class FeatureTable():
+    """
+    columnar feature collection: a list of shapely geometries, one column per property (numpy array or list, None for missing)
+    and the foreign keys (lists of feature indices) as CsrIndex
+
+    can be used like a geojson FeatureCollection (table["features"][i]["properties"]["levels"]),
+    the features are views on the columns, toFeatureCollection() creates plain geojson (f.i. for maps or json files)
+    """
+
+    def __init__(self, geometries: list, columns: Dict[str, object] = None, ids: list = None, foreignKeys: Dict[str, CsrIndex] = None):
+        self.geometries = geometries
+        self.columns = columns or {}
+        self.ids = ids
+        self.foreignKeys = foreignKeys or {}
+
+    @classmethod
+    def fromFeatureCollection(cls, collection, foreignKeys=FOREIGN_KEYS) -> "FeatureTable":
+        features = collection["features"]
+        names = {}
+        for feature in features:
+            for name in feature["properties"].keys():
+                names[name] = None
+        columns = {}
+        csrIndices = {}
+        for name in names:
+            values = [feature["properties"].get(name) for feature in features]
+            if name in foreignKeys and all(value is not None for value in values):
+                csrIndices[name] = CsrIndex.fromLists(values)
+            else:
+                columns[name] = toColumn(values)
+        ids = [feature.get("id") for feature in features]
+        geometries = [shape(feature["geometry"]) if feature["geometry"] else None for feature in features]
+        return cls(geometries, columns, ids if any(id is not None for id in ids) else None, csrIndices)
+
+    def __len__(self):
+        return len(self.geometries)
+
+    # FeatureCollection interface
+    def __getitem__(self, key):
+        if key == "type":
+            return "FeatureCollection"
+        if key == "features":
+            return FeatureRows(self)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    @property
+    def __geo_interface__(self):
+        return self.toFeatureCollection()
+
+    def propertyNames(self) -> List[str]:
+        return list(self.columns.keys()) + list(self.foreignKeys.keys())
+
+    def column(self, name):
+        """values of the property per feature (numpy array or list with None for missing values)"""
+        if name in self.foreignKeys:
+            csr = self.foreignKeys[name]
+            return [csr.indices[start:end].tolist() for start, end in zip(csr.offsets[:-1].tolist(), csr.offsets[1:].tolist())]
+        return self.columns.get(name, [None] * len(self))
+
+    def setColumn(self, name, values):
+        self.foreignKeys.pop(name, None)
+        self.columns[name] = values if isinstance(values, np.ndarray) else toColumn(list(values))
+
+    def foreignKey(self, name) -> CsrIndex:
+        if name not in self.foreignKeys:
+            self.foreignKeys[name] = CsrIndex.fromLists(self.column(name))
+            self.columns.pop(name, None)
+        return self.foreignKeys[name]
+
+    def getValue(self, row, name):
+        if name in self.foreignKeys:
+            csr = self.foreignKeys[name]
+            return csr.indices[csr.offsets[row]:csr.offsets[row + 1]].tolist()
+        column = self.columns.get(name)
+        if column is None:
+            return None
+        value = column[row]
+        return value.item() if isinstance(value, np.generic) else value
+
+    def setValue(self, row, name, value):
+        if name in self.foreignKeys:
+            # foreign keys are not changed by the annotators, thus simply converted back
+            self.columns[name] = self.column(name)
+            del self.foreignKeys[name]
+        column = self.columns.get(name)
+        if column is None:
+            column = self.columns[name] = [None] * len(self)
+        elif isinstance(column, np.ndarray) and not fitsColumn(column, value):
+            column = self.columns[name] = column.tolist()
+        column[row] = value
+
+    def toFeature(self, row) -> dict:
+        properties = {}
+        for name in self.propertyNames():
+            value = self.getValue(row, name)
+            if value is not None:
+                properties[name] = value
+        geometry = self.geometries[row]
+        feature = {"type": "Feature", "geometry": mapping(geometry) if geometry is not None else None, "properties": properties}
+        if self.ids is not None and self.ids[row] is not None:
+            feature["id"] = self.ids[row]
+        return feature
+
+    def toFeatureCollection(self):
+        """plain geojson feature collection"""
+        return featureCollection([self.toFeature(row) for row in range(len(self))])
+
+
+def foreignKeyIndex(collection, foreignKey) -> CsrIndex:
+    """foreign key of a FeatureTable or FeatureCollection as CsrIndex"""
+    if isinstance(collection, FeatureTable):
+        return collection.foreignKey(foreignKey)
+    return CsrIndex.fromFeatures(collection["features"], foreignKey)
+
+
+def geometryOf(feature):
+    """shapely geometry of a feature (the stored one for features of a FeatureTable instead of converting it to geojson and back)"""
+    if isinstance(feature, FeatureRow):
+        return feature.table.geometries[feature.row]
+    return shape(feature["geometry"]) if feature["geometry"] else None
+
+
+def propertyValues(collection, name):
+    if isinstance(collection, FeatureTable):
+        return collection.column(name)
+    return [feature["properties"].get(name) for feature in collection["features"]]
+
+
+def setPropertyValues(collection, name, values):
+    if isinstance(collection, FeatureTable):
+        collection.setColumn(name, values)
+    else:
+        for feature, value in zip(collection["features"], values):
+            feature["properties"][name] = value
+
+
+class FeatureRows(Sequence):
+    """features of a FeatureTable"""
+
+    def __init__(self, table: FeatureTable):
+        self.table = table
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [FeatureRow(self.table, row) for row in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return FeatureRow(self.table, index)
+
+
+class FeatureRow(MutableMapping):
+    """view on one feature of a FeatureTable, pickled as plain geojson feature (f.i. for worker processes)"""
+
+    def __init__(self, table: FeatureTable, row: int):
+        self.table = table
+        self.row = row
+
+    def keys(self):
+        return ["type", "id", "geometry", "properties"] if self.table.ids is not None else ["type", "geometry", "properties"]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __getitem__(self, key):
+        if key == "type":
+            return "Feature"
+        if key == "properties":
+            return RowProperties(self.table, self.row)
+        if key == "geometry":
+            geometry = self.table.geometries[self.row]
+            return mapping(geometry) if geometry is not None else None
+        if key == "id" and self.table.ids is not None:
+            return self.table.ids[self.row]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key == "properties":
+            properties = RowProperties(self.table, self.row)
+            properties.clear()
+            properties.update(value)
+        elif key == "geometry":
+            self.table.geometries[self.row] = shape(value) if value else None
+        elif key == "id":
+            if self.table.ids is None:
+                self.table.ids = [None] * len(self.table)
+            self.table.ids[self.row] = value
+        else:
+            raise KeyError("Features of a FeatureTable can not have {}".format(key))
+
+    def __delitem__(self, key):
+        raise KeyError("Features of a FeatureTable can not remove {}".format(key))
+
+    def __reduce__(self):
+        return (dict, (self.table.toFeature(self.row),))
+
+
+class RowProperties(MutableMapping):
+    """properties of one feature of a FeatureTable (a property is missing if its value is None)"""
+
+    def __init__(self, table: FeatureTable, row: int):
+        self.table = table
+        self.row = row
+
+    def __getitem__(self, name):
+        value = self.table.getValue(self.row, name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def __setitem__(self, name, value):
+        self.table.setValue(self.row, name, value)
+
+    def __delitem__(self, name):
+        if self.table.getValue(self.row, name) is None:
+            raise KeyError(name)
+        self.table.setValue(self.row, name, None)
+
+    def __iter__(self):
+        return iter([name for name in self.table.propertyNames() if self.table.getValue(self.row, name) is not None])
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def __reduce__(self):
+        return (dict, (dict(self.items()),))
@@ -1,16 +1,47 @@
 import geojson
 import logging
-from shapely.geometry import mapping
-import networkx as nx
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from shapely.geometry import mapping, Polygon
+from shapely.prepared import prep
 
 POLYGON_TAGS = set(["building", "landuse", "area"])
 LINESTRING_TAGS = set(["boundary"])
 
-def osmObjectsToGeoJSON(osmObjects, polygonize = False):
-    """given a list osm-objects as json (! in geom out-format!)
+# geojson rounds every coordinate to this precision on creation
+COORDINATE_PRECISION = 6
+# elements per task of the process pool (for relations: members per task, bigger relations are send alone)
+CHUNK_SIZE = 5000
+
+def osmObjectsToGeoJSON(osmObjects, polygonize = False, validate = False, processes = None):
+    """given a list (or generator) of osm-objects as json (! in geom out-format!)
         polygonize: try to convert every way to a polygon
+        validate: additionally validate the result with the geojson library (slow for big areas)
+        processes: number of processes converting chunks of the elements in parallel (None: no process pool)
     """
-    features = []
+    if processes:
+        features = osmObjectsToFeaturesParallel(list(osmObjects), polygonize, processes)
+    else:
+        features = list(osmObjectsToFeatures(osmObjects, polygonize))
+    result = featureCollection(features)
+    if validate:
+        # features are plain dicts, thus convert them to geojson objects for validation
+        for error in geojson.loads(geojson.dumps(result)).errors():
+            if error:
+                raise ValueError(
+                    "Error converting osm object to geojson: {}".format(error))
+    return result
+
+
+def featureCollection(features):
+    """FeatureCollection without converting each feature (dict) into a geojson object"""
+    collection = geojson.FeatureCollection([])
+    collection["features"] = features
+    return collection
+
+
+def osmObjectsToFeatures(osmObjects, polygonize = False):
+    """generator converting one osm-object after another into a geojson feature (as plain dict)"""
     for object in osmObjects:
         type = object["type"]
         properties = object["tags"]
@@ -19,14 +50,62 @@ def osmObjectsToGeoJSON(osmObjects, polygonize = False):
             properties["__nodeIds"] = object["nodes"]
         elif type == "node":
             properties["__nodeId"] = object["id"]
-        feature = geojson.Feature(
-            id=object["id"], geometry=geometry, properties=properties)
-        features.append(feature)
-    result = geojson.FeatureCollection(features, validate=True)
-    for error in result.errors():
-        raise ValueError(
-            "Error converting osm object to geojson: {}".format(error))
-    return result
+        # geojson.Feature would clean and round the coordinates again
+        yield {"type": "Feature", "id": object["id"], "geometry": geometry, "properties": properties}
+
+
+def convertChunk(osmObjects, polygonize):
+    return list(osmObjectsToFeatures(osmObjects, polygonize))
+
+
+def conversionChunks(osmObjects, chunkSize = CHUNK_SIZE):
+    """
+        indices of the elements per task: relations are grouped up to chunkSize members
+        (the overhead of a task would outweigh converting a small relation), the others by chunkSize elements
+    """
+    relationIndices = [index for index, object in enumerate(osmObjects) if object["type"] == "relation"]
+    otherIndices = [index for index, object in enumerate(osmObjects) if object["type"] != "relation"]
+    # biggest relations first, so they do not end up as the last running tasks
+    relationIndices.sort(key=lambda index: len(osmObjects[index]["members"]), reverse=True)
+    chunks = []
+    chunkMembers = 0
+    for index in relationIndices:
+        members = len(osmObjects[index]["members"])
+        if chunks and chunkMembers + members <= chunkSize:
+            chunks[-1].append(index)
+            chunkMembers += members
+        else:
+            chunks.append([index])
+            chunkMembers = members
+    chunks += [otherIndices[start:start + chunkSize] for start in range(0, len(otherIndices), chunkSize)]
+    return chunks
+
+
+def osmObjectsToFeaturesParallel(osmObjects, polygonize, processes, chunkSize = CHUNK_SIZE):
+    """converts the elements in a process pool, returns the features in the order of the elements"""
+    chunks = conversionChunks(osmObjects, chunkSize)
+    features = [None] * len(osmObjects)
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [(chunk, executor.submit(convertChunk, [osmObjects[index] for index in chunk], polygonize)) for chunk in chunks]
+        for chunk, future in futures:
+            for index, feature in zip(chunk, future.result()):
+                features[index] = feature
+    return features
+
+
+def geometry(type, coordinates):
+    return {"type": type, "coordinates": coordinates}
+
+
+def lineCoordinates(positions):
+    """[[lon, lat], ...] of the positions of a way (rounded like by geojson)"""
+    coordinates = np.array([(pos["lon"], pos["lat"]) for pos in positions], dtype=float)
+    return np.round(coordinates, COORDINATE_PRECISION).tolist()
+
+
+def isLinearRing(line):
+    """same check as geojson for polygon rings"""
+    return len(line) >= 4 and line[0] == line[-1]
 
 
 def osmToGeoJsonGeometry(object, polygonize):
@@ -38,45 +117,42 @@ def osmToGeoJsonGeometry(object, polygonize):
     """
     if object["type"] == "relation":
             relMembers = object["members"]
-            outerGeometries = [osmToGeoJsonGeometry(m, polygonize) for m in relMembers if m['role'] in ["outer",'', 'outline']]
-            isMultiPolygon = False
-
-            if outerGeometries:
-                # members are unordered, thus for a boundary we need to order them
-                exteriorLineCount, exteriorLines = transformToBoundaryLine(outerGeometries)
-                if exteriorLines:
-                    outerGeometries = exteriorLines
-                if exteriorLineCount > 1:
-                    isMultiPolygon = True
-            innerGeometries = [osmToGeoJsonGeometry(m, polygonize) for m in relMembers if m['role'] == "inner"]
-
-            if not isMultiPolygon:
-                coordinates = outerGeometries + innerGeometries
-            else:
-                # TODO: if multiPolygon -> match innerGeometries ("holes") to exteriorLine
-                logging.info("Leaving out holes for osm-way with id: {}".format(object["id"]))
-                coordinates = outerGeometries
-
-            if coordinates:
-                return tryToConvertToPolygon(object.get("tags",{}), coordinates, polygonize, isMultiPolygon = isMultiPolygon)
-            else:
+            # members are always lines (even if they are closed)
+            outerLines = [lineCoordinates(m["geometry"]) for m in relMembers
+                          if m['role'] in ["outer",'', 'outline'] and m["type"] == "way" and m.get("geometry")]
+            innerLines = [lineCoordinates(m["geometry"]) for m in relMembers
+                          if m['role'] == "inner" and m["type"] == "way" and m.get("geometry")]
+            if not outerLines:
                 logging.error("Relationship uses exotic role types. Thus could not convert to geometry. Types: {}".format(
                     [m['role'] for m in relMembers]))
-                return geojson.Point([0,0])
+                return geometry("Point", [0, 0])
+
+            # members are unordered and often split, thus for a boundary we need to join them
+            outerRings, openOuterLines = assembleRings(outerLines)
+            if openOuterLines:
+                # f.i. routes or relations cut at the border of the queried area
+                return tryToConvertToPolygon(object.get("tags",{}), outerLines + innerLines, polygonize)
+            innerRings, openInnerLines = assembleRings(innerLines)
+            if openInnerLines:
+                logging.debug("Leaving out {} unclosed inner lines for osm-relation with id: {}".format(len(openInnerLines), object["id"]))
+
+            if len(outerRings) == 1:
+                return tryToConvertToPolygon(object.get("tags",{}), outerRings + innerRings, polygonize)
+            polygons = assignHoles(outerRings, innerRings)
+            return tryToConvertToPolygon(object.get("tags",{}), polygons, polygonize, isMultiPolygon = True)
     elif object["type"] == "way":
-        points = [[pos["lon"], pos["lat"]] for pos in object["geometry"]]
+        points = lineCoordinates(object["geometry"])
     elif object["type"] == "node":
-        points = [[object["lon"], object["lat"]]]
+        points = [[round(object["lon"], COORDINATE_PRECISION), round(object["lat"], COORDINATE_PRECISION)]]
     else:
         raise ValueError("{} neither node, way or rel conform geometry".format(object))
-    if points is None:
+    if not points:
         raise ValueError('osm object has no geometry {}'.format(object))
     if len(points) > 1:
         # [points] as ways can only be a simple line
         return tryToConvertToPolygon(object.get("tags",{}), [points], polygonize)
     else:
-        assert(len(points) == 1)
-        return geojson.Point(points[0], validate=True)
+        return geometry("Point", points[0])
 
 def tryToConvertToPolygon(tags, lines, polygonize, isMultiPolygon = False):
     """
@@ -84,63 +160,88 @@ def tryToConvertToPolygon(tags, lines, polygonize, isMultiPolygon = False):
         tags: tags of the base object
         lines: coordinates (basically nested lists)
         polygonize: boolean, if True -> tries to convert every Line to Polygon
-        isMultiPolygon: boolean, if each line is an extra polygon else lines = [boundary, holes..]
+        isMultiPolygon: boolean, if lines is a list of polygons ([exterior, holes..]) else lines = [boundary, holes..]
     """
     # as sometimes tags like "area":"no" exists, which are obviously no polygons
     tags = {tag: v for tag, v in tags.items() if not v == "no"}
+    polygons = lines if isMultiPolygon else [lines]
 
     # osm-multipolygon: means just as complex area ... but geojson polygons can also handle holes
     # sometimes they are real multipolygons? (see Dresdener Heide) --> isMultiPolygon
     if POLYGON_TAGS.intersection(tags) or tags.get("type") == "multipolygon" or polygonize: 
-        if isMultiPolygon:
-            # creating a polygon array for each line (only exterior lines, no holes currently)
-            lines = [[line] for line in lines]
-            polygon = geojson.MultiPolygon(lines)
-        else:
-            polygon = geojson.Polygon(lines)
-        if not polygon.errors():
-            return polygon
+        if all(isLinearRing(ring) for polygon in polygons for ring in polygon):
+            if isMultiPolygon:
+                return geometry("MultiPolygon", polygons)
+            return geometry("Polygon", lines)
         elif not polygonize:
             # with polygonize == true it is expected that this wont work every time
             logging.debug("Could not be converted to a polygon with tags {}".format(tags))
+    lines = [line for polygon in polygons for line in polygon]
+    if any(len(line) < 2 for line in lines):
+        raise ValueError("Each line must contain at least 2 positions: {}".format(lines))
     if len(lines) == 1:
-        return geojson.LineString(lines[0], validate=True)
+        return geometry("LineString", lines[0])
     else:
         if LINESTRING_TAGS.intersection(tags):
             logging.debug("To many lines for a simple line for object with tags: {}".format(tags))
-        return geojson.MultiLineString(lines, validate=True)
+        return geometry("MultiLineString", lines)
 
-def transformToBoundaryLine(lines):
+def assembleRings(lines):
     """
-        tries to find an euler circuit for each components (based on all lines/line segments)
-        returns a tuple (number of boundary lines (= number of polygons), list of the boundary lines)
+        joins lines (f.i. the member ways of a multipolygon) at matching endpoints to closed rings
+        returns a tuple (list of rings, list of lines which could not be closed)
     """
-    graph = nx.Graph()
-    # init graph
-    for line in lines:
-        points = [tuple(p)  for p in line["coordinates"]]
-        for p in points:
-            graph.add_node(p)
-        for start, end in zip(points, points[1:]): 
-            graph.add_edge(start, end)
-    
-    # each subgraph is one boundary line
-    subgraphs = list(nx.connected_component_subgraphs(graph))
-    lines = []
-    for graph in subgraphs:
-        try:
-            edges = list(nx.eulerian_circuit(graph))
-            startpoint = edges[0][0]
-            points = [start for start, end in edges]
-            # add startpoint, as polygon rings have to end, where they started
-            points.append(startpoint)
-            lines.append(points)
-        except nx.NetworkXError:
-            # TODO: allow partly lines and partly polygons
-            logging.debug("One of the boundary lines was not an euler train .. a very weird shape this one has")
-            return 0, None
-    return len(lines), lines
-    
+    rings = []
+    openLineIndices = []
+    # endpoint -> indices of the open lines starting or ending there
+    linesByEndpoint = {}
+    for index, line in enumerate(lines):
+        if isLinearRing(line):
+            rings.append(line)
+        elif line:
+            openLineIndices.append(index)
+            linesByEndpoint.setdefault(tuple(line[0]), []).append(index)
+            linesByEndpoint.setdefault(tuple(line[-1]), []).append(index)
+
+    used = set()
+    openLines = []
+    for index in openLineIndices:
+        if index in used:
+            continue
+        used.add(index)
+        ring = list(lines[index])
+        while ring[0] != ring[-1]:
+            candidates = [i for i in linesByEndpoint[tuple(ring[-1])] if i not in used]
+            if not candidates:
+                break
+            used.add(candidates[0])
+            line = lines[candidates[0]]
+            # ways of a multipolygon do not need to have the same direction
+            ring.extend(line[1:] if line[0] == ring[-1] else line[-2::-1])
+        if isLinearRing(ring):
+            rings.append(ring)
+        else:
+            openLines.append(ring)
+    return rings, openLines
+
+
+def assignHoles(exteriorRings, holes):
+    """
+        creates a polygon (list of rings) for each exterior ring with the holes lying inside
+        each hole is assigned to the smallest exterior ring containing it
+    """
+    exteriors = sorted([(Polygon(ring).area, index, prep(Polygon(ring))) for index, ring in enumerate(exteriorRings)])
+    polygons = [[ring] for ring in exteriorRings]
+    for hole in holes:
+        point = Polygon(hole).representative_point()
+        for _, index, exterior in exteriors:
+            if exterior.contains(point):
+                polygons[index].append(hole)
+                break
+        else:
+            logging.debug("Leaving out hole, which lies in no exterior ring")
+    return polygons
+
 
 def shapeGeomToGeoJson(shape, properties = None):
     """converts a shaply geometry to a geojson Feature"""
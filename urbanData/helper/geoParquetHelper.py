@@ -0,0 +1,231 @@
+import json
+import struct
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from shapely import wkb
+from shapely.geometry import mapping
+
+from helper.geoJsonConverter import featureCollection
+from helper.featureTable import FeatureTable, FOREIGN_KEYS, geometryOf
+from helper.segmentAggregation import CsrIndex
+
+# GeoParquet 1.0 (https://geoparquet.org/releases/v1.0.0/): geometries as WKB + "geo" metadata
+GEOMETRY_COLUMN = "geometry"
+ID_COLUMN = "__featureId"
+# properties which cannot be stored as arrow types (f.i. dicts or lists of tuples) are stored as json strings
+JSON_COLUMNS_KEY = b"urbanData:jsonColumns"
+WKB_GEOMETRY_TYPES = {1: "Point", 2: "LineString", 3: "Polygon", 4: "MultiPoint", 5: "MultiLineString", 6: "MultiPolygon", 7: "GeometryCollection"}
+# flag of the geometry type for 3d coordinates (as written by GEOS)
+WKB_Z_FLAG = 0x80000000
+
+
+class UnsupportedWkb(ValueError):
+    pass
+
+
+def wkbToGeoJson(data: bytes) -> dict:
+    """
+        geojson geometry of a WKB geometry, equal to mapping(wkb.loads(data))
+        (mapping reads every coordinate via the shapely geometry, which made it the slowest part of loading)
+    """
+    try:
+        geometry, _ = readWkb(data, 0)
+        return geometry
+    except UnsupportedWkb:
+        return mapping(wkb.loads(data))
+
+
+def readWkb(data: bytes, offset):
+    """returns the geojson geometry starting at the offset and the offset after it"""
+    byteOrder = "<" if data[offset] == 1 else ">"
+    typeCode, = struct.unpack_from(byteOrder + "I", data, offset + 1)
+    offset += 5
+    dimensions = 3 if typeCode & WKB_Z_FLAG else 2
+    typeCode &= ~WKB_Z_FLAG
+    if typeCode not in WKB_GEOMETRY_TYPES:
+        raise UnsupportedWkb(typeCode)
+    geometryType = WKB_GEOMETRY_TYPES[typeCode]
+
+    def readPoints(offset):
+        count, = struct.unpack_from(byteOrder + "I", data, offset)
+        points = np.frombuffer(data, byteOrder + "f8", count * dimensions, offset + 4).reshape(count, dimensions)
+        return tuple(map(tuple, points.tolist())), offset + 4 + count * dimensions * 8
+
+    if typeCode == 1:
+        coordinates = tuple(np.frombuffer(data, byteOrder + "f8", dimensions, offset).tolist())
+        return {"type": geometryType, "coordinates": coordinates}, offset + dimensions * 8
+    if typeCode == 2:
+        coordinates, offset = readPoints(offset)
+        return {"type": geometryType, "coordinates": coordinates}, offset
+    count, = struct.unpack_from(byteOrder + "I", data, offset)
+    offset += 4
+    parts = []
+    for _ in range(count):
+        if typeCode == 3:
+            part, offset = readPoints(offset)
+        else:
+            part, offset = readWkb(data, offset)
+        parts.append(part)
+    if typeCode == 3:
+        return {"type": geometryType, "coordinates": tuple(parts)}, offset
+    if typeCode == 7:
+        return {"type": geometryType, "geometries": parts}, offset
+    coordinates = [part["coordinates"] for part in parts]
+    # like shapely, only the polygons of a MultiPolygon are in a list
+    return {"type": geometryType, "coordinates": coordinates if typeCode == 6 else tuple(coordinates)}, offset
+
+
+def containsStruct(dataType: pa.DataType):
+    """dicts would be inferred as struct (with the union of all keys), but should stay dicts"""
+    if pa.types.is_struct(dataType) or pa.types.is_map(dataType):
+        return True
+    if pa.types.is_list(dataType) or pa.types.is_large_list(dataType):
+        return containsStruct(dataType.value_type)
+    return False
+
+
+def toArrowColumn(values):
+    """returns (arrow array, whether it is json encoded)"""
+    try:
+        array = pa.array(values)
+        if not containsStruct(array.type):
+            return array, False
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, OverflowError):
+        pass
+    return pa.array([json.dumps(v) if v is not None else None for v in values], type=pa.string()), True
+
+
+def featureCollectionToTable(featureCollection) -> pa.Table:
+    """one column per property (missing properties are null) plus the geometry as WKB"""
+    if isinstance(featureCollection, FeatureTable):
+        return featureTableToTable(featureCollection)
+    features = featureCollection["features"]
+    propertyNames = {}
+    for feature in features:
+        for key in feature["properties"].keys():
+            propertyNames[key] = None
+
+    ids = [feature.get("id") for feature in features]
+    propertyColumns = ((name, [feature["properties"].get(name) for feature in features]) for name in propertyNames)
+    geometries = [geometryOf(f) for f in features]
+    return columnsToTable(ids, propertyColumns, geometries)
+
+
+def featureTableToTable(features: FeatureTable) -> pa.Table:
+    """like featureCollectionToTable, but typed columns and foreign keys are converted as a whole"""
+    propertyColumns = []
+    for name in features.propertyNames():
+        if name in features.foreignKeys:
+            csr = features.foreignKeys[name]
+            propertyColumns.append((name, pa.ListArray.from_arrays(pa.array(csr.offsets, pa.int32()), pa.array(csr.indices))))
+        else:
+            propertyColumns.append((name, features.column(name)))
+    return columnsToTable(features.ids or [], propertyColumns, features.geometries)
+
+
+def columnsToTable(ids, propertyColumns, geometries) -> pa.Table:
+    columns = {}
+    jsonColumns = []
+    if any(id is not None for id in ids):
+        columns[ID_COLUMN], _ = toArrowColumn(ids)
+    for name, values in propertyColumns:
+        if isinstance(values, pa.Array):
+            array, isJson = values, False
+        else:
+            array, isJson = toArrowColumn(values)
+        if pa.types.is_null(array.type):
+            continue
+        columns[name] = array
+        if isJson:
+            jsonColumns.append(name)
+    columns[GEOMETRY_COLUMN] = pa.array([wkb.dumps(g) if g is not None else None for g in geometries], type=pa.binary())
+
+    geometryTypes = sorted({g.geom_type for g in geometries if g is not None})
+    geoMetadata = {
+        "version": "1.0.0",
+        "primary_column": GEOMETRY_COLUMN,
+        "columns": {GEOMETRY_COLUMN: {"encoding": "WKB", "geometry_types": geometryTypes}}
+    }
+    metadata = {b"geo": json.dumps(geoMetadata).encode("utf-8"), JSON_COLUMNS_KEY: json.dumps(jsonColumns).encode("utf-8")}
+    return pa.table(columns).replace_schema_metadata(metadata)
+
+
+def decodeJsonColumn(values):
+    """json strings of a column parsed with one call (null for missing values)"""
+    return json.loads("[" + ",".join(value if value is not None else "null" for value in values) + "]")
+
+
+def tableToFeatureCollection(table: pa.Table):
+    """inverse of featureCollectionToTable (null values are left out of the properties)"""
+    metadata = table.schema.metadata or {}
+    jsonColumns = set(json.loads(metadata.get(JSON_COLUMNS_KEY, b"[]")))
+    columnNames = [name for name in table.column_names if name not in [GEOMETRY_COLUMN, ID_COLUMN]]
+    propertyColumns = [decodeJsonColumn(table.column(name).to_pylist()) if name in jsonColumns else table.column(name).to_pylist()
+                       for name in columnNames]
+    ids = table.column(ID_COLUMN).to_pylist() if ID_COLUMN in table.column_names else [None] * table.num_rows
+    geometries = table.column(GEOMETRY_COLUMN).to_pylist() if GEOMETRY_COLUMN in table.column_names else [None] * table.num_rows
+
+    features = []
+    rows = zip(*propertyColumns) if propertyColumns else ([] for _ in range(table.num_rows))
+    for id, geometry, values in zip(ids, geometries, rows):
+        properties = {name: value for name, value in zip(columnNames, values) if value is not None}
+        # plain dicts, as geojson.Feature would validate and round every coordinate again
+        feature = {"type": "Feature", "geometry": wkbToGeoJson(geometry) if geometry else None, "properties": properties}
+        if id is not None:
+            feature["id"] = id
+        features.append(feature)
+    return featureCollection(features)
+
+
+def tableToFeatureTable(table: pa.Table) -> FeatureTable:
+    """inverse of featureTableToTable: numeric columns without nulls stay numpy arrays, foreign keys become CsrIndex"""
+    metadata = table.schema.metadata or {}
+    jsonColumns = set(json.loads(metadata.get(JSON_COLUMNS_KEY, b"[]")))
+    columns = {}
+    foreignKeys = {}
+    for name in table.column_names:
+        if name in [GEOMETRY_COLUMN, ID_COLUMN]:
+            continue
+        array = table.column(name).combine_chunks()
+        if name in jsonColumns:
+            columns[name] = decodeJsonColumn(array.to_pylist())
+        elif name in FOREIGN_KEYS and pa.types.is_list(array.type) and array.null_count == 0:
+            offsets = array.offsets.to_numpy().astype(np.int64)
+            indices = array.values.to_numpy(zero_copy_only=False)[offsets[0]:offsets[-1]].astype(np.int64)
+            foreignKeys[name] = CsrIndex(offsets - offsets[0], indices)
+        elif array.null_count == 0 and (pa.types.is_integer(array.type) or pa.types.is_floating(array.type) or pa.types.is_boolean(array.type)):
+            columns[name] = array.to_numpy(zero_copy_only=False)
+        else:
+            columns[name] = array.to_pylist()
+    ids = table.column(ID_COLUMN).to_pylist() if ID_COLUMN in table.column_names else None
+    if GEOMETRY_COLUMN in table.column_names:
+        geometries = [wkb.loads(g) if g else None for g in table.column(GEOMETRY_COLUMN).to_pylist()]
+    else:
+        geometries = [None] * table.num_rows
+    return FeatureTable(geometries, columns, ids, foreignKeys)
+
+
+def saveGeoParquet(featureCollection, path):
+    pq.write_table(featureCollectionToTable(featureCollection), path)
+
+
+def loadGeoParquet(path, properties=None, withGeometry=True, asFeatureTable=False):
+    """
+        loads a feature collection saved by saveGeoParquet (file is memory mapped)
+        properties: only load these properties (all if None)
+        withGeometry: whether to load and decode the geometries
+        asFeatureTable: returns a (columnar) FeatureTable instead of geojson
+    """
+    columns = None
+    if properties is not None:
+        schemaNames = pq.read_schema(path).names
+        columns = [name for name in properties + [ID_COLUMN] if name in schemaNames]
+        if withGeometry:
+            columns.append(GEOMETRY_COLUMN)
+    elif not withGeometry:
+        columns = [name for name in pq.read_schema(path).names if not name == GEOMETRY_COLUMN]
+    table = pq.read_table(path, columns=columns, memory_map=True)
+    if asFeatureTable:
+        return tableToFeatureTable(table)
+    return tableToFeatureCollection(table)
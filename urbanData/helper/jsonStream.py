@@ -0,0 +1,73 @@
+import re
+import json
+import codecs
+
+CHUNK_SIZE = 64 * 1024
+
+
+class JsonArrayStream():
+    """
+    incrementally parses the items of a json array (stored under the given key) from text chunks
+    only the currently parsed item is kept in memory (not the whole document)
+
+    remainder: text after the array (only set after the items were consumed)
+    """
+
+    def __init__(self, chunks, key="elements"):
+        self.chunks = iter(chunks)
+        self.keyPattern = re.compile(r'"{}"\s*:\s*\['.format(re.escape(key)))
+        self.remainder = None
+
+    @classmethod
+    def fromBytes(cls, byteChunks, key="elements", encoding="utf-8"):
+        # incremental decoding, as a multi byte character can be split between chunks
+        return cls(codecs.iterdecode(byteChunks, encoding), key)
+
+    @classmethod
+    def fromFile(cls, file, key="elements"):
+        return cls(iter(lambda: file.read(CHUNK_SIZE), ""), key)
+
+    def readChunk(self):
+        """next chunk or None if the input is exhausted"""
+        return next(self.chunks, None)
+
+    def __iter__(self):
+        decoder = json.JSONDecoder()
+        buffer = ""
+        while True:
+            match = self.keyPattern.search(buffer)
+            if match:
+                buffer = buffer[match.end():]
+                break
+            chunk = self.readChunk()
+            if chunk is None:
+                raise ValueError("Could not find key {} in json stream".format(self.keyPattern.pattern))
+            buffer += chunk
+
+        position = 0
+        while True:
+            # skip separators between items
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position < len(buffer) and buffer[position] == "]":
+                self.remainder = buffer[position + 1:] + "".join(iter(self.readChunk, None))
+                return
+            try:
+                if position == len(buffer):
+                    raise json.JSONDecodeError("Need more data", buffer, position)
+                item, position = decoder.raw_decode(buffer, position)
+                yield item
+            except json.JSONDecodeError:
+                # item is not complete yet -> read at least as much as already buffered (avoids quadratic re-parsing)
+                buffer = buffer[position:]
+                position = 0
+                neededLength = max(2 * len(buffer), CHUNK_SIZE)
+                readSomething = False
+                while len(buffer) < neededLength:
+                    chunk = self.readChunk()
+                    if chunk is None:
+                        break
+                    buffer += chunk
+                    readSomething = True
+                if not readSomething:
+                    raise ValueError("Json stream ended inside of the array")
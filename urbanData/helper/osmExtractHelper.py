@@ -0,0 +1,245 @@
+import re
+import logging
+import xml.etree.ElementTree as ET
+from typing import Dict, List
+
+from shapely.geometry import LineString, Point
+from shapely.ops import polygonize, unary_union
+from shapely.prepared import prep
+
+from helper.overPassHelper import OverPassHelper
+
+# overpass area ids are derived from the osm ids
+RELATION_AREA_OFFSET = 3600000000
+WAY_AREA_OFFSET = 2400000000
+
+# f.i. "building" | "amenity"="townhall" | 'railway'~'rail' | amenity!~"." | !"name"
+TAG_FILTER_PATTERN = re.compile(
+    r"""^\s*(?P<negateKey>!?)\s*(?:"(?P<quotedKey>[^"]*)"|'(?P<singleQuotedKey>[^']*)'|(?P<key>[^\s=!~"']+))\s*"""
+    r"""(?:(?P<operator>!=|=|!~|~)\s*(?:"(?P<quotedValue>[^"]*)"|'(?P<singleQuotedValue>[^']*)'|(?P<value>\S+)))?\s*$""")
+
+
+def compileTagFilter(selector: str):
+    """compiles a overpass tag filter (content of [...]) into a predicate over the tags of an osm element"""
+    match = TAG_FILTER_PATTERN.match(selector)
+    if not match:
+        raise ValueError("Unsupported overpass tag filter: {}".format(selector))
+    key = match.group("quotedKey") or match.group("singleQuotedKey") or match.group("key")
+    operator = match.group("operator")
+    value = match.group("quotedValue") or match.group("singleQuotedValue") or match.group("value") or ""
+
+    if match.group("negateKey"):
+        return lambda tags: key not in tags
+    if not operator:
+        return lambda tags: key in tags
+    if operator == "=":
+        return lambda tags: tags.get(key) == value
+    if operator == "!=":
+        return lambda tags: tags.get(key) != value
+    # overpass uses unanchored regular expressions
+    regex = re.compile(value)
+    if operator == "~":
+        return lambda tags: key in tags and regex.search(tags[key]) is not None
+    # "!~" also matches elements without the key
+    return lambda tags: key not in tags or regex.search(tags[key]) is None
+
+
+class OsmExtract():
+    """
+    osm elements of an extract file (.osm or .osm.pbf), which is streamed once from disk
+    ! node coordinates of the whole extract are kept in memory
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # id -> (lon, lat)
+        self.nodeLocations = {}
+        # id -> tags (only for tagged nodes)
+        self.nodeTags = {}
+        # id -> (nodeIds, tags)
+        self.ways = {}
+        # id -> (members as (type, ref, role), tags)
+        self.relations = {}
+        if path.endswith(".pbf"):
+            self.readPbf()
+        else:
+            self.readXml()
+        logging.info("Loaded {} nodes, {} ways and {} relations from {}".format(
+            len(self.nodeLocations), len(self.ways), len(self.relations), path))
+
+    def addNode(self, id, lon, lat, tags):
+        self.nodeLocations[id] = (lon, lat)
+        if tags:
+            self.nodeTags[id] = tags
+
+    def readXml(self):
+        root = None
+        for event, element in ET.iterparse(self.path, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = element
+                continue
+            if element.tag not in ["node", "way", "relation"]:
+                continue
+            id = int(element.get("id"))
+            tags = {tag.get("k"): tag.get("v") for tag in element.iter("tag")}
+            if element.tag == "node":
+                self.addNode(id, float(element.get("lon")), float(element.get("lat")), tags)
+            elif element.tag == "way":
+                self.ways[id] = ([int(nd.get("ref")) for nd in element.iter("nd")], tags)
+            else:
+                members = [(m.get("type"), int(m.get("ref")), m.get("role", "")) for m in element.iter("member")]
+                self.relations[id] = (members, tags)
+            # free already processed elements (the file is streamed)
+            root.clear()
+
+    def readPbf(self):
+        # only needed for pbf extracts
+        import osmium
+
+        extract = self
+        memberTypes = {"n": "node", "w": "way", "r": "relation"}
+
+        class ExtractHandler(osmium.SimpleHandler):
+            def node(self, n):
+                extract.addNode(n.id, n.location.lon, n.location.lat, {t.k: t.v for t in n.tags})
+
+            def way(self, w):
+                extract.ways[w.id] = ([nd.ref for nd in w.nodes], {t.k: t.v for t in w.tags})
+
+            def relation(self, r):
+                members = [(memberTypes[m.type], m.ref, m.role) for m in r.members]
+                extract.relations[r.id] = (members, {t.k: t.v for t in r.tags})
+
+        ExtractHandler().apply_file(self.path)
+
+    def wayCoordinates(self, nodeIds):
+        """coordinates of the way (nodes outside the extract are left out)"""
+        return [self.nodeLocations[id] for id in nodeIds if id in self.nodeLocations]
+
+    def areaGeometry(self, areaId):
+        """polygon of an overpass area (based on a closed way or a multipolygon/boundary relation)"""
+        if areaId >= RELATION_AREA_OFFSET:
+            members, _ = self.relations[areaId - RELATION_AREA_OFFSET]
+            outerLines = [LineString(self.wayCoordinates(self.ways[ref][0])) for type, ref, role in members
+                          if type == "way" and role in ["outer", "", "outline"] and ref in self.ways]
+            innerLines = [LineString(self.wayCoordinates(self.ways[ref][0])) for type, ref, role in members
+                          if type == "way" and role == "inner" and ref in self.ways]
+            area = unary_union(list(polygonize(outerLines)))
+            if innerLines:
+                area = area.difference(unary_union(list(polygonize(innerLines))))
+            return area
+        nodeIds, _ = self.ways[areaId - WAY_AREA_OFFSET]
+        return unary_union(list(polygonize([LineString(self.wayCoordinates(nodeIds))])))
+
+    def findAreaId(self, name):
+        """area id of the relation with the given name (prefering boundaries with a lower admin_level)"""
+        candidates = [(int(tags.get("admin_level", 99)), id) for id, (_, tags) in self.relations.items()
+                      if tags.get("name") == name and (tags.get("boundary") or tags.get("place") or tags.get("type") == "multipolygon")]
+        if not candidates:
+            raise ValueError("No area named {} inside {}".format(name, self.path))
+        return RELATION_AREA_OFFSET + min(candidates)[1]
+
+    @staticmethod
+    def toGeometry(coordinates):
+        return [{"lat": lat, "lon": lon} for lon, lat in coordinates]
+
+    def nodeElement(self, id, tags):
+        # tags are copied, as the geojson converter adds properties to them
+        lon, lat = self.nodeLocations[id]
+        return {"type": "node", "id": id, "lat": lat, "lon": lon, "tags": dict(tags)}
+
+    def wayElement(self, id, nodeIds, tags):
+        geometry = self.toGeometry(self.wayCoordinates(nodeIds))
+        return {"type": "way", "id": id, "nodes": nodeIds, "geometry": geometry, "tags": dict(tags)}
+
+    def relationElement(self, id, members, tags):
+        memberElements = []
+        for type, ref, role in members:
+            if type == "way" and ref in self.ways:
+                geometry = self.toGeometry(self.wayCoordinates(self.ways[ref][0]))
+                memberElements.append({"type": "way", "ref": ref, "role": role, "geometry": geometry})
+            elif type == "node" and ref in self.nodeLocations:
+                lon, lat = self.nodeLocations[ref]
+                memberElements.append({"type": "node", "ref": ref, "role": role, "lat": lat, "lon": lon})
+            # members outside the extract and sub-relations (which have no geometry in 'out geom') are left out
+        return {"type": "relation", "id": id, "members": memberElements, "tags": dict(tags)}
+
+    def query(self, areaId, elementType, selector: List[str]):
+        """evaluates an overpass query locally, returns the elements like with 'out geom'"""
+        if not isinstance(elementType, list):
+            elementType = [elementType]
+        tagFilters = [compileTagFilter(s) for s in selector]
+        matchesTags = lambda tags: all(tagFilter(tags) for tagFilter in tagFilters)
+        area = prep(self.areaGeometry(areaId))
+
+        def inArea(coordinates):
+            if not coordinates:
+                return False
+            if len(coordinates) == 1:
+                return area.intersects(Point(coordinates[0]))
+            return area.intersects(LineString(coordinates))
+
+        elements = []
+        if "node" in elementType:
+            for id, tags in self.nodeTags.items():
+                if matchesTags(tags) and inArea([self.nodeLocations[id]]):
+                    elements.append(self.nodeElement(id, tags))
+        if "way" in elementType:
+            for id, (nodeIds, tags) in self.ways.items():
+                if matchesTags(tags) and inArea(self.wayCoordinates(nodeIds)):
+                    elements.append(self.wayElement(id, nodeIds, tags))
+        if "rel" in elementType:
+            for id, (members, tags) in self.relations.items():
+                if not matchesTags(tags):
+                    continue
+                element = self.relationElement(id, members, tags)
+                memberCoordinates = [[(p["lon"], p["lat"]) for p in m["geometry"]] if m["type"] == "way" else [(m["lon"], m["lat"])]
+                                     for m in element["members"]]
+                if any(inArea(coordinates) for coordinates in memberCoordinates):
+                    elements.append(element)
+        return elements
+
+
+class OsmExtractHelper(OverPassHelper):
+    """
+    OverPassHelper answering the queries based on a local osm extract instead of the overpass api
+    (f.i. to avoid rate limits or for reproducible benchmarks)
+    """
+
+    def __init__(self, extractPath: str, outPath='out/data/'):
+        # cache would mix up results of the overpass api and of the extract
+        super().__init__(outPath, useCache=False)
+        self.extractPath = extractPath
+        self.extract = None
+
+    def getExtract(self) -> OsmExtract:
+        # loaded on first usage, as reading the extract can take a while
+        if not self.extract:
+            self.extract = OsmExtract(self.extractPath)
+        return self.extract
+
+    def getAreaId(self, locationName):
+        """area id based on the first part of the location name (f.i. 'Pieschen' for 'Pieschen, Dresden, Germany')"""
+        return self.getExtract().findAreaId(locationName.split(",")[0].strip())
+
+    def getAreaCenter(self, locationName):
+        center = self.getExtract().areaGeometry(self.getAreaId(locationName)).representative_point()
+        return [center.y, center.x]
+
+    def queryOverpass(self, keyFields):
+        return self.getExtract().query(keyFields["areaId"], keyFields["elementType"], keyFields["selector"])
+
+    def streamOverpass(self, keyFields):
+        return iter(self.queryOverpass(keyFields))
+
+    def queryOverpassBatch(self, areaId, keyFieldsList):
+        return [self.queryOverpass(keyFields) for keyFields in keyFieldsList]
+
+    def queryOverpassJson(self, query, timeout=25):
+        # only reached by incremental fetches, which would otherwise silently ask the public overpass api
+        raise NotImplementedError("Incremental fetch is not supported offline, as an osm extract has no change history"
+                                  " (use fetch(incremental=False) or the overpass api)")
+
+    def queryOverpassWithTimestamp(self, query, timeout=25):
+        return self.queryOverpassJson(query, timeout=timeout)
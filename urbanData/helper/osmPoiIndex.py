@@ -0,0 +1,134 @@
+import threading
+from typing import NamedTuple, List
+
+from shapely.geometry import shape
+from shapely.geometry.base import BaseGeometry
+from shapely.strtree import STRtree
+
+from helper.OsmDataQuery import OsmDataQuery
+from helper.OsmObjectType import OsmObjectType
+from helper.geoJsonConverter import osmObjectsToFeatures
+from helper.overPassHelper import OverPassHelper
+
+
+class Poi(NamedTuple):
+    geometry: BaseGeometry
+    properties: dict
+
+
+class OsmPoiIndex():
+    """
+    osm objects of an area shared by multiple annotators
+    annotators register their selectors, which are fetched together in one overpass request
+    and one spatial index is build over all (distinct) objects
+    """
+
+    def __init__(self, areaName: str, overpassHelper: OverPassHelper = None):
+        self.areaName = areaName
+        self.overpassHelper = overpassHelper or OverPassHelper()
+        self.pendingViews = []
+        self.features = []
+        self.geometries = []
+        # (osm type, osm id) -> position in features (objects matching multiple selectors are only stored once)
+        self.positionByKey = {}
+        self.tree = None
+        self.treePositionById = None
+        # annotators can use the index in parallel (see annotationPipeline)
+        self.lock = threading.RLock()
+
+    def __getstate__(self):
+        """objects are loaded before, the spatial index and the overpass connection are not send (f.i. to worker processes)"""
+        self.load()
+        state = self.__dict__.copy()
+        state.update(overpassHelper=None, tree=None, treePositionById=None, lock=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
+
+    def register(self, selector: List[str], elementType: OsmObjectType = OsmObjectType.NODE) -> "OsmPoiView":
+        """view on the objects matching the selector (fetched on first access)"""
+        query = OsmDataQuery("poi{}".format(len(self.pendingViews)), elementType, selector)
+        view = OsmPoiView(self, query)
+        self.pendingViews.append(view)
+        return view
+
+    def load(self):
+        """fetches all selectors registered since the last load with one request"""
+        with self.lock:
+            if not self.pendingViews:
+                return
+            areaId = self.overpassHelper.getAreaId(self.areaName)
+            results = self.overpassHelper.getOsmGeoObjectsBatch(areaId, [view.osmQuery for view in self.pendingViews])
+            for view, osmObjects in zip(self.pendingViews, results):
+                positions = []
+                for osmObject in osmObjects:
+                    key = (osmObject["type"], osmObject["id"])
+                    if key not in self.positionByKey:
+                        feature = next(osmObjectsToFeatures([osmObject], polygonize=True))
+                        self.positionByKey[key] = len(self.features)
+                        self.features.append(feature)
+                        self.geometries.append(shape(feature["geometry"]))
+                        self.tree = None
+                    positions.append(self.positionByKey[key])
+                view.positions = positions
+            self.pendingViews = []
+
+    def candidates(self, geometry):
+        """positions of the objects whose bounding box intersects the geometry"""
+        self.load()
+        with self.lock:
+            if self.tree is None:
+                self.treePositionById = {id(g): position for position, g in enumerate(self.geometries)}
+                self.tree = STRtree(self.geometries)
+        result = self.tree.query(geometry)
+        # shapely 2 returns the positions, shapely 1.8 the geometries
+        if len(result) and not isinstance(result[0], BaseGeometry):
+            return [int(position) for position in result]
+        return [self.treePositionById[id(g)] for g in result]
+
+    def query(self, geometry, tags: List[str] = None) -> List[Poi]:
+        """objects near the geometry (only those with one of the tags if given)"""
+        pois = [Poi(self.geometries[p], self.features[p]["properties"]) for p in self.candidates(geometry)]
+        if tags:
+            pois = [poi for poi in pois if any(tag in poi.properties for tag in tags)]
+        return pois
+
+
+class OsmPoiView():
+    """objects of the index matching one registered selector"""
+
+    def __init__(self, index: OsmPoiIndex, osmQuery: OsmDataQuery):
+        self.index = index
+        self.osmQuery = osmQuery
+        self.positions = None
+        self.positionSet = None
+
+    def load(self):
+        self.index.load()
+        if self.positionSet is None:
+            self.positionSet = set(self.positions)
+
+    @property
+    def features(self):
+        """objects as geojson features"""
+        self.load()
+        return [self.index.features[p] for p in self.positions]
+
+    @property
+    def geometries(self):
+        """shapely geometries (in the order of features)"""
+        self.load()
+        return [self.index.geometries[p] for p in self.positions]
+
+    @property
+    def pois(self) -> List[Poi]:
+        self.load()
+        return [Poi(self.index.geometries[p], self.index.features[p]["properties"]) for p in self.positions]
+
+    def query(self, geometry) -> List[Poi]:
+        """objects near the geometry (bounding boxes intersect)"""
+        self.load()
+        return [Poi(self.index.geometries[p], self.index.features[p]["properties"])
+                for p in self.index.candidates(geometry) if p in self.positionSet]
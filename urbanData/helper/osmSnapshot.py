@@ -0,0 +1,94 @@
+import json
+import os
+import logging
+from pathlib import Path
+
+from helper.overpassBatchQuery import SEPARATOR_TYPE, splitBatchResult
+
+
+def elementKey(element):
+    """osm ids are only unique per element type"""
+    return "{}/{}".format(element["type"], element["id"])
+
+
+def buildUpdateQuery(areaId, elementTypes, selector, since):
+    """
+        overpass ql script returning the ids of all currently matching elements (to detect deletions)
+        and the full geometry of the elements changed since the given timestamp
+
+        ways and relations are also changed, if only their nodes (or the nodes of their member ways) were moved,
+        as moving a node does not change the version of the ways and relations built from it
+    """
+    if not isinstance(elementTypes, list):
+        elementTypes = [elementTypes]
+    tagFilter = "".join(["[" + s + "]" for s in selector])
+    allElements = "".join([e + tagFilter + "(area.searchArea);" for e in elementTypes])
+    changedElements = "".join([e + tagFilter + '(changed:"{}")(area.searchArea);'.format(since) for e in elementTypes])
+    movedNodes = 'node(changed:"{}")(area.searchArea)->.movedNodes;way(bn.movedNodes)->.movedWays;'.format(since)
+    if "way" in elementTypes:
+        changedElements += "way.movedWays" + tagFilter + ";"
+    # OsmObjectType spells relations "rel"
+    if "rel" in elementTypes or "relation" in elementTypes:
+        changedElements += "rel(bn.movedNodes)" + tagFilter + ";rel(bw.movedWays)" + tagFilter + ";"
+    return ("area({})->.searchArea;".format(areaId) + movedNodes +
+            "({})->.all;({})->.changed;".format(allElements, changedElements) +
+            "make {} index=0; out;.all out ids;".format(SEPARATOR_TYPE) +
+            "make {} index=1; out;.changed out geom;".format(SEPARATOR_TYPE))
+
+
+class OsmSnapshot():
+    """
+    local copy of the result of an overpass query (in 'out geom' format) and the osm timestamp it is based on
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.timestamp = None
+        # elementKey -> element
+        self.elements = {}
+        if self.path.is_file():
+            with open(self.path, encoding='UTF-8') as file:
+                snapshot = json.load(file)
+            self.timestamp = snapshot["timestamp"]
+            self.elements = {elementKey(e): e for e in snapshot["elements"]}
+
+    def exists(self):
+        return self.timestamp is not None
+
+    def replace(self, elements, timestamp):
+        self.elements = {elementKey(e): e for e in elements}
+        self.timestamp = timestamp
+
+    def applyUpdate(self, currentIds, changedElements, timestamp):
+        """
+            currentIds: type and id of every element currently matching the query
+            changedElements: elements created or modified since the timestamp of the snapshot
+            returns the keys of the created, modified and deleted elements
+        """
+        currentKeys = {elementKey(e) for e in currentIds}
+        deletedKeys = set(self.elements.keys()).difference(currentKeys)
+        for key in deletedKeys:
+            del self.elements[key]
+        changedKeys = set()
+        for element in changedElements:
+            key = elementKey(element)
+            # changed elements, which do not match the query anymore, are already deleted
+            if key in currentKeys:
+                self.elements[key] = element
+                changedKeys.add(key)
+        self.timestamp = timestamp
+        logging.info("Snapshot {}: {} changed and {} deleted elements".format(self.path.name, len(changedKeys), len(deletedKeys)))
+        return changedKeys.union(deletedKeys)
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmpPath = self.path.with_suffix(".tmp{}".format(os.getpid()))
+        with open(tmpPath, 'w', encoding='UTF-8') as file:
+            json.dump({"timestamp": self.timestamp, "elements": list(self.elements.values())}, file)
+        os.replace(tmpPath, self.path)
+
+
+def splitUpdateResult(elements):
+    """returns (currentIds, changedElements) of the response to buildUpdateQuery"""
+    currentIds, changedElements = splitBatchResult(elements, 2)
+    return currentIds, changedElements
@@ -0,0 +1,265 @@
+import argparse
+import hashlib
+import json
+import logging
+import re
+import threading
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+import requests
+
+from helper.osmExtractHelper import OsmExtract, RELATION_AREA_OFFSET, WAY_AREA_OFFSET
+from helper.overpassBatchQuery import SEPARATOR_TYPE
+
+# overpass settings like [out:json][timeout:25]; (timeout differs between the callers)
+SETTINGS_PATTERN = re.compile(r'^\s*(\[[^\]]*\]\s*)*;?')
+AREA_PATTERN = re.compile(r'area\((\d+)\)->\.searchArea;')
+# (way["building"](area.searchArea);node["building"](area.searchArea);)->.query0;
+SET_PATTERN = re.compile(r'\(((?:\w+(?:\[[^\]]*\])*\(area\.searchArea\);)+)\)(?:->\.(\w+))?;')
+STATEMENT_PATTERN = re.compile(r'(\w+)((?:\[[^\]]*\])*)\(area\.searchArea\);')
+OUT_PATTERN = re.compile(r'(?:make \w+ index=(\d+); out;)?\s*(?:\.(\w+) )?out (\w+);')
+
+
+class UnsupportedQuery(ValueError):
+    pass
+
+
+def normalizeOverpassQuery(query):
+    """query without settings and surrounding whitespace (used as fixture key)"""
+    return SETTINGS_PATTERN.sub("", query, count=1).strip()
+
+
+def parseOverpassQuery(query):
+    """
+    parses the queries generated by overpassQueryBuilder and buildBatchQuery
+    returns the area id and a list of (separator index, element types, selector) per output statement
+    """
+    query = normalizeOverpassQuery(query)
+    area = AREA_PATTERN.match(query)
+    if not area:
+        raise UnsupportedQuery("Only queries inside an area are supported: {}".format(query))
+    sets = {}
+    rest = query[area.end():]
+    for match in SET_PATTERN.finditer(rest):
+        statements = STATEMENT_PATTERN.findall(match.group(1))
+        elementTypes = [elementType for elementType, _ in statements]
+        selectors = {selector for _, selector in statements}
+        if len(selectors) > 1:
+            raise UnsupportedQuery("Different selectors inside one set: {}".format(match.group(0)))
+        selector = re.findall(r'\[([^\]]*)\]', selectors.pop())
+        sets[match.group(2) or "_"] = (elementTypes, selector)
+    rest = SET_PATTERN.sub("", rest)
+    outputs = []
+    for separatorIndex, setName, out in OUT_PATTERN.findall(rest):
+        if out != "geom" or (setName or "_") not in sets:
+            raise UnsupportedQuery("Unsupported output statement in {}".format(query))
+        elementTypes, selector = sets[setName or "_"]
+        outputs.append((int(separatorIndex) if separatorIndex else None, elementTypes, selector))
+    if not outputs or OUT_PATTERN.sub("", rest).strip():
+        raise UnsupportedQuery("Unsupported statements in {}".format(query))
+    return int(area.group(1)), outputs
+
+
+class FixtureStore():
+    """recorded responses of the osm services (one file per request)"""
+
+    def __init__(self, fixtureDir):
+        self.fixtureDir = Path(fixtureDir)
+
+    def path(self, service, request):
+        key = hashlib.sha1(request.encode("utf-8")).hexdigest()
+        return self.fixtureDir / "{}-{}.json".format(service, key)
+
+    def get(self, service, request):
+        path = self.path(service, request)
+        if path.is_file():
+            return path.read_bytes()
+        return None
+
+    def set(self, service, request, body):
+        self.fixtureDir.mkdir(parents=True, exist_ok=True)
+        self.path(service, request).write_bytes(body)
+
+
+class OsmStandInServer():
+    """
+    local stand-in for the overpass and nominatim apis (f.i. for offline tests and stable benchmarks)
+    responses come from recorded fixtures or are computed based on a local osm extract
+
+    OverPassHelper uses it if the endpoints are passed or set via URBANDATA_OVERPASS_ENDPOINT and
+    URBANDATA_NOMINATIM_ENDPOINT (see environment()), the response caches are not separated per endpoint
+    (use useCache=False or a different OverpassCache for deterministic runs)
+    """
+
+    def __init__(self, fixtureDir=None, extractPath=None, record=False, host="127.0.0.1", port=0,
+                 upstreamOverpass='http://overpass-api.de/api/', upstreamNominatim='https://nominatim.openstreetmap.org/'):
+        """
+            fixtureDir: directory with recorded responses
+            extractPath: osm extract (.osm or .pbf) answering requests without fixture
+            record: requests without fixture are forwarded to the upstream apis and their responses are recorded
+            port: 0 for any free port
+        """
+        if record and not fixtureDir:
+            raise ValueError("Recording requires a fixture directory")
+        self.fixtures = FixtureStore(fixtureDir) if fixtureDir else None
+        self.extractPath = extractPath
+        self.extract = None
+        self.extractLock = threading.Lock()
+        self.record = record
+        self.upstreamOverpass = upstreamOverpass
+        self.upstreamNominatim = upstreamNominatim
+        self.httpServer = ThreadingHTTPServer((host, port), StandInRequestHandler)
+        self.httpServer.standIn = self
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpServer.server_address[:2]
+        return "http://{}:{}/".format(host, port)
+
+    @property
+    def overpassEndpoint(self):
+        return self.url + "api/"
+
+    @property
+    def nominatimEndpoint(self):
+        return self.url + "nominatim/"
+
+    def environment(self):
+        """environment variables pointing the OverPassHelper (f.i. of a pattern script) to this server"""
+        return {"URBANDATA_OVERPASS_ENDPOINT": self.overpassEndpoint, "URBANDATA_NOMINATIM_ENDPOINT": self.nominatimEndpoint}
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpServer.serve_forever, daemon=True)
+        self.thread.start()
+        logging.info("Serving osm stand-in at {}".format(self.url))
+        return self
+
+    def stop(self):
+        self.httpServer.shutdown()
+        self.httpServer.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def getExtract(self) -> OsmExtract:
+        with self.extractLock:
+            if not self.extract:
+                self.extract = OsmExtract(self.extractPath)
+            return self.extract
+
+    def overpass(self, query):
+        """returns the response body for an overpass query"""
+        fixtureKey = normalizeOverpassQuery(query)
+        body = self.fixtures.get("overpass", fixtureKey) if self.fixtures else None
+        if body is None and self.extractPath:
+            body = json.dumps(self.overpassFromExtract(query)).encode("utf-8")
+        elif body is None and self.record:
+            response = requests.post(self.upstreamOverpass + "interpreter", data={"data": query})
+            response.raise_for_status()
+            body = response.content
+            self.fixtures.set("overpass", fixtureKey, body)
+        if body is None:
+            raise LookupError("No fixture for overpass query {}".format(fixtureKey))
+        return body
+
+    def overpassFromExtract(self, query):
+        areaId, outputs = parseOverpassQuery(query)
+        elements = []
+        for separatorIndex, elementTypes, selector in outputs:
+            if separatorIndex is not None:
+                elements.append({"type": SEPARATOR_TYPE, "id": separatorIndex + 1, "tags": {"index": str(separatorIndex)}})
+            elements.extend(self.getExtract().query(areaId, elementTypes, selector))
+        timestamp = datetime.fromtimestamp(Path(self.extractPath).stat().st_mtime, timezone.utc)
+        return {"version": 0.6, "generator": "urbanData osm stand-in",
+                "osm3s": {"timestamp_osm_base": timestamp.strftime("%Y-%m-%dT%H:%M:%SZ")},
+                "elements": elements}
+
+    def nominatim(self, path, params):
+        """returns the response body for a nominatim request (only search is supported for extracts)"""
+        fixtureKey = path + "?" + "&".join(["{}={}".format(k, v) for k, v in sorted(params.items()) if k != "format"])
+        body = self.fixtures.get("nominatim", fixtureKey) if self.fixtures else None
+        if body is None and self.extractPath and path == "search":
+            body = json.dumps(self.nominatimFromExtract(params["q"])).encode("utf-8")
+        elif body is None and self.record:
+            # nominatim requires an identifying user agent
+            response = requests.get(self.upstreamNominatim + path, params=params, headers={"User-Agent": "urbanData osm stand-in"})
+            response.raise_for_status()
+            body = response.content
+            self.fixtures.set("nominatim", fixtureKey, body)
+        if body is None:
+            raise LookupError("No fixture for nominatim request {}".format(fixtureKey))
+        return body
+
+    def nominatimFromExtract(self, locationName):
+        extract = self.getExtract()
+        try:
+            areaId = extract.findAreaId(locationName.split(",")[0].strip())
+        except ValueError:
+            return []
+        center = extract.areaGeometry(areaId).representative_point()
+        osmType, osmId = ("relation", areaId - RELATION_AREA_OFFSET) if areaId >= RELATION_AREA_OFFSET else ("way", areaId - WAY_AREA_OFFSET)
+        return [{"osm_type": osmType, "osm_id": osmId, "display_name": locationName, "lat": str(center.y), "lon": str(center.x)}]
+
+
+class StandInRequestHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if url.path == "/api/status":
+            # OSMPythonTools checks the available slots before each query
+            self.respond(200, b"Rate limit: 0\n", "text/plain")
+        elif url.path == "/api/interpreter" and "data" in params:
+            self.answer(lambda: self.server.standIn.overpass(params["data"]))
+        elif url.path.startswith("/nominatim/"):
+            self.answer(lambda: self.server.standIn.nominatim(url.path[len("/nominatim/"):], params))
+        else:
+            self.respond(404, b"unknown path", "text/plain")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        params = {key: values[-1] for key, values in parse_qs(self.rfile.read(length).decode("utf-8")).items()}
+        if url.path == "/api/interpreter" and "data" in params:
+            self.answer(lambda: self.server.standIn.overpass(params["data"]))
+        else:
+            self.respond(404, b"unknown path", "text/plain")
+
+    def answer(self, createBody):
+        try:
+            self.respond(200, createBody())
+        except UnsupportedQuery as error:
+            self.respond(400, str(error).encode("utf-8"), "text/plain")
+        except LookupError as error:
+            self.respond(404, str(error).encode("utf-8"), "text/plain")
+
+    def respond(self, status, body, contentType="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", contentType + "; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug("[osm stand-in] " + format % args)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="local stand-in for the overpass and nominatim apis")
+    parser.add_argument("--fixtures", help="directory with recorded responses")
+    parser.add_argument("--extract", help="osm extract (.osm or .pbf) answering requests without fixture")
+    parser.add_argument("--record", action="store_true", help="record responses of the public apis for missing fixtures")
+    parser.add_argument("--port", type=int, default=8123)
+    args = parser.parse_args()
+    server = OsmStandInServer(args.fixtures, args.extract, args.record, port=args.port)
+    for name, value in server.environment().items():
+        print("{}={}".format(name, value))
+    server.httpServer.serve_forever()
@@ -1,49 +1,234 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List
 from pathlib import Path
+import re
 import geojson
-from OSMPythonTools.overpass import overpassQueryBuilder, Overpass
+import requests
+from OSMPythonTools.overpass import overpassQueryBuilder
 from OSMPythonTools.nominatim import Nominatim
 
 from helper.OsmObjectType import OsmObjectType as OsmType
 from helper.OsmDataQuery import OsmDataQuery
 from helper.geoJsonConverter import osmObjectsToGeoJSON
+from helper.overpassCache import OverpassCache, AreaIdCache
+from helper.overpassBatchQuery import buildBatchQuery, splitBatchResult
+from helper.jsonStream import JsonArrayStream, CHUNK_SIZE
+from helper.osmSnapshot import OsmSnapshot, buildUpdateQuery, splitUpdateResult
+from helper.requestScheduler import getScheduler, OVERPASS_LIMITS, NOMINATIM_LIMITS
+
+# shared by all OverPassHelper instances (avoids reading the cache file multiple times)
+defaultAreaIdCache = AreaIdCache()
+defaultAreaCenterCache = AreaIdCache('out/cache/areaCenters.json')
 
 
 class OverPassHelper:
     fileName = "{objectType}_{area}.json"
     filePath = None
+    snapshotPath = None
+    overpassEndpoint = 'http://overpass-api.de/api/'
+    nominatimEndpoint = 'https://nominatim.openstreetmap.org/'
     defaultSelectors = [OsmDataQuery("streets", OsmType.WAY, ['"highway"'], "highway"),
                         OsmDataQuery("buildings", OsmType.WAY, ['"building"'], "building"),
                         OsmDataQuery("landuse", OsmType.WAY, ['"landuse"'], "landuse")]
 
-    def __init__(self, outPath='out/data/'):
+    def __init__(self, outPath='out/data/', cache: OverpassCache = None, useCache=True, streamResponses=False, areaIdCache: AreaIdCache = None,
+                 overpassEndpoint=None, nominatimEndpoint=None, conversionProcesses=None, areaCenterCache: AreaIdCache = None):
+        """
+            overpassEndpoint, nominatimEndpoint: f.i. a local OsmStandInServer
+                (default: URBANDATA_OVERPASS_ENDPOINT / URBANDATA_NOMINATIM_ENDPOINT environment variables or the public apis)
+            cache: cache for overpass responses (defaults to a cache inside out/cache/)
+            areaIdCache: cache for area ids (defaults to a cache shared by every OverPassHelper)
+            areaCenterCache: cache for the [lat, lon] centers of the locations (f.i. for centering maps)
+            useCache: if False every query is send to the overpass api
+            streamResponses: fetch and directFetch parse the responses incrementally (lower peak memory for big areas)
+            conversionProcesses: number of processes converting the elements to geojson (None: no process pool)
+        """
         # TODO: Validate path is directory
         self.filePath = outPath + self.fileName
+        self.snapshotPath = outPath + "snapshots/" + self.fileName
+        if useCache and not cache:
+            cache = OverpassCache()
+        self.cache = cache
+        self.streamResponses = streamResponses
+        self.conversionProcesses = conversionProcesses
+        self.areaIdCache = areaIdCache or defaultAreaIdCache
+        self.areaCenterCache = areaCenterCache or defaultAreaCenterCache
+        self.overpassEndpoint = overpassEndpoint or os.environ.get("URBANDATA_OVERPASS_ENDPOINT", self.overpassEndpoint)
+        self.nominatimEndpoint = nominatimEndpoint or os.environ.get("URBANDATA_NOMINATIM_ENDPOINT", self.nominatimEndpoint)
 
     def getAreaId(self, locationName):
-        # TODO: check if its a place (otherwise following queries won't work)
-        nominatim = Nominatim()
-        return nominatim.query(locationName).areaId()
+        """overpass area id of the location (nominatim is only asked, if the id is not cached yet)"""
+        areaId = self.areaIdCache.get(locationName)
+        if areaId is None:
+            # TODO: check if its a place (otherwise following queries won't work)
+            areaId = self.nominatimQuery(locationName).areaId()
+            self.areaIdCache.set(locationName, areaId)
+        return areaId
+
+    def getAreaCenter(self, locationName):
+        """[lat, lon] of the location (nominatim is only asked, if the center is not cached yet)"""
+        center = self.areaCenterCache.get(locationName)
+        if center is None:
+            location = self.nominatimQuery(locationName).toJSON()[0]
+            center = [float(location["lat"]), float(location["lon"])]
+            self.areaCenterCache.set(locationName, center)
+        return center
+
+    def nominatimQuery(self, locationName):
+        """rate limited nominatim search (shared by every helper using the same endpoint)"""
+        nominatim = Nominatim(endpoint=self.nominatimEndpoint)
+        scheduler = getScheduler(self.nominatimEndpoint, **NOMINATIM_LIMITS)
+        return scheduler.call(nominatim.query, locationName)
+
+    def overpassScheduler(self):
+        """rate limits and retries the requests (shared by every helper using the same endpoint)"""
+        return getScheduler(self.overpassEndpoint, **OVERPASS_LIMITS)
 
     def getOsmGeoObjects(self, areaId, selector, elementType:OsmType):
         """
         sends overpass-query and return the elements from the json response
+        (answered from the cache if an entry exists, which is not stale)
         """
-        overpass = Overpass()
         # out='geom' also leads to geometry key (list of coordinates for each object)
+        keyFields = OverpassCache.keyFields(areaId, elementType.value, selector, out='geom')
+        if self.cache:
+            osmObjects = self.cache.get(keyFields)
+            if osmObjects is not None:
+                return osmObjects
+        osmObjects = self.queryOverpass(keyFields)
+        if self.cache:
+            self.cache.set(keyFields, osmObjects)
+        return osmObjects
+
+    def queryOverpass(self, keyFields):
+        """sends the overpass-query described by the cache key fields"""
+        query = overpassQueryBuilder(
+            area=keyFields["areaId"], elementType=keyFields["elementType"], selector=keyFields["selector"], out=keyFields["out"])
+        return self.queryOverpassJson(query)["elements"]
+
+    def queryOverpassJson(self, query, timeout=25):
+        """
+        sends the overpass-query and returns the parsed response
+        (not via OSMPythonTools, as its cache is keyed by the query only and never expires, thus stale entries could not be refreshed)
+        """
+        response = self.overpassScheduler().call(self.postOverpass, "[out:json][timeout:{}];".format(timeout) + query, stream=False)
+        result = response.json()
+        remark = result.get("remark")
+        if remark and "error" in remark:
+            raise Exception("[overpass] error in result: {}".format(remark))
+        return result
 
+    def streamOsmGeoObjects(self, areaId, selector, elementType:OsmType):
+        """like getOsmGeoObjects, but returns a generator parsing the elements one by one"""
+        keyFields = OverpassCache.keyFields(areaId, elementType.value, selector, out='geom')
+        if self.cache:
+            osmObjects = self.cache.stream(keyFields)
+            if osmObjects is not None:
+                return osmObjects
+            return self.cache.writeThrough(keyFields, self.streamOverpass(keyFields))
+        return self.streamOverpass(keyFields)
+
+    def streamOverpass(self, keyFields):
+        """sends the overpass-query and parses the elements while the response is downloaded"""
         query = overpassQueryBuilder(
-            area=areaId, elementType=elementType.value, selector=selector, out='geom')
-        return overpass.query(query).toJSON()["elements"]
+            area=keyFields["areaId"], elementType=keyFields["elementType"], selector=keyFields["selector"], out=keyFields["out"])
+        scheduler = self.overpassScheduler()
+        # the slot is kept until the response is read completely
+        with scheduler.slot():
+            response = scheduler.call(self.postOverpass, "[out:json][timeout:25];" + query)
+            elements = JsonArrayStream.fromBytes(response.iter_content(CHUNK_SIZE), encoding=response.encoding or "utf-8")
+            yield from elements
+        # overpass reports errors (f.i. timeouts) after the elements
+        remark = re.search(r'"remark"\s*:\s*"((?:[^"\\]|\\.)*)"', elements.remainder)
+        if remark and "error" in remark.group(1):
+            raise Exception("[overpass] error in result: {}".format(remark.group(1)))
+
+    def postOverpass(self, query, stream=True):
+        response = requests.post(self.overpassEndpoint + "interpreter", data={"data": query}, stream=stream)
+        response.raise_for_status()
+        return response
+
+    def getOsmGeoObjectsBatch(self, areaId, osmQueries: List[OsmDataQuery]):
+        """
+        like getOsmGeoObjects, but sends all not cached queries in a single overpass request
+        returns a list of elements per query
+        """
+        keyFieldsList = [OverpassCache.keyFields(areaId, query.osmObject.value, query.osmSelector, out='geom') for query in osmQueries]
+        results = [self.cache.get(keyFields) if self.cache else None for keyFields in keyFieldsList]
+
+        # same query can be contained multiple times, but is only send once
+        missingKeys = {}
+        for keyFields, result in zip(keyFieldsList, results):
+            if result is None:
+                missingKeys[OverpassCache.key(keyFields)] = keyFields
+        if missingKeys:
+            fetched = self.queryOverpassBatch(areaId, list(missingKeys.values()))
+            fetchedPerKey = dict(zip(missingKeys.keys(), fetched))
+            for keyFields, osmObjects in zip(missingKeys.values(), fetched):
+                if self.cache:
+                    self.cache.set(keyFields, osmObjects)
+            results = [result if result is not None else fetchedPerKey[OverpassCache.key(keyFields)]
+                       for keyFields, result in zip(keyFieldsList, results)]
+        return results
+
+    def queryOverpassBatch(self, areaId, keyFieldsList):
+        """sends multiple queries as one overpass script and splits the response per query"""
+        query = buildBatchQuery(areaId, keyFieldsList)
+        elements = self.queryOverpassJson(query, timeout=25 * len(keyFieldsList))["elements"]
+        return splitBatchResult(elements, len(keyFieldsList))
+
+    def refreshCache(self):
+        """re-fetches only the stale cache entries"""
+        if not self.cache:
+            raise ValueError("OverPassHelper was created without a cache")
+        staleKeys = self.cache.staleEntries()
+        for keyFields in staleKeys:
+            self.cache.set(keyFields, self.queryOverpass(keyFields))
+        logging.info("Refreshed {} stale cache entries".format(len(staleKeys)))
+        return len(staleKeys)
+
+    def queryOverpassWithTimestamp(self, query, timeout=25):
+        """returns the elements and the timestamp of the osm data the response is based on"""
+        # not answered by a cache, otherwise old elements would get a new timestamp
+        response = self.queryOverpassJson(query, timeout=timeout)
+        return response["elements"], response["osm3s"]["timestamp_osm_base"]
+
+    def updateSnapshot(self, areaId, areaName, query: OsmDataQuery):
+        """
+        updates the local snapshot of the query with the elements changed since the last update
+        (only the changed elements and the ids of all matching elements are downloaded)
+        returns all elements and the keys of the changed elements (None if the snapshot was created)
+
+        elements are changed if their tags or node list (ways) / member list (relations) changed
+        or if one of their nodes (also nodes of member ways) was moved
+        """
+        snapshot = OsmSnapshot(self.snapshotPath.format(objectType=query.name, area=areaName))
+        if snapshot.exists():
+            updateQuery = buildUpdateQuery(areaId, query.osmObject.value, query.osmSelector, snapshot.timestamp)
+            elements, timestamp = self.queryOverpassWithTimestamp(updateQuery, timeout=50)
+            currentIds, changedElements = splitUpdateResult(elements)
+            changedIds = snapshot.applyUpdate(currentIds, changedElements, timestamp)
+        else:
+            fullQuery = overpassQueryBuilder(
+                area=areaId, elementType=query.osmObject.value, selector=query.osmSelector, out='geom')
+            elements, timestamp = self.queryOverpassWithTimestamp(fullQuery)
+            snapshot.replace(elements, timestamp)
+            changedIds = None
+        snapshot.save()
+        return list(snapshot.elements.values()), changedIds
 
     def saveGeoJson(self, file, data):
         with open(file, 'w', encoding='UTF-8') as outfile:
             # geojson.dump(data, outfile, ensure_ascii=False)
             geojson.dump(data, outfile)
 
-    def fetch(self, areaId, areaName, osmQueries: List[OsmDataQuery] = None, overrideFiles=True) -> List[OsmDataQuery]:
+    def fetch(self, areaId, areaName, osmQueries: List[OsmDataQuery] = None, overrideFiles=True, incremental=False) -> List[OsmDataQuery]:
         """ fetch area data via overpassAPI and saves them as geojson
-            return a list of osmDataQuery where the filePath is set """
+            return a list of osmDataQuery where the filePath is set
+            incremental: keep a local snapshot per query and only download the changes since the last fetch
+                (changedIds of the queries is set, None if the snapshot was just created) """
         if not osmQueries:
             osmQueries = self.defaultSelectors
             
@@ -52,18 +237,44 @@ class OverPassHelper:
             query.filePath = file
             if Path(file).is_file() and not overrideFiles:
                 print("creation skipped, {} exists already".format(file))
+            elif incremental:
+                osmObjects, query.changedIds = self.updateSnapshot(areaId, areaName, query)
+                # the converter modifies the elements, so the snapshot has to be saved before
+                geoJsonObjects = osmObjectsToGeoJSON(osmObjects, processes=self.conversionProcesses)
+                print("Loaded {} {} for {} ({} changed)".format(
+                    len(geoJsonObjects["features"]), query.name, areaName,
+                    "all" if query.changedIds is None else len(query.changedIds)))
+                self.saveGeoJson(file, geoJsonObjects)
             else:
-                osmObjects = self.getOsmGeoObjects(areaId, query.osmSelector, query.osmObject)
+                geoJsonObjects = self.directFetchQuery(areaId, query)
                 print("Loaded {} {} for {}".format(
-                    len(osmObjects), query.name, areaName))
-                geoJsonObjects = osmObjectsToGeoJSON(osmObjects)
+                    len(geoJsonObjects["features"]), query.name, areaName))
                 self.saveGeoJson(file, geoJsonObjects)
         return osmQueries
     
-    def directFetch(self, areaId, osmQueries = None) -> List:
-        """returns list of geojson featurecollections"""
+    def directFetch(self, areaId, osmQueries = None, concurrent = False, maxWorkers = None, batched = False) -> List:
+        """returns list of geojson featurecollections (in the order of the queries)
+            concurrent: send the queries in parallel (limited by the request scheduler of the endpoint)
+            maxWorkers: number of threads used if concurrent (default: one per query)
+            batched: send all queries in one overpass request
+        """
         if isinstance(osmQueries, OsmDataQuery):
             osmQueries = [osmQueries]
-        for query in osmQueries:
-          osmObjects = self.getOsmGeoObjects(areaId, query.osmSelector, query.osmObject)  
-          yield osmObjectsToGeoJSON(osmObjects)
\ No newline at end of file
+        if batched:
+            for osmObjects in self.getOsmGeoObjectsBatch(areaId, osmQueries):
+                yield osmObjectsToGeoJSON(osmObjects, processes=self.conversionProcesses)
+        elif concurrent and len(osmQueries) > 1:
+            with ThreadPoolExecutor(max_workers=maxWorkers or len(osmQueries)) as executor:
+                # map returns the results in input order
+                yield from executor.map(lambda query: self.directFetchQuery(areaId, query), osmQueries)
+        else:
+            for query in osmQueries:
+                yield self.directFetchQuery(areaId, query)
+
+    def directFetchQuery(self, areaId, query: OsmDataQuery):
+        if self.streamResponses:
+            # elements are directly handed to the converter (no complete list of elements in memory)
+            osmObjects = self.streamOsmGeoObjects(areaId, query.osmSelector, query.osmObject)
+        else:
+            osmObjects = self.getOsmGeoObjects(areaId, query.osmSelector, query.osmObject)
+        return osmObjectsToGeoJSON(osmObjects, processes=self.conversionProcesses)
@@ -0,0 +1,40 @@
+from typing import Dict, List
+
+# type of the marker elements, separating the output sets of the single queries
+SEPARATOR_TYPE = "querySeparator"
+
+
+def buildBatchQuery(areaId, queries: List[Dict]):
+    """
+        compiles multiple queries into one overpass ql script (resolving the area only once)
+        each query gets its own named set and its output is preceded by a separator element
+
+        queries: list of query key fields (elementType, selector, out) (see OverpassCache.keyFields)
+    """
+    script = "area({})->.searchArea;".format(areaId)
+    for index, query in enumerate(queries):
+        elementTypes = query["elementType"]
+        if not isinstance(elementTypes, list):
+            elementTypes = [elementTypes]
+        selector = "".join(["[" + s + "]" for s in query["selector"]])
+        statements = "".join([e + selector + "(area.searchArea);" for e in elementTypes])
+        script += "({})->.query{};".format(statements, index)
+    for index, query in enumerate(queries):
+        # make creates a derived element, which is only used as marker inside the response
+        script += "make {} index={}; out;".format(SEPARATOR_TYPE, index)
+        script += ".query{} out {};".format(index, query["out"])
+    return script
+
+
+def splitBatchResult(elements, queryCount):
+    """splits the elements of a batch query response into one element list per query"""
+    results = [[] for _ in range(queryCount)]
+    currentResult = None
+    for element in elements:
+        if element["type"] == SEPARATOR_TYPE:
+            currentResult = results[int(element["tags"]["index"])]
+        elif currentResult is None:
+            raise ValueError("Batch response does not start with a separator, got {}".format(element))
+        else:
+            currentResult.append(element)
+    return results
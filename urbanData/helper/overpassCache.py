@@ -0,0 +1,187 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from helper.jsonStream import JsonArrayStream
+
+
+class OverpassCache():
+    """
+    content-addressed on-disk cache for overpass responses (list of osm elements)
+
+    an entry is keyed by (areaId, elementType, selector, out) and stored as one json file
+    mtime of an entry = time it was fetched (used for ttl)
+    atime of an entry = time it was last used (used for lru eviction)
+    """
+
+    def __init__(self, cacheDir='out/cache/overpass/', ttl: timedelta = timedelta(days=7), maxSizeInBytes=500 * 1024**2):
+        """
+            cacheDir: directory for the cache entries (created on first write)
+            ttl: entries older than this are stale
+            maxSizeInBytes: least recently used entries are evicted if the cache grows bigger
+        """
+        self.cacheDir = Path(cacheDir)
+        self.ttl = ttl
+        self.maxSizeInBytes = maxSizeInBytes
+
+    @staticmethod
+    def keyFields(areaId, elementType, selector, out='geom'):
+        """the fields identifying a query (also stored inside the entry for refreshing it later on)"""
+        if not isinstance(selector, list):
+            selector = [selector]
+        return {"areaId": areaId, "elementType": elementType, "selector": selector, "out": out}
+
+    @staticmethod
+    def key(keyFields):
+        serialized = json.dumps(keyFields, sort_keys=True)
+        return hashlib.sha1(serialized.encode('utf-8')).hexdigest()
+
+    def entryPath(self, keyFields) -> Path:
+        return self.cacheDir / "{}.json".format(self.key(keyFields))
+
+    def isStale(self, path: Path):
+        age = time.time() - path.stat().st_mtime
+        return age > self.ttl.total_seconds()
+
+    def get(self, keyFields, allowStale=False):
+        """returns the cached elements or None (if not cached or stale)"""
+        path = self.entryPath(keyFields)
+        if not path.is_file():
+            return None
+        if not allowStale and self.isStale(path):
+            logging.debug("Cache entry {} is stale".format(path.name))
+            return None
+        with open(path, encoding='UTF-8') as file:
+            entry = json.load(file)
+        self.touch(path)
+        return entry["elements"]
+
+    def stream(self, keyFields, allowStale=False):
+        """like get, but returns a generator parsing the cached elements incrementally"""
+        path = self.entryPath(keyFields)
+        if not path.is_file() or (not allowStale and self.isStale(path)):
+            return None
+        self.touch(path)
+        return self.streamEntry(path)
+
+    def streamEntry(self, path: Path):
+        with open(path, encoding='UTF-8') as file:
+            yield from JsonArrayStream.fromFile(file)
+
+    def writeThrough(self, keyFields, elements):
+        """
+        yields the elements while writing them into the cache entry
+        the entry is only stored if all elements were consumed
+        """
+        self.cacheDir.mkdir(parents=True, exist_ok=True)
+        path = self.entryPath(keyFields)
+        tmpPath = self.tmpPath(path)
+        completed = False
+        try:
+            with open(tmpPath, 'w', encoding='UTF-8') as file:
+                # elements are stored last, so they can be streamed again
+                file.write('{{"key": {}, "elements": ['.format(json.dumps(keyFields)))
+                for index, element in enumerate(elements):
+                    if index > 0:
+                        file.write(",")
+                    json.dump(element, file)
+                    yield element
+                file.write("]}")
+            completed = True
+        finally:
+            if completed:
+                os.replace(tmpPath, path)
+                self.evict()
+            elif tmpPath.exists():
+                tmpPath.unlink()
+
+    def set(self, keyFields, elements):
+        """stores the elements for the key and evicts old entries if the cache got too big"""
+        self.cacheDir.mkdir(parents=True, exist_ok=True)
+        path = self.entryPath(keyFields)
+        # write to temporary file first, so concurrent readers never see half written entries
+        tmpPath = self.tmpPath(path)
+        with open(tmpPath, 'w', encoding='UTF-8') as file:
+            json.dump({"key": keyFields, "elements": elements}, file)
+        os.replace(tmpPath, path)
+        self.evict()
+
+    @staticmethod
+    def tmpPath(path: Path):
+        return path.with_suffix(".tmp{}-{}".format(os.getpid(), threading.get_ident()))
+
+    def touch(self, path: Path):
+        """marks the entry as used (keeping the fetch time)"""
+        os.utime(path, (time.time(), path.stat().st_mtime))
+
+    def entries(self):
+        if not self.cacheDir.is_dir():
+            return []
+        return list(self.cacheDir.glob("*.json"))
+
+    def staleEntries(self):
+        """key fields of every stale entry"""
+        staleKeys = []
+        for path in self.entries():
+            if self.isStale(path):
+                with open(path, encoding='UTF-8') as file:
+                    staleKeys.append(json.load(file)["key"])
+        return staleKeys
+
+    def evict(self):
+        """removes least recently used entries till the cache fits into maxSizeInBytes"""
+        entries = [(path, path.stat()) for path in self.entries()]
+        cacheSize = sum(stat.st_size for _, stat in entries)
+        if cacheSize <= self.maxSizeInBytes:
+            return
+        entries.sort(key=lambda entry: entry[1].st_atime)
+        for path, stat in entries:
+            if cacheSize <= self.maxSizeInBytes:
+                break
+            logging.debug("Evicting cache entry {}".format(path.name))
+            path.unlink()
+            cacheSize -= stat.st_size
+
+    def clear(self):
+        for path in self.entries():
+            path.unlink()
+
+
+class AreaIdCache():
+    """
+    persistent mapping location name -> overpass area id (as the areas hardly ever change, there is no ttl)
+    also used for other values of a location (f.i. its center)
+    the file is only read on the first lookup
+    """
+
+    def __init__(self, cacheFile='out/cache/areaIds.json'):
+        self.cacheFile = Path(cacheFile)
+        self.areaIds = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        if self.areaIds is None:
+            if self.cacheFile.is_file():
+                with open(self.cacheFile, encoding='UTF-8') as file:
+                    self.areaIds = json.load(file)
+            else:
+                self.areaIds = {}
+        return self.areaIds
+
+    def get(self, locationName):
+        with self.lock:
+            return self.load().get(locationName)
+
+    def set(self, locationName, areaId):
+        with self.lock:
+            self.load()[locationName] = areaId
+            self.cacheFile.parent.mkdir(parents=True, exist_ok=True)
+            tmpPath = OverpassCache.tmpPath(self.cacheFile)
+            with open(tmpPath, 'w', encoding='UTF-8') as file:
+                json.dump(self.areaIds, file, indent=2, ensure_ascii=False)
+            os.replace(tmpPath, self.cacheFile)
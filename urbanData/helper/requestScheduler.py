@@ -0,0 +1,191 @@
+import logging
+import random
+import threading
+import time
+import urllib.error
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+
+# http status codes, which are worth another try
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def statusCode(error):
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code
+    return None
+
+
+def isTransientError(error):
+    """connection problems, timeouts and overloaded apis (OSMPythonTools wraps the original error in the exception args)"""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, TimeoutError, ConnectionError)):
+        return True
+    code = statusCode(error)
+    if code is not None:
+        return code in TRANSIENT_STATUS_CODES
+    if isinstance(error, urllib.error.URLError):
+        return True
+    return any(isinstance(arg, Exception) and isTransientError(arg) for arg in error.args)
+
+
+def retryAfter(error):
+    """seconds to wait according to the Retry-After header of the response (None if not set)"""
+    headers = None
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        headers = error.response.headers
+    elif isinstance(error, urllib.error.HTTPError):
+        headers = error.headers
+    else:
+        for arg in error.args:
+            if isinstance(arg, Exception):
+                return retryAfter(arg)
+    value = headers.get("Retry-After") if headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+
+
+class TokenBucket():
+    """allows bursts of capacity requests, afterwards requestsPerSecond"""
+
+    def __init__(self, requestsPerSecond, capacity=1):
+        self.rate = requestsPerSecond
+        self.capacity = capacity
+        self.tokens = capacity
+        self.lastRefill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.lastRefill) * self.rate)
+                self.lastRefill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                waitTime = (1 - self.tokens) / self.rate
+            time.sleep(waitTime)
+
+
+class RetryBudget():
+    """retries may only make up a share of all requests, so a failing api is not hammered by every caller"""
+
+    def __init__(self, ratio=0.2, minRetries=10):
+        self.ratio = ratio
+        self.minRetries = minRetries
+        self.requests = 0
+        self.retries = 0
+        self.lock = threading.Lock()
+
+    def recordRequest(self):
+        with self.lock:
+            self.requests += 1
+
+    def tryRetry(self):
+        with self.lock:
+            if self.retries >= self.minRetries + self.ratio * self.requests:
+                return False
+            self.retries += 1
+            return True
+
+
+class RequestScheduler():
+    """
+    rate limits, bounds the parallel requests and retries calls to one api
+    """
+
+    def __init__(self, name, requestsPerSecond=1, burst=1, maxConcurrentRequests=None, maxRetries=5,
+                 baseDelay=1, maxDelay=120, retryRatio=0.2, minRetries=10):
+        """
+            burst: number of requests which can be send without waiting (after some idle time)
+            maxConcurrentRequests: limit of requests at the same time (None for no limit)
+            maxRetries: retries of a single call
+            baseDelay, maxDelay: bounds in seconds for the exponential backoff
+            retryRatio, minRetries: retry budget shared by all calls
+        """
+        self.name = name
+        self.bucket = TokenBucket(requestsPerSecond, burst)
+        self.semaphore = threading.BoundedSemaphore(maxConcurrentRequests) if maxConcurrentRequests else None
+        self.maxRetries = maxRetries
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.retryBudget = RetryBudget(retryRatio, minRetries)
+        self.local = threading.local()
+
+    @contextmanager
+    def slot(self):
+        """
+        holds one of the concurrent request slots (f.i. while a streamed response is read)
+        reentrant for the same thread, so calls inside the block do not wait for a second slot
+        """
+        depth = getattr(self.local, "depth", 0)
+        if self.semaphore and depth == 0:
+            self.semaphore.acquire()
+        self.local.depth = depth + 1
+        try:
+            yield
+        finally:
+            self.local.depth = depth
+            if self.semaphore and depth == 0:
+                self.semaphore.release()
+
+    def backoffDelay(self, attempt, error):
+        """exponential backoff with full jitter (Retry-After of the api is preferred)"""
+        delay = retryAfter(error)
+        if delay is not None:
+            return min(delay, self.maxDelay)
+        return random.uniform(0, min(self.maxDelay, self.baseDelay * 2 ** attempt))
+
+    def call(self, function, *args, isRetryable=isTransientError, **kwargs):
+        """calls function once a token and a slot are available, transient errors are retried"""
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            self.retryBudget.recordRequest()
+            try:
+                with self.slot():
+                    return function(*args, **kwargs)
+            except Exception as error:
+                if attempt >= self.maxRetries or not isRetryable(error):
+                    raise
+                if not self.retryBudget.tryRetry():
+                    logging.error("[{}] retry budget exhausted".format(self.name))
+                    raise
+                delay = self.backoffDelay(attempt, error)
+                logging.warning("[{}] {} (retry {} in {:.1f}s)".format(self.name, error, attempt + 1, delay))
+                time.sleep(delay)
+                attempt += 1
+
+
+# limits of the used apis
+OVERPASS_LIMITS = dict(requestsPerSecond=1, burst=2, maxConcurrentRequests=2)
+# https://operations.osmfoundation.org/policies/nominatim/ (max. 1 request per second)
+NOMINATIM_LIMITS = dict(requestsPerSecond=1, burst=1, maxConcurrentRequests=1)
+DVB_LIMITS = dict(requestsPerSecond=0.5, burst=3, maxConcurrentRequests=1)
+# up to 10 searches per request / minute and 5000 calls per month
+TRAVELTIME_LIMITS = dict(requestsPerSecond=10 / 60, burst=1, maxConcurrentRequests=1)
+# f.i. the OsmStandInServer (throttling would distort benchmarks)
+LOCAL_LIMITS = dict(requestsPerSecond=1000, burst=1000, maxConcurrentRequests=None)
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1"}
+
+_schedulers = {}
+_schedulersLock = threading.Lock()
+
+
+def getScheduler(endpoint, **limits):
+    """scheduler shared by every caller of the endpoint (limits are only used when it is created)"""
+    if urlparse(endpoint).hostname in LOCAL_HOSTS:
+        limits = LOCAL_LIMITS
+    with _schedulersLock:
+        if endpoint not in _schedulers:
+            _schedulers[endpoint] = RequestScheduler(endpoint, **limits)
+        return _schedulers[endpoint]
@@ -0,0 +1,103 @@
+from functools import cached_property
+from typing import List
+
+import numpy as np
+
+
+class CsrIndex():
+    """
+    mapping of groups to the indices of their members in compressed sparse row format
+    members of group i: indices[offsets[i]:offsets[i + 1]]
+    """
+
+    def __init__(self, offsets: np.ndarray, indices: np.ndarray):
+        self.offsets = offsets
+        self.indices = indices
+
+    @classmethod
+    def fromLists(cls, memberLists: List[List[int]]) -> "CsrIndex":
+        lengths = np.fromiter((len(members) for members in memberLists), dtype=np.int64, count=len(memberLists))
+        offsets = np.zeros(len(memberLists) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        indices = np.fromiter((index for members in memberLists for index in members), dtype=np.int64, count=offsets[-1])
+        return cls(offsets, indices)
+
+    @classmethod
+    def fromFeatures(cls, features, foreignKey: str) -> "CsrIndex":
+        """f.i. groups with the indices of their buildings in the __buildings property"""
+        return cls.fromLists([feature["properties"][foreignKey] for feature in features])
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @cached_property
+    def segmentIds(self) -> np.ndarray:
+        """group of each entry of indices"""
+        return np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.offsets))
+
+
+def toFloatArray(values) -> np.ndarray:
+    """missing values (None) become NaN"""
+    if isinstance(values, np.ndarray):
+        return values.astype(np.float64)
+    return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+
+def segmentSum(values: np.ndarray, csr: CsrIndex) -> np.ndarray:
+    """sum of the members per group (missing values are ignored, 0 for empty groups)"""
+    memberValues = values[csr.indices]
+    valid = ~np.isnan(memberValues)
+    return np.bincount(csr.segmentIds[valid], weights=memberValues[valid], minlength=len(csr))
+
+
+def segmentCount(values: np.ndarray, csr: CsrIndex) -> np.ndarray:
+    """number of members with a value per group"""
+    valid = ~np.isnan(values[csr.indices])
+    return np.bincount(csr.segmentIds[valid], minlength=len(csr))
+
+
+def segmentMean(values: np.ndarray, csr: CsrIndex) -> np.ndarray:
+    """mean of the members with a value per group (NaN if there is none)"""
+    counts = segmentCount(values, csr)
+    sums = segmentSum(values, csr)
+    means = np.full(len(csr), np.nan)
+    np.divide(sums, counts, out=means, where=counts > 0)
+    return means
+
+
+def segmentNonZeroMean(values: np.ndarray, csr: CsrIndex) -> np.ndarray:
+    """mean of the non zero members per group (0 if there is none) f.i. for building levels, where 0 means unknown"""
+    values = np.where(values == 0, np.nan, values)
+    return np.nan_to_num(segmentMean(values, csr), nan=0.0)
+
+
+def segmentDistinctUnion(valueLists, csr: CsrIndex) -> List[list]:
+    """sorted distinct union of the (list) values of the members per group (missing values are ignored)"""
+    codes = {}
+    memberSegments, memberCodes = [], []
+    for segment, index in zip(csr.segmentIds.tolist(), csr.indices.tolist()):
+        for value in valueLists[index] or []:
+            memberSegments.append(segment)
+            memberCodes.append(codes.setdefault(value, len(codes)))
+    sortedValues = sorted(codes.keys(), key=str)
+    # codes in the order of the sorted values, so the unions are sorted as well
+    rank = np.empty(len(codes), dtype=np.int64)
+    rank[[codes[value] for value in sortedValues]] = np.arange(len(codes))
+    categories = max(len(codes), 1)
+    pairs = np.unique(np.array(memberSegments, dtype=np.int64) * categories + rank[np.array(memberCodes, dtype=np.int64)])
+    segments, ranks = np.divmod(pairs, categories)
+    bounds = np.searchsorted(segments, np.arange(len(csr) + 1)).tolist()
+    ranks = ranks.tolist()
+    return [[sortedValues[r] for r in ranks[bounds[i]:bounds[i + 1]]] for i in range(len(csr))]
+
+
+# reductions usable as BaseAnnotator.segmentReduction (besides "union")
+NUMERIC_REDUCTIONS = {"sum": segmentSum, "count": segmentCount, "mean": segmentMean, "nonZeroMean": segmentNonZeroMean}
+
+
+def reduceSegments(reduction: str, values: list, csr: CsrIndex) -> list:
+    """aggregated value per group as python values (f.i. to be stored as geojson property), NaN becomes None"""
+    if reduction == "union":
+        return segmentDistinctUnion(values, csr)
+    result = NUMERIC_REDUCTIONS[reduction](toFloatArray(values), csr)
+    return [None if np.isnan(value) else value for value in result.tolist()]
@@ -1,10 +1,16 @@
+import numpy as np
 from shapely.strtree import STRtree
 from shapely.geometry import shape as shapeFunc
+from shapely.prepared import prep
+from shapely import __version__ as shapelyVersion
 from helper.geoJsonConverter import shapeGeomToGeoJson
 from helper.geoJsonHelper import groupBy
 import geojson
 import logging
 
+# STRtree.query supports predicates and arrays of geometries since shapely 2
+SHAPELY_2 = int(shapelyVersion.split(".")[0]) >= 2
+
 def intersections(geoJsonFeatureCollection, idProperty = "name", kindOfFeatures = "stations", maxIterations = None):
     """
         calculates every intersection of the geometries ...
@@ -91,4 +97,57 @@ def geomCenter(geom):
     """
         returns the center point for an arbitrary geometry
     """
-    return shapeFunc(geom).centroid.coords[0]
\ No newline at end of file
+    return shapeFunc(geom).centroid.coords[0]
+
+
+# geometry.predicate(other) == other.CONVERSE_PREDICATES[predicate](geometry)
+CONVERSE_PREDICATES = {"intersects": "intersects", "within": "contains", "contains": "within", "overlaps": "overlaps",
+                       "touches": "touches", "crosses": "crosses", "covers": "covered_by", "covered_by": "covers"}
+
+
+def spatialJoin(geometries, otherGeometries, predicate = "intersects"):
+    """
+        pairs (index in geometries, index in otherGeometries) for which geometry.predicate(otherGeometry) holds
+        returned as two numpy arrays sorted by the first index (missing geometries (None) are skipped)
+
+        predicate: f.i. "intersects", "contains" or "within"
+    """
+    indices = [index for index, geometry in enumerate(geometries) if geometry is not None]
+    otherIndices = [index for index, geometry in enumerate(otherGeometries) if geometry is not None]
+    if not indices or not otherIndices:
+        return np.array([], dtype=int), np.array([], dtype=int)
+    if SHAPELY_2:
+        # one vectorized query for all geometries
+        tree = STRtree([otherGeometries[index] for index in otherIndices])
+        pairs = tree.query(np.asarray([geometries[index] for index in indices], dtype=object), predicate=predicate)
+        left, right = np.asarray(indices)[pairs[0]], np.asarray(otherIndices)[pairs[1]]
+    else:
+        left, right = spatialJoinShapely1(geometries, indices, otherGeometries, otherIndices, predicate)
+    order = np.lexsort((right, left))
+    return left[order], right[order]
+
+
+def spatialJoinShapely1(geometries, indices, otherGeometries, otherIndices, predicate):
+    """
+        shapely 1.x: one tree over the bigger side, queried with each (prepared) geometry of the smaller side
+        (thus only the smaller side is prepared, f.i. the osm objects instead of every building)
+    """
+    queryingGeometries = len(indices) <= len(otherIndices)
+    if queryingGeometries:
+        queryGeometries, queryIndices, treeGeometries, treeIndices = geometries, indices, otherGeometries, otherIndices
+        queryPredicate = predicate
+    else:
+        queryGeometries, queryIndices, treeGeometries, treeIndices = otherGeometries, otherIndices, geometries, indices
+        queryPredicate = CONVERSE_PREDICATES[predicate]
+    tree = STRtree([treeGeometries[index] for index in treeIndices])
+    # the tree returns the geometries, not their positions
+    indexById = {id(treeGeometries[index]): index for index in treeIndices}
+    queryResult, treeResult = [], []
+    for queryIndex in queryIndices:
+        geometry = queryGeometries[queryIndex]
+        check = getattr(prep(geometry), queryPredicate, None) or getattr(geometry, queryPredicate)
+        matches = [indexById[id(other)] for other in tree.query(geometry) if check(other)]
+        queryResult += [queryIndex] * len(matches)
+        treeResult += matches
+    queryResult, treeResult = np.array(queryResult, dtype=int), np.array(treeResult, dtype=int)
+    return (queryResult, treeResult) if queryingGeometries else (treeResult, queryResult)
@@ -2,7 +2,6 @@ import json
 from matplotlib import cm
 import folium
 from folium.plugins.measure_control import MeasureControl
-from OSMPythonTools.nominatim import Nominatim
 
 from helper.geoJsonHelper import groupBy, unionFeatureCollections
 from helper.geoJsonToFolium import geoFeatureCollectionToFoliumFeatureGroup
@@ -16,27 +15,7 @@ from helper.OsmDataQuery import OsmDataQuery
 # postfix for f.i. file_names
 areaName = "pieschen"
 # area to query
-pieschen = Nominatim().query('Pieschen, Dresden, Germany')
-
-pieschenCoord = pieschen.toJSON()[0]
-map = folium.Map(
-    location=[pieschenCoord["lat"], pieschenCoord["lon"]], tiles='Open Street Map', zoom_start=15)
-
-#yellowPages
-file = open("out/data/scraper/yellowPages_Dresden_Pieschen.json", encoding='UTF-8')
-yellowCompanies = json.load(file)
-
-yellowFeature = geoFeatureCollectionToFoliumFeatureGroup(yellowCompanies, "yellow", "yellowPages", switchLatAndLong = False)
-yellowFeature.add_to(map)
-
-
-# handels register
-file = open("out/data/scraper/handelsregister_Dresden_Pieschen.json", encoding='UTF-8')
-handelsRegisterCompanies = json.load(file)
-
-registerFeature = geoFeatureCollectionToFoliumFeatureGroup(handelsRegisterCompanies, "blue", "handelsRegister", switchLatAndLong = False)
-registerFeature.add_to(map)
-
+areaLocation = 'Pieschen, Dresden, Germany'
 
 # osm companies: often specify a name ? (tourism for holiday apartments f.i. , ... see data to collect)
 namedAmenitiesThings = OsmDataQuery("osm_named_amenities", OsmObject.WAYANDNODE, ["name", "amenity",'"amenity"!~"vending_machine|parking"'], "")
@@ -45,22 +24,43 @@ namedShopsThings = OsmDataQuery("osm_named_shops", OsmObject.WAYANDNODE, ["name"
 namedCraftThings = OsmDataQuery("osm_named_crafts", OsmObject.WAYANDNODE, ["name", "craft", 'amenity!~"."','leisure!~"."', 'shop!~"."'], "")
 namedCompaniesThings = OsmDataQuery("osm_named_companies", OsmObject.WAYANDNODE, ["name", "company", 'amenity!~"."','leisure!~"."', 'shop!~"."','craft!~"."'], "")
 osmQueries = [namedAmenitiesThings, namedCompaniesThings, namedCraftThings, namedCompaniesThings, namedShopsThings]
-osmData = OverPassHelper().directFetch(areaId=pieschen.areaId(), osmQueries=osmQueries)
 
-unionData = unionFeatureCollections(*osmData)
+if __name__ == "__main__":
+    overPassHelper = OverPassHelper()
+    map = folium.Map(
+        location=overPassHelper.getAreaCenter(areaLocation), tiles='Open Street Map', zoom_start=15)
+
+    #yellowPages
+    file = open("out/data/scraper/yellowPages_Dresden_Pieschen.json", encoding='UTF-8')
+    yellowCompanies = json.load(file)
+
+    yellowFeature = geoFeatureCollectionToFoliumFeatureGroup(yellowCompanies, "yellow", "yellowPages", switchLatAndLong = False)
+    yellowFeature.add_to(map)
+
+
+    # handels register
+    file = open("out/data/scraper/handelsregister_Dresden_Pieschen.json", encoding='UTF-8')
+    handelsRegisterCompanies = json.load(file)
+
+    registerFeature = geoFeatureCollectionToFoliumFeatureGroup(handelsRegisterCompanies, "blue", "handelsRegister", switchLatAndLong = False)
+    registerFeature.add_to(map)
+
+    osmData = overPassHelper.directFetch(areaId=overPassHelper.getAreaId(areaLocation), osmQueries=osmQueries, batched=True)
+
+    unionData = unionFeatureCollections(*osmData)
 
-osmFeature = geoFeatureCollectionToFoliumFeatureGroup(unionData, "pink", "Named amenities/leisure/shops/craft/companies in osm", switchLatAndLong = True)
-osmFeature.add_to(map)
+    osmFeature = geoFeatureCollectionToFoliumFeatureGroup(unionData, "pink", "Named amenities/leisure/shops/craft/companies in osm", switchLatAndLong = True)
+    osmFeature.add_to(map)
 
-# buildingRegions
-file = open("out/data/apartmentRegions_pieschen.json", encoding='UTF-8')
-handelsRegisterCompanies = json.load(file)
+    # buildingRegions
+    file = open("out/data/apartmentRegions_pieschen.json", encoding='UTF-8')
+    handelsRegisterCompanies = json.load(file)
 
-registerFeature = geoFeatureCollectionToFoliumFeatureGroup(handelsRegisterCompanies, "green", "ApartmentRegions", switchLatAndLong = True)
-registerFeature.add_to(map)
+    registerFeature = geoFeatureCollectionToFoliumFeatureGroup(handelsRegisterCompanies, "green", "ApartmentRegions", switchLatAndLong = True)
+    registerFeature.add_to(map)
 
-folium.LayerControl().add_to(map)
+    folium.LayerControl().add_to(map)
 
-fileName = "out/scrapedCompaniesMap_{}.html".format(areaName)
-map.save(fileName)
-print("Map saved in {}".format(fileName))
+    fileName = "out/scrapedCompaniesMap_{}.html".format(areaName)
+    map.save(fileName)
+    print("Map saved in {}".format(fileName))
@@ -0,0 +1,52 @@
+import unittest
+import tempfile
+import os
+
+# a square boundary (relation 1) containing a shop and a building, with a second shop outside
+EXTRACT = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <node id="1" lat="0.0" lon="0.0"/>
+  <node id="2" lat="0.0" lon="1.0"/>
+  <node id="3" lat="1.0" lon="1.0"/>
+  <node id="4" lat="1.0" lon="0.0"/>
+  <node id="5" lat="0.5" lon="0.5"><tag k="shop" v="bakery"/><tag k="name" v="Inside"/></node>
+  <node id="6" lat="5.0" lon="5.0"><tag k="shop" v="bakery"/><tag k="name" v="Outside"/></node>
+  <node id="7" lat="0.2" lon="0.2"/>
+  <node id="8" lat="0.2" lon="0.3"/>
+  <node id="9" lat="0.3" lon="0.3"/>
+  <way id="10"><nd ref="1"/><nd ref="2"/><nd ref="3"/></way>
+  <way id="11"><nd ref="3"/><nd ref="4"/><nd ref="1"/></way>
+  <way id="12"><nd ref="7"/><nd ref="8"/><nd ref="9"/><nd ref="7"/><tag k="building" v="yes"/></way>
+  <relation id="1">
+    <member type="way" ref="10" role="outer"/>
+    <member type="way" ref="11" role="outer"/>
+    <tag k="type" v="boundary"/><tag k="boundary" v="administrative"/><tag k="name" v="Square"/>
+  </relation>
+</osm>
+"""
+
+# school grounds covering the whole square
+SCHOOL = """  <way id="13"><nd ref="1"/><nd ref="2"/><nd ref="3"/><nd ref="4"/><nd ref="1"/><tag k="amenity" v="school"/><tag k="name" v="Schule"/></way>
+</osm>"""
+
+
+def writeExtract(directory, extract=EXTRACT, fileName="square.osm"):
+    """writes the extract into the directory and returns its path"""
+    extractPath = os.path.join(directory, fileName)
+    with open(extractPath, "w") as file:
+        file.write(extract)
+    return extractPath
+
+
+class ExtractTestCase(unittest.TestCase):
+    """writes the extract of the class into a temporary directory (cls.dir) shared by its tests"""
+    extract = EXTRACT
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dir = tempfile.TemporaryDirectory()
+        cls.extractPath = writeExtract(cls.dir.name, cls.extract)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.dir.cleanup()
@@ -2,13 +2,33 @@ import unittest
 
 import sys, os
 sys.path.insert(1, os.path.abspath('..'))
-from annotater.addressAnnotator import AddressAnnotator
+from shapely.geometry import box
+from annotater.osmAnnotater import AddressAnnotator
+from helper.osmExtractHelper import OsmExtractHelper
+from tests.osmExtractFixture import ExtractTestCase, EXTRACT
 
-class TestAddressAnnotator(unittest.TestCase):
+# first node of the building (way 12) is an entrance with an address
+ADDRESS_NODE = '<node id="7" lat="0.2" lon="0.2"><tag k="addr:street" v="Teststraße"/><tag k="addr:housenumber" v="1"/><tag k="addr:postcode" v="01127"/></node>'
+
+class TestAddressAnnotator(ExtractTestCase):
+    extract = EXTRACT.replace('<node id="7" lat="0.2" lon="0.2"/>', ADDRESS_NODE)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.annotator = AddressAnnotator("Square", overpassHelper=OsmExtractHelper(cls.extractPath))
 
     def test_annotator(self):
-        pass
-        # TODO
+        # closed way contains node 7 twice
+        building = {"type": "Feature", "geometry": box(0.2, 0.2, 0.3, 0.3).__geo_interface__,
+                    "properties": {"__nodeIds": [7, 8, 9, 7]}}
+        self.annotator.annotate(building)
+        self.assertEqual(building["properties"]["addresses"], {"01127, Teststraße": ["1"]})
+
+    def test_annotatorWithoutNodeIds(self):
+        building = {"type": "Feature", "geometry": box(0.1, 0.1, 0.25, 0.25).__geo_interface__, "properties": {}}
+        self.annotator.annotate(building)
+        self.assertEqual(building["properties"]["addresses"], {"01127, Teststraße": ["1"]})
 
 
 if __name__ == '__main__':
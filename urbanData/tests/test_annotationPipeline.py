@@ -0,0 +1,139 @@
+import unittest
+import copy
+import threading
+
+import sys, os
+sys.path.insert(1, os.path.abspath('..'))
+from annotater.annotationPipeline import annotationTasks, dependencies, runAnnotators
+from annotater.baseAnnotator import BaseAnnotator
+from annotater.buildingClassifier import BuildingTypeClassifier, LandUseAnnotator
+from annotater.buildingLvlAnnotator import BuildingLvlAnnotator
+from annotater.companyAnnotator import CompanyAnnotator
+from annotater.osmAnnotater import AddressAnnotator, OsmCompaniesAnnotator, AmentiyAnnotator, LeisureAnnotator, EducationAggregator, SafetyAggregator
+from helper.OsmObjectType import OsmObjectType
+from helper.osmPoiIndex import OsmPoiIndex
+
+
+class BarrierAnnotator(BaseAnnotator):
+    """only finishes if another annotator runs at the same time"""
+
+    def __init__(self, writeProperty, barrier):
+        self.writeProperty = writeProperty
+        self.barrier = barrier
+
+    def annotateAll(self, objects):
+        self.barrier.wait()
+        return super().annotateAll(objects)
+
+    def annotate(self, object):
+        object["properties"][self.writeProperty] = 1
+        return object
+
+    @staticmethod
+    def aggregateProperties(properties):
+        return sum(properties)
+
+
+def building(id, properties):
+    return {"type": "Feature", "id": id, "geometry": None, "properties": properties}
+
+
+class TestAnnotationPipeline(unittest.TestCase):
+
+    def setUp(self):
+        street = "01127, Oschatzer Straße"
+        self.buildings = {"type": "FeatureCollection", "features": [
+            building(0, {"building:levels": "3", "addresses": {street: ["1"]}}),
+            building(1, {"building": "school", "name": "Schule", "roof:levels": "1", "addresses": {street: ["2"]}}),
+            building(2, {"building": "police", "addresses": {street: ["3"]}})]}
+        self.groups = {"type": "FeatureCollection", "features": [
+            {"type": "Feature", "geometry": None, "properties": {"__buildings": [0, 1]}},
+            {"type": "Feature", "geometry": None, "properties": {"__buildings": [2]}}]}
+        self.regions = {"type": "FeatureCollection", "features": [
+            {"type": "Feature", "geometry": None, "properties": {"__buildingGroups": [0, 1]}}]}
+        company = {"postalCode": "01127", "street": "Oschatzer Straße", "branch": "bakery", "name": "Bäckerei"}
+        self.companies = [dict(company, houseNumber="1"), dict(company, houseNumber="3")]
+
+    def test_Dependencies(self):
+        poiIndex = OsmPoiIndex("Dresden")
+        annotators = [AddressAnnotator("Dresden", poiIndex=poiIndex),
+                      BuildingLvlAnnotator(),
+                      CompanyAnnotator(companyData=self.companies),
+                      OsmCompaniesAnnotator("Dresden", OsmObjectType.WAYANDNODE, poiIndex=poiIndex),
+                      LandUseAnnotator("Dresden", OsmObjectType.WAY, poiIndex=poiIndex),
+                      LeisureAnnotator("Dresden", OsmObjectType.WAYANDNODE, poiIndex=poiIndex),
+                      AmentiyAnnotator("Dresden", OsmObjectType.WAYANDNODE, poiIndex=poiIndex),
+                      BuildingTypeClassifier(),
+                      SafetyAggregator(),
+                      EducationAggregator()]
+        tasks = annotationTasks(annotators, self.buildings, self.groups, {"a": self.regions, "b": self.regions})
+        names = [task.name for task in tasks]
+        dependsOn = {task.name: {names[j] for j in taskDependencies} for task, taskDependencies in zip(tasks, dependencies(tasks))}
+
+        self.assertEqual(dependsOn["OsmPoiIndex.load(Dresden)"], set())
+        self.assertEqual(dependsOn["AddressAnnotator.annotateAll"], {"OsmPoiIndex.load(Dresden)"})
+        self.assertEqual(dependsOn["BuildingLvlAnnotator.annotateAll"], set())
+        self.assertEqual(dependsOn["CompanyAnnotator.annotateAll"], {"AddressAnnotator.annotateAll"})
+        self.assertEqual(len([task for task in tasks if task.io]), 1)
+        self.assertEqual(dependsOn["BuildingTypeClassifier.annotateAll"],
+                         {"CompanyAnnotator.annotateAll", "OsmCompaniesAnnotator.annotateAll", "LandUseAnnotator.annotateAll",
+                          "LeisureAnnotator.annotateAll", "AmentiyAnnotator.annotateAll"})
+        # the classifier has to read the safety entries before the SafetyAggregator adds its own
+        self.assertIn("BuildingTypeClassifier.annotateAll", dependsOn["SafetyAggregator.annotateAll"])
+        self.assertIn("AmentiyAnnotator.annotateAll", dependsOn["SafetyAggregator.annotateAll"])
+        # the aggregation of the companies waits for both company annotators
+        self.assertIn("CompanyAnnotator.aggregateToRegions(b)", dependsOn["OsmCompaniesAnnotator.aggregateToGroups"])
+        self.assertEqual(dependsOn["BuildingLvlAnnotator.aggregateToRegions(a)"], {"BuildingLvlAnnotator.aggregateToGroups"})
+
+    def test_SameResultAsSequential(self):
+        createAnnotators = lambda: [BuildingLvlAnnotator(), CompanyAnnotator(companyData=self.companies),
+                                    BuildingTypeClassifier(), EducationAggregator(), SafetyAggregator()]
+        for feature in self.buildings["features"]:
+            feature["properties"].update({"leisures": [], "amenities": []})
+        buildings, groups, regions = copy.deepcopy((self.buildings, self.groups, self.regions))
+        for annotator in createAnnotators():
+            annotator.annotateAll(buildings)
+            annotator.aggregateToGroups(buildings, groups)
+            annotator.aggregateToRegions(groups, regions)
+
+        runAnnotators(createAnnotators(), self.buildings, self.groups, {"regions": self.regions}, maxWorkers=4)
+        self.assertEqual(self.buildings, buildings)
+        self.assertEqual(self.groups, groups)
+        self.assertEqual(self.regions, regions)
+
+    def test_IndependentAnnotatorsRunInParallel(self):
+        barrier = threading.Barrier(2, timeout=5)
+        annotators = [BarrierAnnotator("a", barrier), BarrierAnnotator("b", barrier)]
+        runAnnotators(annotators, self.buildings, self.groups, {"regions": self.regions}, maxWorkers=2)
+        self.assertEqual([f["properties"]["b"] for f in self.buildings["features"]], [1, 1, 1])
+        self.assertEqual(self.regions["features"][0]["properties"]["a"], 3)
+
+    def test_OsmDataFetchedWhileOthersRun(self):
+        barrier = threading.Barrier(2, timeout=5)
+
+        class WaitingOverpassHelper():
+            """answers only while the BarrierAnnotator runs"""
+            def getAreaId(self, areaName):
+                return 1
+
+            def getOsmGeoObjectsBatch(self, areaId, queries):
+                barrier.wait()
+                return [[] for _ in queries]
+
+        poiIndex = OsmPoiIndex("Dresden", WaitingOverpassHelper())
+        annotators = [LeisureAnnotator("Dresden", OsmObjectType.WAYANDNODE, poiIndex=poiIndex), BarrierAnnotator("a", barrier)]
+        for feature in self.buildings["features"]:
+            feature["geometry"] = {"type": "Point", "coordinates": [13.7, 51.0]}
+        # a single worker for the cpu bound tasks
+        runAnnotators(annotators, self.buildings, self.groups, {}, maxWorkers=1)
+        self.assertEqual([f["properties"]["leisures"] for f in self.buildings["features"]], [[], [], []])
+        self.assertEqual(self.groups["features"][0]["properties"]["a"], 2)
+
+    def test_FailingTask(self):
+        annotators = [BarrierAnnotator("a", threading.Barrier(2, timeout=0.1))]
+        with self.assertRaises(threading.BrokenBarrierError):
+            runAnnotators(annotators, self.buildings, self.groups, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
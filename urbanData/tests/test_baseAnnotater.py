@@ -1,21 +1,56 @@
 import unittest
+import copy
+import tempfile
 
 import sys, os
 sys.path.insert(1, os.path.abspath('..'))
-from annotater.annotator import BaseAnnotator
+from shapely.geometry import box
+from annotater.baseAnnotator import BaseAnnotator
+from annotater.buildingLvlAnnotator import BuildingLvlAnnotator
+from annotater.osmAnnotater import AmentiyAnnotator
+from helper.osmExtractHelper import OsmExtractHelper
+from helper.OsmObjectType import OsmObjectType
+from tests.osmExtractFixture import writeExtract, EXTRACT, SCHOOL
 
 class TestBaseAnnotator(unittest.TestCase):
-    
+
     def test_Constructor(self):
         dataSource = {"test":1}
         writeProperty = "annotatedProperty"
         annotator = BaseAnnotator(dataSource, writeProperty)
         self.assertEquals(annotator.dataSource, dataSource)
         self.assertEquals(annotator.writeProperty, writeProperty)
-    
+
     def test_AbstractMethod(self):
-        self.assertRaises(TypeError, BaseAnnotator(None, None).annotate(None, None))
+        self.assertRaises(NotImplementedError, BaseAnnotator(None, None).annotate, None)
+
+
+class TestAnnotateInProcesses(unittest.TestCase):
+
+    def assertSameAsSequential(self, createAnnotator, buildings):
+        expected = createAnnotator().annotateAll(copy.deepcopy(buildings))
+        annotator = createAnnotator()
+        annotator.processes = 2
+        annotator.chunkSize = 2
+        annotated = annotator.annotateAll(buildings)
+        self.assertEqual(annotated["features"], expected["features"])
+        # properties are merged into the passed features
+        self.assertEqual(buildings["features"], expected["features"])
+
+    def test_BuildingLevels(self):
+        buildings = {"type": "FeatureCollection", "features": [
+            {"type": "Feature", "geometry": None, "properties": {"building:levels": str(i), "roof:levels": "1"}} for i in range(5)]}
+        self.assertSameAsSequential(BuildingLvlAnnotator, buildings)
+
+    def test_OsmAnnotator(self):
+        with tempfile.TemporaryDirectory() as dir:
+            extractPath = writeExtract(dir, EXTRACT.replace("</osm>", SCHOOL))
+            buildings = {"type": "FeatureCollection", "features": [
+                {"type": "Feature", "geometry": box(x, x, x + 0.2, x + 0.2).__geo_interface__, "properties": {}}
+                for x in [0.1, 0.4, 0.9, 0.2, 0.45]]}
+            self.assertSameAsSequential(lambda: AmentiyAnnotator("Square", OsmObjectType.WAYANDNODE, OsmExtractHelper(extractPath)), buildings)
+            self.assertEqual(buildings["features"][1]["properties"]["__amenityTypes"], ["school"])
 
 
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
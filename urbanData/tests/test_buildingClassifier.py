@@ -0,0 +1,61 @@
+import unittest
+
+import sys, os
+sys.path.insert(1, os.path.abspath('..'))
+from annotater.buildingClassifier import BuildingTypeClassifier, BUILDING_TAG_PATTERN
+from helper.featureTable import FeatureTable
+
+
+def collection(propertiesList):
+    return {"type": "FeatureCollection", "features": [{"type": "Feature", "geometry": None, "properties": p} for p in propertiesList]}
+
+
+class TestBuildingTypeClassifier(unittest.TestCase):
+
+    def setUp(self):
+        self.classifier = BuildingTypeClassifier()
+
+    def classify(self, properties):
+        return self.classifier.classify({"type": "Feature", "geometry": None, "properties": properties})
+
+    def test_BuildingTag(self):
+        # prefixes match the beginning of the tag, the first matching rule wins
+        self.assertEqual(self.classify({"building": "houseboat"}), ["residential"])
+        self.assertEqual(self.classify({"building": "residential"}), ["residential"])
+        self.assertEqual(self.classify({"building": "university"}), ["education"])
+        self.assertEqual(self.classify({"building": "garage"}), ["storage"])
+        # exact rules match the whole tag
+        self.assertEqual(self.classify({"building": "garages"}), [])
+        self.assertEqual(self.classify({"building": "yes", "__landUseType": "industrial"}), ["industrial"])
+        self.assertIsNone(BUILDING_TAG_PATTERN.match("publicity"))
+        self.assertEqual(self.classifier.typeByBuildingTag, {"houseboat": "residential", "residential": "residential",
+                                                             "university": "education", "garage": "storage", "garages": None,
+                                                             "yes": None})
+
+    def test_Properties(self):
+        self.assertEqual(self.classify({"abandoned": "yes", "building": "house"}), ["abandoned"])
+        # annotators not used
+        self.assertEqual(self.classify({"building": "church", "leisures": None, "amenity": "place_of_worship"}), ["holy"])
+        self.assertEqual(self.classify({"building": "house", "leisure": "sports_centre", "companies": [("Bäckerei", "bakery", 1)]}),
+                         ["commercial", "leisure", "residential"])
+        self.assertEqual(self.classify({"amenities": [("Apotheke", "pharmacy", 1)], "amenity": "school",
+                                        "__amenityTypes": ["police"], "education": [("Kita", "kindergarten", 1)]}),
+                         ["education", "health", "safety"])
+        self.assertEqual(self.classify({"office": "government", "__landUseType": "residential"}), ["public admin"])
+
+    def test_ClassifyAll(self):
+        propertiesList = [{"building": "retail"}, {"building": "house", "amenities": [("Polizei", "police", 1)]},
+                          {"power": "substation"}, {}]
+        expected = [["commercial"], ["residential", "safety"], ["utility"], []]
+        buildings = collection(propertiesList)
+        self.classifier.annotateAll(buildings)
+        self.assertEqual([b["properties"]["type"] for b in buildings["features"]], expected)
+
+        table = FeatureTable.fromFeatureCollection(collection(propertiesList))
+        self.assertEqual(self.classifier.classifyAll(table), expected)
+        self.classifier.annotateAll(table)
+        self.assertEqual(table.column("type"), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
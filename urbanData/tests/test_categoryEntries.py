@@ -0,0 +1,38 @@
+import unittest
+import json
+import pickle
+
+import sys, os
+sys.path.insert(1, os.path.abspath('..'))
+from helper.categoryEntries import CategoryEntries, CategoryEntry
+from annotater.osmAnnotater import aggregateCategoryProperties
+
+
+class TestCategoryEntries(unittest.TestCase):
+
+    def test_Merge(self):
+        entries = CategoryEntries([("Bäckerei", "various", 2), ("Möbelhaus", "furniture", 1)])
+        entries.merge("Bäckerei", "bakery")
+        entries.merge("Möbelhaus", "furniture")
+        entries.merge("Möbelhaus", "kitchen")
+        entries.merge("Kiosk", "kiosk")
+        # the type replaces 'various' and the entrances of the existing entry are kept
+        self.assertEqual(entries, [("Bäckerei", "bakery", 2), ("Möbelhaus", "kitchen,furniture", 1), ("Kiosk", "kiosk", 1)])
+        self.assertEqual(entries[1].types(), ["kitchen", "furniture"])
+        self.assertEqual(aggregateCategoryProperties([entries]), {"bakery": 1, "kitchen,furniture": 1, "kiosk": 1})
+
+    def test_StoredLikeTuples(self):
+        entries = CategoryEntries([CategoryEntry.create("Schule", "school")])
+        name, type, entrances = entries[0]
+        self.assertEqual((name, type, entrances), ("Schule", "school", 1))
+        self.assertIs(CategoryEntry.create("".join(["sch", "ool"]), "x").name, CategoryEntry.create("school", "y").name)
+        self.assertEqual(json.loads(json.dumps(entries)), [["Schule", "school", 1]])
+
+        unpickled = pickle.loads(pickle.dumps(entries))
+        self.assertIsInstance(unpickled, CategoryEntries)
+        unpickled.merge("Schule", "kindergarten")
+        self.assertEqual(unpickled, [("Schule", "kindergarten,school", 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
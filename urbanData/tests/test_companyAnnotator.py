@@ -5,6 +5,7 @@ import sys, os
 sys.path.insert(1, os.path.abspath('..'))
 
 from annotater.companyAnnotator import CompanyAnnotator, HouseNumberRange
+from helper.addressIndex import AddressIndex, houseNumberSortKey
 
 class TestCompanyAnnotator(unittest.TestCase):
 
@@ -16,7 +17,34 @@ class TestCompanyAnnotator(unittest.TestCase):
         for input, expectedResult in test_cases.items():
             result = CompanyAnnotator.extractHousenumber(input)
             self.assertEquals(result, expectedResult)
-    
+
+    def test_AnnotateAll(self):
+        street = "01127, Oschatzer Straße"
+        buildings = {"type": "FeatureCollection", "features": [
+            {"type": "Feature", "geometry": None, "properties": {"addresses": {street: ["8", "9A"]}}},
+            {"type": "Feature", "geometry": None, "properties": {"addresses": {street: ["10", "10b;12"]}}},
+            {"type": "Feature", "geometry": None, "properties": {"addresses": {street: [None]}}},
+            {"type": "Feature", "geometry": None, "properties": {}}]}
+        company = {"postalCode": "01127", "street": "Oschatzer Straße", "branch": " "}
+        companies = [dict(company, name="single", houseNumber="9a"),
+                     dict(company, name="two", houseNumber=["8", "12"]),
+                     # numeric instead of lexical order (lexical '9' > '10')
+                     dict(company, name="range", houseNumber=HouseNumberRange("9", "10a")),
+                     dict(company, name="unknown", houseNumber="42")]
+        result = CompanyAnnotator(companyData=companies).annotateAll(buildings)
+
+        properties = [feature["properties"].get("companies") for feature in result["features"]]
+        self.assertEqual(properties[0], [("single", "various", 1), ("two", "various", 1), ("range", "various", 1)])
+        self.assertEqual(properties[1], [("two", "various", 1), ("range", "various", 1)])
+        self.assertEqual(properties[2:], [None, None])
+
+    def test_HouseNumberRange(self):
+        index = AddressIndex({"features": [{"properties": {"addresses": {"a": ["2", "10", "9", "10c", "11", "b"]}}}]})
+        self.assertEqual(index.houseNumbersInRange("a", "9", "10b"), ["9", "10"])
+        self.assertEqual(index.houseNumbersInRange("a", "10", "11"), ["10", "10c", "11"])
+        self.assertEqual(index.houseNumbersInRange("other", "1", "100"), [])
+        self.assertLess(houseNumberSortKey("99z"), houseNumberSortKey("100"))
+
 
 # TODO: mostly check if regexp catches all cases
 
@@ -0,0 +1,57 @@
+import unittest
+import tempfile
+from unittest.mock import patch
+
+import sys, os
+sys.path.insert(1, os.path.abspath('..'))
+from annotater.companyAnnotator import CompanyAnnotator
+from helper.addressIndex import HouseNumberRange
+from helper.companyDataset import isUpToDate, loadCompanyDataset
+
+
+class TestCompanyDataset(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.csvPath = os.path.join(self.dir.name, "companies.csv")
+        self.datasetPath = os.path.join(self.dir.name, "companies.arrow")
+        with open(self.csvPath, "w", encoding="utf-8") as file:
+            file.write("area,branch,name,postalCode,street\n"
+                       "Dresden,bakery,Bäckerei,01127,Oschatzer Str. 8A\n"
+                       "Dresden,,Kanzlei,01139,Leipziger Straße 8 - 10\n"
+                       "Dresden,,Praxis,01127,Oschatzer Straße 3/5\n"
+                       "Dresden,,Ohne Nummer,01127,Oschatzer Straße\n"
+                       "Leipzig,,Elsewhere,04109,Willy-Brandt-Platz 7\n")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_CompileAndLoad(self):
+        self.assertFalse(isUpToDate(self.datasetPath, [self.csvPath]))
+        with patch.object(CompanyAnnotator, "defaultDataSourcePaths", return_value=[self.csvPath]):
+            annotator = CompanyAnnotator(postalCodes=["01127", "01139"], datasetPath=self.datasetPath)
+        self.assertTrue(isUpToDate(self.datasetPath, [self.csvPath]))
+
+        companies = {company["name"]: company for company in annotator.dataSource}
+        self.assertEqual(sorted(companies.keys()), ["Bäckerei", "Kanzlei", "Praxis"])
+        self.assertEqual(companies["Bäckerei"]["street"], "Oschatzer Straße")
+        self.assertEqual(companies["Bäckerei"]["houseNumber"], "8a")
+        self.assertEqual(companies["Kanzlei"]["houseNumber"], HouseNumberRange("8", "10"))
+        self.assertEqual(companies["Praxis"]["houseNumber"], ["3", "5"])
+
+        # all postal codes are compiled, the selection happens on load
+        self.assertEqual(len(loadCompanyDataset(self.datasetPath)), 4)
+        self.assertEqual([c["name"] for c in loadCompanyDataset(self.datasetPath, ["04109"])], ["Elsewhere"])
+
+    def test_OutdatedDataset(self):
+        with patch.object(CompanyAnnotator, "defaultDataSourcePaths", return_value=[self.csvPath]):
+            CompanyAnnotator(datasetPath=self.datasetPath)
+            with open(self.csvPath, "a", encoding="utf-8") as file:
+                file.write("Dresden,,Neu,01127,Oschatzer Straße 1\n")
+            self.assertFalse(isUpToDate(self.datasetPath, [self.csvPath]))
+            annotator = CompanyAnnotator(postalCodes=["01127"], datasetPath=self.datasetPath)
+        self.assertIn("Neu", [company["name"] for company in annotator.dataSource])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+import pickle
+import tempfile
+
+import sys, os
+sys.path.insert(1, os.path.abspath('..'))
+import numpy as np
+from shapely.geometry import box
+from annotater.annotationPipeline import runAnnotators
+from annotater.buildingClassifier import BuildingTypeClassifier
+from annotater.buildingLvlAnnotator import BuildingLvlAnnotator
+from annotater.companyAnnotator import CompanyAnnotator
+from helper.featureTable import FeatureTable, geometryOf
+from helper.geoParquetHelper import saveGeoParquet, loadGeoParquet
+
+
+def collection(propertiesList, withGeometry=True):
+    return {"type": "FeatureCollection", "features": [
+        {"type": "Feature", "id": i, "geometry": box(i, 0, i + 1, 1).__geo_interface__ if withGeometry else None, "properties": p}
+        for i, p in enumerate(propertiesList)]}
+
+
+class TestFeatureTable(unittest.TestCase):
+
+    def setUp(self):
+        street = "01127, Oschatzer Straße"
+        self.buildings = collection([
+            {"building": "house", "building:levels": 3, "addresses": {street: ["1"]}, "groupId": 0},
+            {"building": "retail", "roof:levels": 1, "groupId": 0},
+            {"building": "house", "groupId": 1, "height": 7.5}])
+        self.groups = collection([{"__buildings": [0, 1]}, {"__buildings": [2]}])
+
+    def test_Columns(self):
+        table = FeatureTable.fromFeatureCollection(self.buildings)
+        self.assertEqual(len(table), 3)
+        self.assertEqual(table.column("groupId").dtype, np.int64)
+        # missing values are None in a list column
+        self.assertEqual(table.column("height"), [None, None, 7.5])
+        groups = FeatureTable.fromFeatureCollection(self.groups)
+        self.assertEqual(groups.foreignKey("__buildings").indices.tolist(), [0, 1, 2])
+        self.assertEqual(groups.toFeatureCollection()["features"][0]["properties"], {"__buildings": [0, 1]})
+
+    def test_FeatureViews(self):
+        table = FeatureTable.fromFeatureCollection(self.buildings)
+        feature = table["features"][1]
+        self.assertEqual(feature["id"], 1)
+        self.assertEqual(feature["properties"], {"building": "retail", "roof:levels": 1, "groupId": 0})
+        self.assertNotIn("height", feature["properties"])
+        self.assertIsNone(feature["properties"].get("building:levels"))
+
+        feature["properties"]["groupId"] = "unknown"
+        feature["properties"].setdefault("companies", []).append(("Bäckerei", "bakery", 1))
+        self.assertEqual(table.column("groupId"), [0, "unknown", 1])
+        self.assertEqual(table["features"][1]["properties"]["companies"], [("Bäckerei", "bakery", 1)])
+        # pickled (f.i. for worker processes) as plain geojson
+        self.assertEqual(pickle.loads(pickle.dumps(feature)), table.toFeature(1))
+        self.assertEqual(type(pickle.loads(pickle.dumps(feature))), dict)
+        # the stored geometry is used (no round trip via geojson)
+        self.assertIs(geometryOf(feature), table.geometries[1])
+        self.assertTrue(geometryOf(self.buildings["features"][1]).equals(table.geometries[1]))
+
+    def test_RoundTrip(self):
+        table = FeatureTable.fromFeatureCollection(self.buildings)
+        self.assertEqual(table.toFeatureCollection()["features"], FeatureTable.fromFeatureCollection(table).toFeatureCollection()["features"])
+        features = table.toFeatureCollection()["features"]
+        self.assertEqual([f["properties"] for f in features], [f["properties"] for f in self.buildings["features"]])
+        self.assertEqual(features[2]["geometry"]["type"], "Polygon")
+
+    def test_Annotators(self):
+        company = {"postalCode": "01127", "street": "Oschatzer Straße", "branch": "bakery", "name": "Bäckerei", "houseNumber": "1"}
+        annotators = [BuildingLvlAnnotator(), CompanyAnnotator(companyData=[company]), BuildingTypeClassifier()]
+        for feature in self.buildings["features"]:
+            feature["properties"].update({"leisures": [], "amenities": []})
+        groups = collection([{"__buildings": [0, 1]}, {"__buildings": [2]}])
+        runAnnotators(annotators, self.buildings, groups, {})
+
+        buildingTable = FeatureTable.fromFeatureCollection(collection([
+            {k: v for k, v in f["properties"].items() if k not in ["levels", "companies", "type"]} for f in self.buildings["features"]]))
+        groupTable = FeatureTable.fromFeatureCollection(self.groups)
+        runAnnotators([BuildingLvlAnnotator(), CompanyAnnotator(companyData=[company]), BuildingTypeClassifier()], buildingTable, groupTable, {})
+
+        self.assertEqual([f["properties"] for f in buildingTable.toFeatureCollection()["features"]],
+                         [f["properties"] for f in self.buildings["features"]])
+        self.assertEqual([f["properties"] for f in groupTable.toFeatureCollection()["features"]], [f["properties"] for f in groups["features"]])
+        self.assertEqual(groupTable.column("levels").tolist(), [2.0, 0.0])
+
+    def test_GeoParquet(self):
+        table = FeatureTable.fromFeatureCollection(self.groups)
+        table.setColumn("levels", np.array([2.5, 1.0]))
+        with tempfile.TemporaryDirectory() as dir:
+            path = os.path.join(dir, "groups.parquet")
+            saveGeoParquet(table, path)
+            loaded = loadGeoParquet(path, asFeatureTable=True)
+            self.assertEqual(loaded.foreignKey("__buildings").offsets.tolist(), [0, 2, 3])
+            self.assertEqual(loaded.column("levels").dtype, np.float64)
+            self.assertEqual(loaded.toFeatureCollection()["features"], loadGeoParquet(path)["features"])
+
+
+if __name__ == '__main__':
+    unittest.main()
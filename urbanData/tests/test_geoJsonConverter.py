@@ -0,0 +1,94 @@
+import unittest
+import copy
+
+import sys, os
+sys.path.insert(1, os.path.abspath('..'))
+from helper.geoJsonConverter import osmObjectsToGeoJSON, osmObjectsToFeaturesParallel, conversionChunks
+
+def way(id, positions, tags):
+    return {"type": "way", "id": id, "nodes": list(range(len(positions))), "tags": tags,
+            "geometry": [{"lon": lon, "lat": lat} for lon, lat in positions]}
+
+SQUARE = [(0, 0), (1, 0), (1, 1), (0, 1), (0, 0)]
+
+def member(positions, role):
+    return {"type": "way", "ref": 0, "role": role, "geometry": [{"lon": lon, "lat": lat} for lon, lat in positions]}
+
+def relation(id, members, tags):
+    return {"type": "relation", "id": id, "members": members, "tags": tags}
+
+def square(x, y, size):
+    return [(x, y), (x + size, y), (x + size, y + size), (x, y + size), (x, y)]
+
+class TestGeoJsonConverter(unittest.TestCase):
+
+    def test_WaysAndNodes(self):
+        osmObjects = [way(1, SQUARE, {"building": "yes"}),
+                      way(2, SQUARE[:3], {"building": "yes"}),
+                      way(3, SQUARE, {"highway": "service"}),
+                      {"type": "node", "id": 4, "lon": 13.12345678, "lat": 51.1, "tags": {"shop": "bakery"}}]
+        features = osmObjectsToGeoJSON(osmObjects, validate=True)["features"]
+        self.assertEqual([f["geometry"]["type"] for f in features], ["Polygon", "LineString", "LineString", "Point"])
+        self.assertEqual(features[0]["geometry"]["coordinates"], [[list(p) for p in SQUARE]])
+        self.assertEqual(features[0]["properties"]["__nodeIds"], [0, 1, 2, 3, 4])
+        # rounded like by the geojson library
+        self.assertEqual(features[3]["geometry"]["coordinates"], [13.123457, 51.1])
+
+    def test_Polygonize(self):
+        features = osmObjectsToGeoJSON([way(3, SQUARE, {"highway": "service"})], polygonize=True)["features"]
+        self.assertEqual(features[0]["geometry"]["type"], "Polygon")
+
+    def test_RelationWithSplitRing(self):
+        # outer ring split into two ways with different directions
+        members = [member([(0, 0), (4, 0), (4, 4)], "outer"), member([(0, 0), (0, 4), (4, 4)], "outer"),
+                   member(square(1, 1, 1), "inner")]
+        features = osmObjectsToGeoJSON([relation(1, members, {"type": "multipolygon"})], validate=True)["features"]
+        geometry = features[0]["geometry"]
+        self.assertEqual(geometry["type"], "Polygon")
+        self.assertEqual(geometry["coordinates"][0], [[0, 0], [4, 0], [4, 4], [0, 4], [0, 0]])
+        self.assertEqual(geometry["coordinates"][1], [list(p) for p in square(1, 1, 1)])
+
+    def test_MultiPolygonHoles(self):
+        members = [member(square(0, 0, 4), "outer"), member(square(10, 0, 4), "outer"),
+                   member(square(11, 1, 1), "inner"), member(square(1, 1, 1), "inner")]
+        features = osmObjectsToGeoJSON([relation(2, members, {"type": "multipolygon"})], validate=True)["features"]
+        geometry = features[0]["geometry"]
+        self.assertEqual(geometry["type"], "MultiPolygon")
+        self.assertEqual([polygon[1][0] for polygon in geometry["coordinates"]], [[1, 1], [11, 1]])
+
+    def test_BoundaryStaysLine(self):
+        members = [member([(0, 0), (4, 0), (4, 4)], "outer"), member([(4, 4), (0, 4), (0, 0)], "outer"),
+                   {"type": "node", "ref": 1, "role": "admin_centre", "lon": 1, "lat": 1}]
+        features = osmObjectsToGeoJSON([relation(3, members, {"boundary": "administrative"})])["features"]
+        self.assertEqual(features[0]["geometry"]["type"], "LineString")
+        self.assertEqual(len(features[0]["geometry"]["coordinates"]), 5)
+
+    def test_OpenRelation(self):
+        members = [member([(0, 0), (1, 0)], ""), member([(5, 5), (6, 6)], "")]
+        features = osmObjectsToGeoJSON([relation(4, members, {"type": "route"})])["features"]
+        self.assertEqual(features[0]["geometry"]["type"], "MultiLineString")
+
+    def test_ParallelConversion(self):
+        osmObjects = [way(id, square(id, 0, 1), {"building": "yes"}) for id in range(10)]
+        osmObjects.insert(3, relation(20, [member(square(0, 0, 4), "outer"), member(square(1, 1, 1), "inner")], {"type": "multipolygon"}))
+        osmObjects.append({"type": "node", "id": 30, "lon": 1, "lat": 2, "tags": {}})
+        expected = osmObjectsToGeoJSON(copy.deepcopy(osmObjects))["features"]
+        self.assertEqual(osmObjectsToFeaturesParallel(osmObjects, False, processes=2, chunkSize=4), expected)
+        self.assertEqual(osmObjectsToGeoJSON(osmObjects, processes=2)["features"], expected)
+
+    def test_RelationChunks(self):
+        relations = [relation(id, [member(square(id, 0, 1), "outer")] * size, {"type": "multipolygon"})
+                     for id, size in enumerate([1, 5, 2, 1, 1])]
+        osmObjects = relations + [way(id, SQUARE, {"building": "yes"}) for id in range(5, 10)]
+        # small relations are converted together, the big one alone
+        self.assertEqual(conversionChunks(osmObjects, chunkSize=4), [[1], [2, 0, 3], [4], [5, 6, 7, 8], [9]])
+        expected = osmObjectsToGeoJSON(copy.deepcopy(osmObjects))["features"]
+        self.assertEqual(osmObjectsToFeaturesParallel(osmObjects, False, processes=2, chunkSize=4), expected)
+
+    def test_InvalidGeometry(self):
+        with self.assertRaises(ValueError):
+            osmObjectsToGeoJSON([way(5, [], {"building": "yes"})])
+
+
+if __name__ == '__main__':
+    unittest.main()
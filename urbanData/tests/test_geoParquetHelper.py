@@ -0,0 +1,63 @@
+import unittest
+import tempfile
+import geojson
+
+import sys, os
+sys.path.insert(1, os.path.abspath('..'))
+from shapely import wkb
+from shapely.geometry import mapping, Point, LineString, MultiPolygon, GeometryCollection, box
+from helper.geoParquetHelper import saveGeoParquet, loadGeoParquet, wkbToGeoJson
+
+class TestGeoParquetHelper(unittest.TestCase):
+
+    def setUp(self):
+        building = geojson.Feature(
+            id=1,
+            geometry=geojson.Polygon([[(0, 0), (1, 0), (1, 1), (0, 0)]]),
+            properties={"building": "yes", "levels": 3, "addresses": {"01127, Oschatzer Straße": ["1", "3"]},
+                        "companies": [("Bäckerei", "bakery", 1)], "__nodeIds": [1, 2, 3]})
+        shop = geojson.Feature(id=2, geometry=geojson.Point((0.5, 0.5)), properties={"levels": 2, "shop": "bakery"})
+        self.collection = geojson.FeatureCollection([building, shop])
+        self.file = tempfile.NamedTemporaryFile(suffix=".parquet", delete=False)
+        self.file.close()
+        saveGeoParquet(self.collection, self.file.name)
+
+    def tearDown(self):
+        os.remove(self.file.name)
+
+    def test_RoundTrip(self):
+        loaded = loadGeoParquet(self.file.name)
+        building, shop = loaded["features"]
+        self.assertEqual(building["id"], 1)
+        self.assertEqual(building["geometry"]["type"], "Polygon")
+        self.assertEqual(building["properties"]["addresses"], {"01127, Oschatzer Straße": ["1", "3"]})
+        # tuples are stored as lists (like in geojson files)
+        self.assertEqual(building["properties"]["companies"], [["Bäckerei", "bakery", 1]])
+        self.assertEqual(building["properties"]["__nodeIds"], [1, 2, 3])
+        # missing properties stay missing
+        self.assertEqual(shop["properties"], {"levels": 2, "shop": "bakery"})
+        self.assertEqual(list(shop["geometry"]["coordinates"]), [0.5, 0.5])
+
+    def test_ColumnProjection(self):
+        loaded = loadGeoParquet(self.file.name, properties=["levels"], withGeometry=False)
+        self.assertEqual([f["properties"] for f in loaded["features"]], [{"levels": 3}, {"levels": 2}])
+        self.assertEqual([f["geometry"] for f in loaded["features"]], [None, None])
+
+    def test_SaveWithoutGeometry(self):
+        loaded = loadGeoParquet(self.file.name, withGeometry=False)
+        saveGeoParquet(loaded, self.file.name)
+        reloaded = loadGeoParquet(self.file.name)
+        self.assertEqual([f["geometry"] for f in reloaded["features"]], [None, None])
+        self.assertEqual(reloaded["features"], loaded["features"])
+
+    def test_GeometriesLikeShapely(self):
+        geometries = [Point(1, 2, 3), LineString([(0, 0), (1, 1)]), box(0, 0, 1, 1).difference(box(0.2, 0.2, 0.4, 0.4)),
+                      MultiPolygon([box(0, 0, 1, 1), box(2, 2, 3, 3)]), GeometryCollection([Point(0, 0), box(0, 0, 1, 1)])]
+        for geometry in geometries:
+            for bigEndian in [False, True]:
+                data = wkb.dumps(geometry, big_endian=bigEndian)
+                self.assertEqual(wkbToGeoJson(data), mapping(wkb.loads(data)))
+
+
+if __name__ == '__main__':
+    unittest.main()
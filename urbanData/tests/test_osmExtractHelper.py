@@ -0,0 +1,57 @@
+import unittest
+from unittest.mock import patch
+
+import sys, os
+sys.path.insert(1, os.path.abspath('..'))
+from helper.osmExtractHelper import OsmExtractHelper, compileTagFilter, RELATION_AREA_OFFSET
+from helper.OsmObjectType import OsmObjectType
+from helper.OsmDataQuery import OsmDataQuery
+from tests.osmExtractFixture import ExtractTestCase
+
+class TestOsmExtractHelper(ExtractTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.helper = OsmExtractHelper(cls.extractPath)
+
+    def test_TagFilter(self):
+        tags = {"amenity": "townhall", "name": "Rathaus"}
+        test_cases = {'"amenity"': True, 'amenity': True, '"shop"': False, '!"shop"': True,
+                      '"amenity"="townhall"': True, '"amenity"!="townhall"': False,
+                      "'amenity'~'town'": True, '"amenity"!~"parking|atm"': True,
+                      'shop!~"."': True, '"name"~"^Rat"': True}
+        for selector, expectedResult in test_cases.items():
+            self.assertEqual(compileTagFilter(selector)(tags), expectedResult, selector)
+
+    def test_AreaId(self):
+        self.assertEqual(self.helper.getAreaId("Square, Somewhere"), RELATION_AREA_OFFSET + 1)
+
+    def test_QueryNodesInArea(self):
+        areaId = self.helper.getAreaId("Square")
+        elements = self.helper.getOsmGeoObjects(areaId, ['"shop"', '"name"'], OsmObjectType.NODE)
+        self.assertEqual([(e["id"], e["tags"]["name"]) for e in elements], [(5, "Inside")])
+
+    def test_QueryWayGeometry(self):
+        areaId = self.helper.getAreaId("Square")
+        buildings = next(self.helper.directFetch(areaId, [OsmDataQuery("buildings", OsmObjectType.WAY, ['"building"'])]))
+        self.assertEqual(len(buildings["features"]), 1)
+        self.assertEqual(buildings["features"][0]["geometry"]["type"], "Polygon")
+
+    def test_QueryRelation(self):
+        areaId = self.helper.getAreaId("Square")
+        elements = self.helper.getOsmGeoObjects(areaId, ['"boundary"="administrative"'], OsmObjectType.RELATIONSHIP)
+        self.assertEqual([e["id"] for e in elements], [1])
+        self.assertEqual([len(m["geometry"]) for m in elements[0]["members"]], [3, 3])
+
+    def test_IncrementalFetchNotSupported(self):
+        query = OsmDataQuery("shops", OsmObjectType.NODE, ['"shop"'])
+        helper = OsmExtractHelper(self.extractPath, outPath=self.dir.name + "/")
+        with patch.object(helper, "postOverpass") as postOverpass:
+            with self.assertRaises(NotImplementedError):
+                helper.fetch(helper.getAreaId("Square"), "square", [query], incremental=True)
+            postOverpass.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import tempfile
+
+import sys, os
+sys.path.insert(1, os.path.abspath('..'))
+from shapely.geometry import box
+from helper.osmExtractHelper import OsmExtractHelper
+from helper.osmPoiIndex import OsmPoiIndex
+from helper.OsmObjectType import OsmObjectType
+from annotater.osmAnnotater import OsmCompaniesAnnotator, AmentiyAnnotator
+from tests.osmExtractFixture import ExtractTestCase, writeExtract, EXTRACT, SCHOOL
+
+class CountingExtractHelper(OsmExtractHelper):
+    batchRequests = 0
+
+    def getOsmGeoObjectsBatch(self, areaId, osmQueries):
+        self.batchRequests += 1
+        return super().getOsmGeoObjectsBatch(areaId, osmQueries)
+
+class TestOsmPoiIndex(ExtractTestCase):
+
+    def setUp(self):
+        self.helper = CountingExtractHelper(self.extractPath)
+        self.index = OsmPoiIndex("Square", self.helper)
+
+    def test_OneFetchForAllSelectors(self):
+        shops = self.index.register(['"shop"'])
+        named = self.index.register(['"name"'])
+        buildings = self.index.register(['"building"'], OsmObjectType.WAY)
+        self.assertEqual([f["properties"]["name"] for f in shops.features], ["Inside"])
+        self.assertEqual(len(named.features), 1)
+        self.assertEqual([f["id"] for f in buildings.features], [12])
+        self.assertEqual(self.helper.batchRequests, 1)
+        # the shop matches two selectors, but is only stored once
+        self.assertEqual(len(self.index.features), 2)
+
+    def test_Query(self):
+        shops = self.index.register(['"shop"'])
+        buildings = self.index.register(['"building"'], OsmObjectType.WAY)
+        area = box(0, 0, 1, 1)
+        self.assertEqual(len(self.index.query(area)), 2)
+        self.assertEqual([poi.properties["shop"] for poi in self.index.query(area, tags=["shop"])], ["bakery"])
+        self.assertEqual([poi.geometry.geom_type for poi in buildings.query(area)], ["Polygon"])
+        self.assertEqual(shops.query(box(0.1, 0.1, 0.35, 0.35)), [])
+
+    def test_SharedByAnnotator(self):
+        annotator = OsmCompaniesAnnotator("Square", poiIndex=self.index)
+        building = {"type": "Feature", "geometry": box(0.4, 0.4, 0.6, 0.6).__geo_interface__, "properties": {}}
+        annotator.annotate(building)
+        self.assertEqual(building["properties"]["companies"], [("Inside", "bakery", 1)])
+
+    def test_AnnotateAll(self):
+        annotator = OsmCompaniesAnnotator("Square", poiIndex=self.index)
+        buildings = {"type": "FeatureCollection", "features": [
+            {"type": "Feature", "geometry": box(x, x, x + 0.2, x + 0.2).__geo_interface__, "properties": {}} for x in [0.1, 0.4]]}
+        annotated = annotator.annotateAll(buildings)["features"]
+        self.assertEqual([f["properties"]["companies"] for f in annotated], [[], [("Inside", "bakery", 1)]])
+
+
+class TestAmenityAreas(unittest.TestCase):
+
+    def test_ContainingAreas(self):
+        with tempfile.TemporaryDirectory() as dir:
+            extractPath = writeExtract(dir, EXTRACT.replace("</osm>", SCHOOL))
+            annotator = AmentiyAnnotator("Square", OsmObjectType.WAYANDNODE, OsmExtractHelper(extractPath))
+            buildings = {"type": "FeatureCollection", "features": [
+                {"type": "Feature", "geometry": box(0.4, 0.4, 0.6, 0.6).__geo_interface__, "properties": {}},
+                {"type": "Feature", "geometry": box(0.9, 0.9, 1.1, 1.1).__geo_interface__, "properties": {}}]}
+            inside, overlapping = annotator.annotateAll(buildings)["features"]
+            self.assertEqual(inside["properties"]["__amenityTypes"], ["school"])
+            self.assertEqual(inside["properties"]["education"], [("Schule", "school", 1)])
+            self.assertNotIn("__amenityTypes", overlapping["properties"])
+
+
+if __name__ == '__main__':
+    unittest.main()
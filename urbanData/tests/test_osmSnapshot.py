@@ -0,0 +1,56 @@
+import unittest
+import tempfile
+
+import sys, os
+sys.path.insert(1, os.path.abspath('..'))
+from helper.osmSnapshot import OsmSnapshot, buildUpdateQuery, splitUpdateResult
+from helper.overpassBatchQuery import SEPARATOR_TYPE
+from helper.OsmObjectType import OsmObjectType
+
+def way(id, building="yes"):
+    return {"type": "way", "id": id, "tags": {"building": building}, "geometry": []}
+
+class TestOsmSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "buildings_test.json")
+        snapshot = OsmSnapshot(self.path)
+        snapshot.replace([way(1), way(2), way(3)], "2020-01-01T00:00:00Z")
+        snapshot.save()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_BuildUpdateQuery(self):
+        query = buildUpdateQuery(123, "way", ['"building"'], "2020-01-01T00:00:00Z")
+        self.assertIn('way["building"](changed:"2020-01-01T00:00:00Z")(area.searchArea);', query)
+        self.assertIn(".all out ids;", query)
+        # ways whose nodes were moved
+        self.assertIn('node(changed:"2020-01-01T00:00:00Z")(area.searchArea)->.movedNodes;way(bn.movedNodes)->.movedWays;', query)
+        self.assertIn('way.movedWays["building"];', query)
+        self.assertNotIn("rel(bw.movedWays)", query)
+        relationQuery = buildUpdateQuery(123, OsmObjectType.WAYANDRELATIONSHIP.value, ['"landuse"'], "2020-01-01T00:00:00Z")
+        self.assertIn('rel(bw.movedWays)["landuse"];', relationQuery)
+
+    def test_ApplyUpdate(self):
+        snapshot = OsmSnapshot(self.path)
+        self.assertTrue(snapshot.exists())
+        response = [{"type": SEPARATOR_TYPE, "tags": {"index": "0"}},
+                    {"type": "way", "id": 1}, {"type": "way", "id": 3}, {"type": "way", "id": 4},
+                    {"type": SEPARATOR_TYPE, "tags": {"index": "1"}},
+                    way(3, "house"), way(4)]
+        currentIds, changedElements = splitUpdateResult(response)
+        changedIds = snapshot.applyUpdate(currentIds, changedElements, "2020-02-01T00:00:00Z")
+        self.assertEqual(changedIds, {"way/2", "way/3", "way/4"})
+        self.assertEqual(sorted(snapshot.elements.keys()), ["way/1", "way/3", "way/4"])
+        self.assertEqual(snapshot.elements["way/3"]["tags"]["building"], "house")
+
+        snapshot.save()
+        reloaded = OsmSnapshot(self.path)
+        self.assertEqual(reloaded.timestamp, "2020-02-01T00:00:00Z")
+        self.assertEqual(reloaded.elements, snapshot.elements)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import json
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+import sys, os
+sys.path.insert(1, os.path.abspath('..'))
+from OSMPythonTools.cachingStrategy import CachingStrategy, JSON
+from OSMPythonTools.overpass import overpassQueryBuilder
+from helper.osmStandInServer import OsmStandInServer, FixtureStore, normalizeOverpassQuery, parseOverpassQuery, UnsupportedQuery
+from helper.overPassHelper import OverPassHelper
+from helper.overpassCache import AreaIdCache, OverpassCache
+from helper.osmExtractHelper import RELATION_AREA_OFFSET
+from helper.OsmObjectType import OsmObjectType
+from helper.OsmDataQuery import OsmDataQuery
+from tests.osmExtractFixture import ExtractTestCase
+
+class TestOsmStandInServer(ExtractTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # OSMPythonTools caches responses independent of the endpoint
+        CachingStrategy.use(JSON, cacheDir=os.path.join(cls.dir.name, "cache"))
+        cls.server = OsmStandInServer(extractPath=cls.extractPath).start()
+        cls.helper = OverPassHelper(outPath=cls.dir.name + "/", useCache=False,
+                                    areaIdCache=AreaIdCache(os.path.join(cls.dir.name, "areaIds.json")),
+                                    areaCenterCache=AreaIdCache(os.path.join(cls.dir.name, "areaCenters.json")),
+                                    overpassEndpoint=cls.server.overpassEndpoint, nominatimEndpoint=cls.server.nominatimEndpoint)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        CachingStrategy.use(JSON)
+        super().tearDownClass()
+
+    def test_ParseQuery(self):
+        query = '[out:json][timeout:25];area(3600000001)->.searchArea;(way["building"](area.searchArea);node["building"](area.searchArea);); out geom;'
+        self.assertEqual(parseOverpassQuery(query), (3600000001, [(None, ["way", "node"], ['"building"'])]))
+        with self.assertRaises(UnsupportedQuery):
+            parseOverpassQuery('node(1); out;')
+
+    def test_AreaIdAndQuery(self):
+        areaId = self.helper.getAreaId("Square, Somewhere")
+        self.assertEqual(areaId, RELATION_AREA_OFFSET + 1)
+        shops = self.helper.getOsmGeoObjects(areaId, ['"shop"'], OsmObjectType.NODE)
+        self.assertEqual([shop["tags"]["name"] for shop in shops], ["Inside"])
+
+    def test_AreaCenter(self):
+        lat, lon = self.helper.getAreaCenter("Square, Somewhere")
+        self.assertTrue(0 < lat < 1 and 0 < lon < 1)
+        # served from the cache afterwards
+        self.assertEqual(self.helper.areaCenterCache.get("Square, Somewhere"), [lat, lon])
+        with patch.object(self.helper, "nominatimQuery") as nominatimQuery:
+            self.assertEqual(self.helper.getAreaCenter("Square, Somewhere"), [lat, lon])
+            nominatimQuery.assert_not_called()
+
+    def test_BatchedQuery(self):
+        queries = [OsmDataQuery("shops", OsmObjectType.NODE, ['"shop"']),
+                   OsmDataQuery("buildings", OsmObjectType.WAY, ['"building"'])]
+        shops, buildings = self.helper.getOsmGeoObjectsBatch(RELATION_AREA_OFFSET + 1, queries)
+        self.assertEqual(len(shops), 1)
+        self.assertEqual([building["id"] for building in buildings], [12])
+
+    def test_RefreshCache(self):
+        fixtureDir = os.path.join(self.dir.name, "fixtures")
+        fixtures = FixtureStore(fixtureDir)
+        query = overpassQueryBuilder(area=42, elementType="node", selector=['"shop"'], out='geom')
+        setFixture = lambda name: fixtures.set("overpass", normalizeOverpassQuery(query), json.dumps(
+            {"elements": [{"type": "node", "id": 1, "lat": 0, "lon": 0, "tags": {"shop": "bakery", "name": name}}]}).encode("utf-8"))
+        setFixture("Old")
+        cache = OverpassCache(os.path.join(self.dir.name, "refreshCache"), ttl=timedelta(seconds=1))
+        with OsmStandInServer(fixtureDir=fixtureDir) as server:
+            helper = OverPassHelper(outPath=self.dir.name + "/", cache=cache, overpassEndpoint=server.overpassEndpoint)
+            self.assertEqual(helper.getOsmGeoObjects(42, ['"shop"'], OsmObjectType.NODE)[0]["tags"]["name"], "Old")
+
+            setFixture("New")
+            keyFields = OverpassCache.keyFields(42, "node", ['"shop"'], out='geom')
+            entryPath = cache.entryPath(keyFields)
+            os.utime(entryPath, (time.time() - 2, time.time() - 2))
+            self.assertEqual(helper.refreshCache(), 1)
+            # the response is not answered by the (never expiring) cache of OSMPythonTools
+            self.assertEqual(cache.get(keyFields)[0]["tags"]["name"], "New")
+
+
+if __name__ == '__main__':
+    unittest.main()
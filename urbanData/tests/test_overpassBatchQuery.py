@@ -0,0 +1,32 @@
+import unittest
+
+import sys, os
+sys.path.insert(1, os.path.abspath('..'))
+from helper.overpassBatchQuery import buildBatchQuery, splitBatchResult, SEPARATOR_TYPE
+
+class TestOverpassBatchQuery(unittest.TestCase):
+
+    def test_BuildBatchQuery(self):
+        queries = [{"elementType": "way", "selector": ['"building"'], "out": "geom"},
+                   {"elementType": ["way", "node"], "selector": ['"shop"', '"name"'], "out": "geom"}]
+        expected = ('area(42)->.searchArea;'
+                    '(way["building"](area.searchArea);)->.query0;'
+                    '(way["shop"]["name"](area.searchArea);node["shop"]["name"](area.searchArea);)->.query1;'
+                    'make querySeparator index=0; out;.query0 out geom;'
+                    'make querySeparator index=1; out;.query1 out geom;')
+        self.assertEqual(buildBatchQuery(42, queries), expected)
+
+    def test_SplitBatchResult(self):
+        separator = lambda index: {"type": SEPARATOR_TYPE, "id": 1, "tags": {"index": str(index)}}
+        elements = [separator(0), {"type": "way", "id": 1}, {"type": "way", "id": 2},
+                    separator(1), separator(2), {"type": "way", "id": 1}]
+        result = splitBatchResult(elements, 3)
+        self.assertEqual([[e["id"] for e in r] for r in result], [[1, 2], [], [1]])
+
+    def test_SplitBatchResultWithoutSeparator(self):
+        with self.assertRaises(ValueError):
+            splitBatchResult([{"type": "way", "id": 1}], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import tempfile
+import os
+import time
+from datetime import timedelta
+
+import sys
+sys.path.insert(1, os.path.abspath('..'))
+from helper.overpassCache import OverpassCache, AreaIdCache
+
+class TestOverpassCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cacheDir = tempfile.TemporaryDirectory()
+        self.cache = OverpassCache(self.cacheDir.name, ttl=timedelta(hours=1))
+
+    def tearDown(self):
+        self.cacheDir.cleanup()
+
+    def test_GetAndSet(self):
+        key = OverpassCache.keyFields(42, "way", ['"building"'])
+        self.assertIsNone(self.cache.get(key))
+        elements = [{"type": "way", "id": 1}]
+        self.cache.set(key, elements)
+        self.assertEqual(self.cache.get(key), elements)
+        otherKey = OverpassCache.keyFields(42, "node", ['"building"'])
+        self.assertIsNone(self.cache.get(otherKey))
+
+    def test_WriteThroughAndStream(self):
+        key = OverpassCache.keyFields(42, "way", ['"building"'])
+        elements = [{"type": "way", "id": id, "tags": {"name": "Straße {}".format(id)}} for id in range(100)]
+        self.assertIsNone(self.cache.stream(key))
+
+        writtenElements = self.cache.writeThrough(key, iter(elements))
+        # entry is only stored after every element was consumed
+        next(writtenElements)
+        self.assertIsNone(self.cache.get(key))
+        self.assertEqual(list(writtenElements), elements[1:])
+        self.assertEqual(list(self.cache.stream(key)), elements)
+
+    def test_StaleEntries(self):
+        key = OverpassCache.keyFields(42, "way", '"building"')
+        self.cache.set(key, [])
+        path = self.cache.entryPath(key)
+        twoHoursAgo = time.time() - 2 * 3600
+        os.utime(path, (twoHoursAgo, twoHoursAgo))
+
+        self.assertIsNone(self.cache.get(key))
+        self.assertEqual(self.cache.get(key, allowStale=True), [])
+        self.assertEqual(self.cache.staleEntries(), [key])
+
+    def test_LruEviction(self):
+        keys = [OverpassCache.keyFields(id, "way", '"building"') for id in range(3)]
+        for key in keys:
+            self.cache.set(key, [{"id": 1}])
+        entrySize = self.cache.entryPath(keys[0]).stat().st_size
+        # first entry was used last
+        for age, key in zip([0, 20, 10], keys):
+            path = self.cache.entryPath(key)
+            os.utime(path, (time.time() - age, path.stat().st_mtime))
+
+        self.cache.maxSizeInBytes = 2 * entrySize
+        self.cache.evict()
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.assertIsNone(self.cache.get(keys[1]))
+        self.assertIsNotNone(self.cache.get(keys[2]))
+
+
+class TestAreaIdCache(unittest.TestCase):
+
+    def test_Persistence(self):
+        with tempfile.TemporaryDirectory() as cacheDir:
+            cacheFile = os.path.join(cacheDir, "areaIds.json")
+            cache = AreaIdCache(cacheFile)
+            self.assertIsNone(cache.get("Dresden, Germany"))
+            cache.set("Dresden, Germany", 3600191645)
+            self.assertEqual(AreaIdCache(cacheFile).get("Dresden, Germany"), 3600191645)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import time
+import requests
+
+import sys, os
+sys.path.insert(1, os.path.abspath('..'))
+from helper.requestScheduler import RequestScheduler, TokenBucket, isTransientError
+
+def httpError(statusCode):
+    response = requests.Response()
+    response.status_code = statusCode
+    return requests.HTTPError(response=response)
+
+class FlakyApi():
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+class TestRequestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = RequestScheduler("test", requestsPerSecond=1000, burst=10, maxConcurrentRequests=1,
+                                          maxRetries=3, baseDelay=0, minRetries=2, retryRatio=0)
+
+    def test_RetriesTransientErrors(self):
+        api = FlakyApi([httpError(503), requests.ConnectionError()])
+        self.assertEqual(self.scheduler.call(api), "ok")
+        self.assertEqual(api.calls, 3)
+
+    def test_NoRetryForPermanentErrors(self):
+        api = FlakyApi([httpError(400)])
+        with self.assertRaises(requests.HTTPError):
+            self.scheduler.call(api)
+        self.assertEqual(api.calls, 1)
+
+    def test_RetryBudget(self):
+        self.scheduler.call(FlakyApi([httpError(429), httpError(429)]))
+        # budget of 2 retries is used up
+        api = FlakyApi([httpError(429)])
+        with self.assertRaises(requests.HTTPError):
+            self.scheduler.call(api)
+        self.assertEqual(api.calls, 1)
+
+    def test_WrappedErrors(self):
+        # OSMPythonTools wraps the original error
+        self.assertTrue(isTransientError(Exception("could not be downloaded", httpError(504))))
+        self.assertFalse(isTransientError(Exception("error in result")))
+
+    def test_SlotIsReentrant(self):
+        with self.scheduler.slot():
+            self.assertEqual(self.scheduler.call(lambda: "ok"), "ok")
+
+    def test_TokenBucket(self):
+        bucket = TokenBucket(requestsPerSecond=20, capacity=1)
+        start = time.monotonic()
+        for _ in range(3):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+
+if __name__ == '__main__':
+    unittest.main()
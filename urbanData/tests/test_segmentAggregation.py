@@ -0,0 +1,57 @@
+import unittest
+import random
+
+import sys, os
+sys.path.insert(1, os.path.abspath('..'))
+from annotater.buildingClassifier import BuildingTypeClassifier
+from annotater.buildingLvlAnnotator import BuildingLvlAnnotator
+from helper.segmentAggregation import CsrIndex, reduceSegments
+
+
+def collection(propertiesList):
+    return {"type": "FeatureCollection", "features": [{"type": "Feature", "geometry": None, "properties": p} for p in propertiesList]}
+
+
+class TestSegmentAggregation(unittest.TestCase):
+
+    def setUp(self):
+        # the second group is empty
+        self.csr = CsrIndex.fromLists([[0, 1], [], [2, 0, 3]])
+
+    def test_CsrIndex(self):
+        self.assertEqual(len(self.csr), 3)
+        self.assertEqual(self.csr.offsets.tolist(), [0, 2, 2, 5])
+        self.assertEqual(self.csr.segmentIds.tolist(), [0, 0, 2, 2, 2])
+
+    def test_NumericReductions(self):
+        values = [2, 0, None, 4]
+        self.assertEqual(reduceSegments("sum", values, self.csr), [2, 0, 6])
+        self.assertEqual(reduceSegments("count", values, self.csr), [2, 0, 2])
+        self.assertEqual(reduceSegments("mean", values, self.csr), [1, None, 3])
+        self.assertEqual(reduceSegments("nonZeroMean", values, self.csr), [2, 0, 3])
+
+    def test_DistinctUnion(self):
+        values = [["residential", "commercial"], None, ["commercial"], []]
+        self.assertEqual(reduceSegments("union", values, self.csr), [["commercial", "residential"], [], ["commercial", "residential"]])
+
+    def test_SameAsAggregateProperties(self):
+        random.seed(1)
+        types = ["residential", "commercial", "leisure", "holy"]
+        buildings = collection([{"levels": random.choice([0, 1, 2, 5]), "type": random.sample(types, random.randint(0, 2))} for _ in range(200)])
+        groups = collection([{"__buildings": random.sample(range(200), random.randint(0, 8))} for _ in range(50)])
+        regions = collection([{"__buildingGroups": random.sample(range(50), random.randint(0, 5))} for _ in range(10)])
+        for annotator in [BuildingLvlAnnotator(), BuildingTypeClassifier()]:
+            annotator.aggregateToGroups(buildings, groups)
+            annotator.aggregateToRegions(groups, regions)
+            property = annotator.writeProperty
+            for collectionToCheck, members, foreignKey in [(groups, buildings, "__buildings"), (regions, groups, "__buildingGroups")]:
+                for feature in collectionToCheck["features"]:
+                    expected = annotator.aggregateProperties([members["features"][i]["properties"][property] for i in feature["properties"][foreignKey]])
+                    if property == "type":
+                        self.assertEqual(feature["properties"][property], sorted(expected))
+                    else:
+                        self.assertAlmostEqual(feature["properties"][property], expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+import sys, os
+sys.path.insert(1, os.path.abspath('..'))
+from shapely.geometry import box, Point
+from helper.shapelyHelper import spatialJoin
+
+class TestShapelyHelper(unittest.TestCase):
+
+    def test_SpatialJoin(self):
+        buildings = [box(0, 0, 2, 2), box(10, 10, 11, 11), box(1, 1, 3, 3)]
+        pois = [Point(1.5, 1.5), Point(20, 20), Point(0.5, 0.5), Point(10.5, 10.5)]
+        buildingIndices, poiIndices = spatialJoin(buildings, pois)
+        self.assertEqual(list(zip(buildingIndices, poiIndices)), [(0, 0), (0, 2), (1, 3), (2, 0)])
+
+    def test_SpatialJoinWithin(self):
+        lands = [box(0, 0, 10, 10), box(0, 0, 3, 3)]
+        buildings = [box(1, 1, 2, 2), box(5, 5, 11, 6)]
+        buildingIndices, landIndices = spatialJoin(buildings, lands, predicate="within")
+        self.assertEqual(list(zip(buildingIndices, landIndices)), [(0, 0), (0, 1)])
+
+    def test_SpatialJoinMissingGeometries(self):
+        # f.i. rows of a FeatureTable without geometry
+        buildings = [None, box(0, 0, 2, 2), None]
+        pois = [Point(1, 1), None]
+        buildingIndices, poiIndices = spatialJoin(buildings, pois)
+        self.assertEqual(list(zip(buildingIndices, poiIndices)), [(1, 0)])
+
+    def test_SpatialJoinMoreGeometriesThanOthers(self):
+        # the smaller side is queried, thus within is checked as contains of the lands
+        buildings = [box(x, 0, x + 1, 1) for x in range(5)] + [box(0, 0, 20, 1)]
+        lands = [box(0, 0, 2.5, 2)]
+        buildingIndices, landIndices = spatialJoin(buildings, lands, predicate="within")
+        self.assertEqual(list(zip(buildingIndices, landIndices)), [(0, 0), (1, 0)])
+
+    def test_SpatialJoinEmpty(self):
+        buildingIndices, poiIndices = spatialJoin([box(0, 0, 1, 1)], [])
+        self.assertEqual((len(buildingIndices), len(poiIndices)), (0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,6 @@
 import logging
 import requests
 import geojson
-import time
 from datetime import datetime
 from dvbRetriever import getPublicStops
 
@@ -11,10 +10,13 @@ from helper.overPassHelper import OverPassHelper
 from helper.OsmDataQuery import OsmDataQuery
 from helper.OsmObjectType import OsmObjectType
 from helper.shapelyHelper import geomCenter
+from helper.requestScheduler import getScheduler, TRAVELTIME_LIMITS, TRANSIENT_STATUS_CODES
 
 logging.basicConfig(level=logging.INFO)
 
-dresdenAreaId = OverPassHelper().getAreaId("Dresden, Germany")
+def getDresdenAreaId():
+    # resolved on first use instead of at import time
+    return OverPassHelper().getAreaId("Dresden, Germany")
 
 def transformStop(poI, travelTime, transportation):
     """generate departure_search point for time-map API based on point of interest (with name property)"""
@@ -36,6 +38,14 @@ def transformStop(poI, travelTime, transportation):
             }
 
 
+def postTimeMapRequest(api_url, headers, requestBody):
+    response = requests.post(api_url, headers=headers,  json=requestBody)
+    # transient errors are retried by the scheduler
+    if response.status_code in TRANSIENT_STATUS_CODES:
+        response.raise_for_status()
+    return response
+
+
 def retrieveTimeMaps(pointsOfInterest, travelTime = 300, transportation = "walking"):
     api_url = 'https://api.traveltimeapp.com/v4/time-map'
     api_token = None
@@ -47,6 +57,7 @@ def retrieveTimeMaps(pointsOfInterest, travelTime = 300, transportation = "walki
     'X-Api-Key': api_token}
 
     timeMaps = []
+    scheduler = getScheduler(api_url, **TRAVELTIME_LIMITS)
 
     if not api_token or not app_id:
         raise ValueError("Missing credentials for using timeMapAPI")
@@ -62,9 +73,7 @@ def retrieveTimeMaps(pointsOfInterest, travelTime = 300, transportation = "walki
         #continue
         if (progressIndex) % 10 == 0:
             logging.info("Fetched {}/{}".format(progressIndex + 1, len(pointsOfInterest)))
-        time.sleep(8)
-        # up to 10 searches per request / minute and 5000 calls per month
-        response = requests.post(api_url, headers=headers,  json=requestBody)
+        response = scheduler.call(postTimeMapRequest, api_url, headers, requestBody)
         
         if response.status_code == 200:
             responseContent = response.json()["results"][0]
@@ -85,7 +94,7 @@ def retrieveTimeMaps(pointsOfInterest, travelTime = 300, transportation = "walki
                 timeMap = geojson.Feature(geometry=geometry, properties=properties)
                 timeMaps.append(timeMap)
         else:
-            logging.error(response.reason())
+            logging.error(response.reason)
 
     return geojson.FeatureCollection(timeMaps)
 
@@ -100,7 +109,7 @@ def timeMapsForStops():
         geojson.dump(timeMaps, outfile)
 
 def timeMapsForCityHalls():
-    townHalls = next(OverPassHelper().directFetch(dresdenAreaId, [OsmDataQuery("Town Halls", OsmObjectType.ALL, ['"amenity"="townhall"'])]))
+    townHalls = next(OverPassHelper().directFetch(getDresdenAreaId(), [OsmDataQuery("Town Halls", OsmObjectType.ALL, ['"amenity"="townhall"'])]))
     # "driving+train" got many shapes (heatmap function could not handle them) .. trying "public_transport"
     timeMaps = retrieveTimeMaps(townHalls["features"], travelTime=900, transportation="public_transport")
     fileName = "out/data/timeMapsPerCityHall.json"
@@ -109,7 +118,7 @@ def timeMapsForCityHalls():
         geojson.dump(timeMaps, outfile)
 
 def timeMapsForPharmacies():
-    pharmacies = next(OverPassHelper().directFetch(dresdenAreaId, [OsmDataQuery("amenity health", OsmObjectType.ALL, ['"amenity"~"pharmacy"'])]))
+    pharmacies = next(OverPassHelper().directFetch(getDresdenAreaId(), [OsmDataQuery("amenity health", OsmObjectType.ALL, ['"amenity"~"pharmacy"'])]))
     timeMaps = retrieveTimeMaps(pharmacies["features"], travelTime=300, transportation="walking")
     fileName = "out/data/timeMapsPerPharmacy.json"
     with open(fileName, 'w', encoding='UTF-8') as outfile:
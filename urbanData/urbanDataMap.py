@@ -1,7 +1,6 @@
 import json
 import folium
 from matplotlib import cm
-from OSMPythonTools.nominatim import Nominatim
 from folium.plugins.measure_control import MeasureControl
 
 from helper.geoJsonHelper import groupBy
@@ -16,7 +15,7 @@ from helper.OsmDataQuery import OsmDataQuery
 # postfix for f.i. file_names
 areaName = "pieschen"
 # area to query
-pieschen = Nominatim().query('Pieschen, Dresden, Germany')
+areaLocation = 'Pieschen, Dresden, Germany'
 
 streetsSelector = [
     'highway~"primary|primary_link|secondary|secondary_link|tertiary|tertiary_link|residential|service|motorway|unclassified"']
@@ -57,29 +56,29 @@ osmQueries = [OsmDataQuery("streets", OsmObject.WAY, streetsSelector, "highway")
               OsmDataQuery("craft", OsmObject.NODE, craftSelector, "craft"),
               ]
 
-osmDataFiles = OverPassHelper().fetch(pieschen.areaId(), areaName,
-                                      osmQueries=osmQueries, overrideFiles=True)
+if __name__ == "__main__":
+    overPassHelper = OverPassHelper()
+    osmDataFiles = overPassHelper.fetch(overPassHelper.getAreaId(areaLocation), areaName,
+                                        osmQueries=osmQueries, overrideFiles=True)
 
+    map = folium.Map(
+        location=overPassHelper.getAreaCenter(areaLocation), tiles='Stamen Toner', zoom_start=15)
 
-pieschenCoord = pieschen.toJSON()[0]
-map = folium.Map(
-    location=[pieschenCoord["lat"], pieschenCoord["lon"]], tiles='Stamen Toner', zoom_start=15)
+    # matplotlib colormap names
+    colormaps = ["hsv", "BrBG", "coolwarm"]
 
-# matplotlib colormap names
-colormaps = ["hsv", "BrBG", "coolwarm"]
 
+    for i, osmDataQuery in enumerate(osmDataFiles):
+        file = open(osmDataQuery.filePath, encoding='UTF-8')
+        allObjects = json.load(file)
+        objectGroups = groupBy(allObjects, osmDataQuery.groupByProperty)
 
-for i, osmDataQuery in enumerate(osmDataFiles):
-    file = open(osmDataQuery.filePath, encoding='UTF-8')
-    allObjects = json.load(file)
-    objectGroups = groupBy(allObjects, osmDataQuery.groupByProperty)
+        objectMap = generateFeatureCollectionForGroups(
+            objectGroups, colormaps[i % len(colormaps)], osmDataQuery.name)
+        objectMap.add_to(map)
 
-    objectMap = generateFeatureCollectionForGroups(
-        objectGroups, colormaps[i % len(colormaps)], osmDataQuery.name)
-    objectMap.add_to(map)
+    folium.LayerControl().add_to(map)
 
-folium.LayerControl().add_to(map)
-
-fileName = "out/combinedMap_{}.html".format(areaName)
-map.save(fileName)
-print("Map saved in {}".format(fileName))
+    fileName = "out/combinedMap_{}.html".format(areaName)
+    map.save(fileName)
+    print("Map saved in {}".format(fileName))